@@ -26,7 +26,7 @@ from amset.interpolation.momentum import MRTACalculator
 from amset.interpolation.wavefunction import UnityWavefunctionOverlap
 from amset.io import write_mesh
 from amset.log import log_list, log_time_taken
-from amset.util import cast_dict_list, groupby, tensor_average
+from amset.util import cast_dict_list, tensor_average
 
 __author__ = "Alex Ganose"
 __maintainer__ = "Alex Ganose"
@@ -54,6 +54,7 @@ class AmsetData(MSONable):
         is_metal: bool,
         soc: bool,
         vb_idx: Optional[Dict[Spin, int]] = None,
+        single_precision_energy_diffs: bool = defaults["single_precision_energy_diffs"],
     ):
         self.structure = structure
         self.velocities_product = vvelocities_product
@@ -83,10 +84,6 @@ class AmsetData(MSONable):
         self.mrta_calculator = None
         self.fd_cutoffs = None
 
-        self.grouped_ir_to_full = groupby(
-            np.arange(len(kpoints)), ir_to_full_kpoint_mapping
-        )
-
         self.tetrahedral_band_structure = TetrahedralBandStructure.from_data(
             energies,
             kpoints,
@@ -95,6 +92,9 @@ class AmsetData(MSONable):
             ir_kpoints_idx,
             ir_to_full_kpoint_mapping,
             *ir_tetrahedra_info,
+            energy_diff_dtype=(
+                np.float32 if single_precision_energy_diffs else np.float64
+            ),
         )
 
         logger.info("Initializing momentum relaxation time factor calculator")
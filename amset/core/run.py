@@ -31,7 +31,13 @@ from amset.interpolation.wavefunction import (
 )
 from amset.io import load_settings, write_settings
 from amset.log import initialize_amset_logger, log_banner, log_list
-from amset.scattering.calculate import ScatteringCalculator, basic_scatterers
+from amset.scattering.calculate import (
+    AbstractScatteringWorkerPool,
+    ScatteringCalculator,
+    ScatteringWorkerPool,
+    basic_scatterers,
+)
+from amset.scattering.inelastic import get_pop_frequencies
 from amset.util import tensor_average, validate_settings
 
 __author__ = "Alex Ganose"
@@ -61,9 +67,31 @@ class Runner(MSONable):
         directory: Union[str, Path] = ".",
         return_usage_stats: bool = False,
         prefix: Optional[str] = None,
+        worker_pool: Optional[AbstractScatteringWorkerPool] = None,
     ):
+        """
+        Run amset.
+
+        Args:
+            directory: Directory in which to write the output files.
+            return_usage_stats: Whether to also return the timing and memory usage.
+            prefix: Prefix for the output files.
+            worker_pool: A scattering worker pool, such as a ScatteringWorkerPool or
+                a RemoteScatteringWorkerPool. If set, the pool will be used to
+                calculate the scattering rates and will be left running afterwards, so
+                it can be reused by subsequent runs. Otherwise a new pool is started
+                and closed for this run only.
+
+        Returns:
+            The amset data, and optionally the timing and memory usage.
+        """
         mem_usage, (amset_data, usage_stats) = memory_usage(
-            partial(self._run_wrapper, directory=directory, prefix=prefix),
+            partial(
+                self._run_wrapper,
+                directory=directory,
+                prefix=prefix,
+                worker_pool=worker_pool,
+            ),
             max_usage=True,
             retval=True,
             interval=0.1,
@@ -87,7 +115,10 @@ class Runner(MSONable):
             return amset_data
 
     def _run_wrapper(
-        self, directory: Union[str, Path] = ".", prefix: Optional[str] = None
+        self,
+        directory: Union[str, Path] = ".",
+        prefix: Optional[str] = None,
+        worker_pool: Optional[AbstractScatteringWorkerPool] = None,
     ):
         if self.settings["print_log"] or self.settings["write_log"]:
             if self.settings["write_log"]:
@@ -117,7 +148,10 @@ class Runner(MSONable):
         amset_data, dos_time = self._do_dos(amset_data)
         timing["dos"] = dos_time
 
-        amset_data, scattering_time = self._do_scattering(amset_data)
+        amset_data, scattering_time, startup_time = self._do_scattering(
+            amset_data, worker_pool=worker_pool
+        )
+        timing["worker startup"] = startup_time
         timing["scattering"] = scattering_time
 
         if isinstance(self.settings["fd_tol"], numeric_types):
@@ -207,6 +241,9 @@ class Runner(MSONable):
             bandgap=self.settings["bandgap"],
             symprec=self.settings["symprec"],
             nworkers=self.settings["nworkers"],
+            single_precision_energy_diffs=self.settings[
+                "single_precision_energy_diffs"
+            ],
         )
 
         if set(self.settings["scattering_type"]).issubset(set(basic_scatterers)):
@@ -253,10 +290,20 @@ class Runner(MSONable):
         )
         return amset_data, time.perf_counter() - t0
 
-    def _do_scattering(self, amset_data):
+    def _do_scattering(self, amset_data, worker_pool=None):
         log_banner("SCATTERING")
         t0 = time.perf_counter()
 
+        # the pool only starts its processes once they are needed
+        owns_pool = worker_pool is None
+        if owns_pool:
+            worker_pool = ScatteringWorkerPool(
+                nworkers=self.settings["nworkers"],
+                progress_bar=self.settings["print_log"],
+                min_free_memory=self.settings["min_free_memory"],
+            )
+        startup_time = worker_pool.startup_time
+
         cutoff_pad = _get_cutoff_pad(
             self.settings["pop_frequency"], self.settings["scattering_type"]
         )
@@ -269,12 +316,23 @@ class Runner(MSONable):
             progress_bar=self.settings["print_log"],
             cache_wavefunction=self.settings["cache_wavefunction"],
             nworkers=self.settings["nworkers"],
+            worker_pool=worker_pool,
+            symmetry_reduce_final_states=self.settings["symmetry_reduce_final_states"],
+            quadrature_precision=self.settings["quadrature_precision"],
+            checkpoint=self.settings["scattering_checkpoint"],
+            integrand_cache=self.settings["scattering_integrand_cache"],
         )
 
-        amset_data.set_scattering_rates(
-            scatter.calculate_scattering_rates(), scatter.scatterer_labels
-        )
-        return amset_data, time.perf_counter() - t0
+        try:
+            rates = scatter.calculate_scattering_rates()
+        finally:
+            if owns_pool:
+                worker_pool.close()
+        amset_data.set_scattering_rates(rates, scatter.scatterer_labels)
+
+        # time spent starting the worker processes is reported separately
+        startup_time = worker_pool.startup_time - startup_time
+        return amset_data, time.perf_counter() - t0 - startup_time, startup_time
 
     def _do_transport(self, amset_data):
         log_banner("TRANSPORT")
@@ -636,8 +694,9 @@ def _log_results_summary(amset_data, output_parameters):
 def _get_cutoff_pad(pop_frequency, scattering_type):
     cutoff_pad = 0
     if pop_frequency and ("POP" in scattering_type or scattering_type == "auto"):
-        # convert from THz to angular frequency in Hz
-        pop_frequency = pop_frequency * 1e12 * 2 * np.pi
+        # convert from THz to angular frequency in Hz; if there are several modes,
+        # the highest frequency gives the largest energy difference
+        pop_frequency = max(get_pop_frequencies(pop_frequency)) * 1e12 * 2 * np.pi
 
         # use the phonon energy to pad the fermi dirac cutoffs, this is because
         # pop scattering from a kpoints, k, to kpoints with energies above and below
@@ -1,15 +1,16 @@
 import logging
 import time
-from typing import List, Union
+from typing import Dict, List, Optional, Union
 
 import numpy as np
 from BoltzTraP2.bandlib import calc_Onsager_coefficients
+from pymatgen.electronic_structure.core import Spin
 
 from amset.constants import bohr_to_cm, defaults, e_si
 from amset.core.data import AmsetData
 from amset.interpolation.boltztrap import fermiintegrals
 from amset.log import log_time_taken
-from amset.util import get_progress_bar
+from amset.util import IrreducibleArray, get_progress_bar
 
 __author__ = "Alex Ganose"
 __maintainer__ = "Alex Ganose"
@@ -19,6 +20,9 @@ logger = logging.getLogger(__name__)
 
 _e_str = "Electronic structure must contain dopings, temperatures, and scattering rates"
 
+# maximum number of elements in the transport DOS integrand evaluated at once
+_max_integrand_size = 2**24
+
 
 def solve_boltzman_transport_equation(
     amset_data: AmsetData,
@@ -85,6 +89,13 @@ def _calculate_mobility(
         amset_data.dos.energies, sum_spins=True, use_cached_weights=True
     )
 
+    # only include the conduction (valence) bands for n-type (p-type) doping
+    band_idxs = [
+        _get_band_idx(amset_data.energies, amset_data.vb_idx, doping)
+        for doping in amset_data.doping
+    ]
+    all_vvdos = _get_all_transport_dos(amset_data, rate_idx, band_idxs=band_idxs)
+
     if pbar_label is not None:
         pbar = get_progress_bar(
             iterable=list(np.ndindex(amset_data.fermi_levels.shape)), desc=pbar_label
@@ -93,30 +104,18 @@ def _calculate_mobility(
         pbar = list(np.ndindex(amset_data.fermi_levels.shape))
 
     for n, t in pbar:
-        band_idx = _get_band_idx(
-            amset_data.energies, amset_data.vb_idx, amset_data.doping[n]
-        )
-
-        lifetimes = {
-            s: 1 / np.sum(amset_data.scattering_rates[s][rate_idx, n, t], axis=0)
-            for s in amset_data.spins
-        }
-
         # Nones are required as BoltzTraP2 expects the Fermi and temp as arrays
         fermi = amset_data.fermi_levels[n, t][None]
         temp = amset_data.temperatures[t][None]
 
         # obtain the Fermi integrals for the temperature and doping
-        vvdos = get_transport_dos(
-            amset_data.tetrahedral_band_structure,
-            amset_data.velocities_product,
-            lifetimes,
-            amset_data.dos.energies,
-            band_idx=band_idx,
-        )
-
         c, l0, l1, l2, lm11 = fermiintegrals(
-            epsilon, dos, vvdos, mur=fermi, Tr=temp, dosweight=amset_data.dos.dos_weight
+            epsilon,
+            dos,
+            all_vvdos[n, t],
+            mur=fermi,
+            Tr=temp,
+            dosweight=amset_data.dos.dos_weight,
         )
 
         # Compute the Onsager coefficients from Fermi integrals
@@ -151,33 +150,29 @@ def _calculate_transport_properties(
         amset_data.dos.energies, sum_spins=True, use_cached_weights=True
     )
 
+    # solve sigma, seebeck, kappa and hall using information from all bands
+    rate_idx = np.arange(len(amset_data.scattering_labels))
+    all_vvdos = _get_all_transport_dos(amset_data, rate_idx)
+
     iterable = list(np.ndindex(n_t_size))
     if progress_bar:
         pbar = get_progress_bar(iterable=iterable, desc="transport")
     else:
         pbar = iterable
 
-    # solve sigma, seebeck, kappa and hall using information from all bands
     for n, t in pbar:
-        lifetimes = {
-            s: 1 / np.sum(amset_data.scattering_rates[s][:, n, t], axis=0)
-            for s in amset_data.spins
-        }
-
         # Nones are required as BoltzTraP2 expects the Fermi and temp as arrays
         fermi = amset_data.fermi_levels[n, t][None]
         temp = amset_data.temperatures[t][None]
 
         # obtain the Fermi integrals
-        vvdos = get_transport_dos(
-            amset_data.tetrahedral_band_structure,
-            amset_data.velocities_product,
-            lifetimes,
-            amset_data.dos.energies,
-        )
-
         _, l0, l1, l2, lm11 = fermiintegrals(
-            epsilon, dos, vvdos, mur=fermi, Tr=temp, dosweight=amset_data.dos.dos_weight
+            epsilon,
+            dos,
+            all_vvdos[n, t],
+            mur=fermi,
+            Tr=temp,
+            dosweight=amset_data.dos.dos_weight,
         )
 
         # Compute the Onsager coefficients from Fermi integrals
@@ -226,6 +221,78 @@ def get_transport_dos(
     return vvdos
 
 
+def _get_all_transport_dos(
+    amset_data: AmsetData,
+    rate_idx: Union[List[int], np.ndarray],
+    band_idxs: Optional[List[Dict[Spin, np.ndarray]]] = None,
+) -> np.ndarray:
+    """Compute the transport DOS for all doping levels and temperatures at once.
+
+    The scattering rates are the same at symmetry equivalent k-points, so the
+    velocity products only need to be summed at equivalent k-points once, after which
+    they are weighted by the lifetimes at the irreducible k-points. The integrands
+    for all doping levels and temperatures are then integrated together using the
+    cached tetrahedron integration weights.
+
+    Args:
+        amset_data: The electronic structure and scattering rates.
+        rate_idx: The indices of the scattering rates to include.
+        band_idxs: The band indices to include for each doping level, given for
+            each spin channel. If None, all bands are included.
+
+    Returns:
+        The transport DOS with the shape (ndoping, ntemperatures, 3, 3, npts).
+    """
+    tbs = amset_data.tetrahedral_band_structure
+    ir_kpoints_idx = amset_data.ir_kpoints_idx
+    fermi_shape = amset_data.fermi_levels.shape
+    nfermi = amset_data.fermi_levels.size
+
+    vvdos = 0
+    for spin in amset_data.spins:
+        # sum the velocity products at equivalent k-points; vv has the shape
+        # (nbands, n_ir_kpoints, 3, 3)
+        vvband = amset_data.velocities_product[spin].transpose(0, 3, 1, 2)
+        vv = np.zeros((len(vvband), len(ir_kpoints_idx), 3, 3))
+        np.add.at(vv, (slice(None), tbs.ir_kpoint_mapping), vvband)
+
+        rates = amset_data.scattering_rates[spin]
+        if isinstance(rates, IrreducibleArray):
+            rates = rates.ir_data[rate_idx]
+        else:
+            rates = rates[rate_idx][..., ir_kpoints_idx]
+
+        # lifetimes has the shape (nbands, n_ir_kpoints, ndoping * ntemperatures)
+        lifetimes = 1 / np.sum(rates, axis=0)
+        lifetimes = lifetimes.reshape((nfermi,) + vv.shape[:2]).transpose(1, 2, 0)
+
+        if band_idxs is not None:
+            band_mask = np.zeros(fermi_shape + vv.shape[:1], dtype=bool)
+            for n, doping_band_idx in enumerate(band_idxs):
+                band_mask[n, :, doping_band_idx[spin]] = True
+            band_mask = band_mask.reshape(nfermi, -1).T
+            lifetimes = np.where(band_mask[:, None], lifetimes, 0)
+
+        # integrate the doping levels and temperatures in batches to limit memory
+        batch_size = max(_max_integrand_size // vv.size, 1)
+        spin_vvdos = []
+        for start in range(0, nfermi, batch_size):
+            integrand = (
+                vv[:, :, None] * lifetimes[:, :, start : start + batch_size, None, None]
+            )
+            _, batch_vvdos = tbs.get_spin_density_of_states(
+                spin,
+                amset_data.dos.energies,
+                integrand=integrand,
+                use_cached_weights=True,
+            )
+            spin_vvdos.append(batch_vvdos)
+        vvdos = vvdos + np.concatenate(spin_vvdos, axis=1)
+
+    # vvdos is npts, nfermi, 3, 3 it should be ndoping, ntemperatures, 3, 3, npts
+    return vvdos.transpose(1, 2, 3, 0).reshape(fermi_shape + (3, 3, -1))
+
+
 def _get_band_idx(energies, vb_idx, doping):
     band_idx = {}
     for spin, spin_energies in energies.items():
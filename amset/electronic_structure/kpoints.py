@@ -7,6 +7,7 @@ from pymatgen.io.ase import AseAtomsAdaptor
 from spglib import spglib
 
 from amset.constants import defaults, ktol
+from amset.util import get_index_dtype
 
 __author__ = "Alex Ganose"
 __maintainer__ = "Alex Ganose"
@@ -107,7 +108,9 @@ def get_kpoints_tetrahedral(
         in ``kpoints``. ``ir_to_full_idx`` is a list of indices that can be
         used to construct the full Brillouin zone from the ir_mesh. Note the
         ir -> full conversion will only work with calculated scalar properties
-        such as energy (not vector properties such as velocity).
+        such as energy (not vector properties such as velocity). The k-point and
+        tetrahedra indices are stored as 32-bit integers unless the mesh is too
+        large.
     """
     from amset.electronic_structure.tetrahedron import get_tetrahedra
 
@@ -141,6 +144,10 @@ def get_kpoints_tetrahedral(
     )
     ir_kpoints = full_kpoints[ir_kpoints_idx]
 
+    index_dtype = get_index_dtype(len(full_kpoints))
+    ir_kpoints_idx = ir_kpoints_idx.astype(index_dtype)
+    ir_to_full_idx = ir_to_full_idx.astype(index_dtype)
+
     return (
         ir_kpoints,
         weights,
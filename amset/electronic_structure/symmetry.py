@@ -198,6 +198,53 @@ def get_reciprocal_point_group_operations(
     return rotations[sort_idx], translations[sort_idx], is_tr[sort_idx]
 
 
+def get_kpoint_symmetry_mapping(
+    structure: Structure,
+    kpoints: np.ndarray,
+    kpoint_mesh: np.ndarray,
+    symprec: float = defaults["symprec"],
+    time_reversal: bool = True,
+) -> np.ndarray:
+    """Get the index of each k-point after applying the reciprocal symmetry operations.
+
+    Args:
+        structure: A structure.
+        kpoints: The k-points of a uniform Γ-centered mesh, in fractional
+            coordinates.
+        kpoint_mesh: The k-point mesh as a 1x3 array. E.g.,``[6, 6, 6]``.
+        symprec: The symmetry tolerance used to determine the space group.
+        time_reversal: Whether the system has time reversal symmetry.
+
+    Returns:
+        The mapping as an array with the shape (noperations, nkpoints), where
+        ``mapping[i, j]`` is the index of the k-point obtained by applying operation
+        ``i`` to k-point ``j``. The identity operation is always first. Operations that
+        do not map the mesh onto itself are not included.
+    """
+    kpoint_mesh = np.asarray(kpoint_mesh, dtype=int)
+    rotations, _, _ = get_reciprocal_point_group_operations(
+        structure, symprec=symprec, time_reversal=time_reversal
+    )
+
+    grid_order = np.array([1, kpoint_mesh[0], kpoint_mesh[0] * kpoint_mesh[1]])
+    addresses = np.rint(kpoints * kpoint_mesh).astype(int)
+    lookup = np.full(np.prod(kpoint_mesh), -1)
+    lookup[np.dot(addresses % kpoint_mesh, grid_order)] = np.arange(len(kpoints))
+
+    mapping = []
+    for rotation in rotations:
+        # ops that don't preserve the mesh give non-integer addresses
+        rotated = np.dot(addresses / kpoint_mesh, rotation.T) * kpoint_mesh
+        rotated_addresses = np.rint(rotated).astype(int)
+        if np.abs(rotated - rotated_addresses).max() > 1e-5:
+            continue
+
+        rotated_idx = lookup[np.dot(rotated_addresses % kpoint_mesh, grid_order)]
+        if np.all(rotated_idx != -1):
+            mapping.append(rotated_idx)
+    return np.array(mapping)
+
+
 def expand_bandstructure(
     bandstructure, symprec=defaults["symprec"], time_reversal=True
 ):
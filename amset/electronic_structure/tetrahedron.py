@@ -1,21 +1,26 @@
+import itertools
 import logging
 import time
-from typing import Dict, List, Optional, Union
+from functools import partial
+from typing import Dict, List, Optional, Tuple, Union
 
+import numba
 import numpy as np
 from pymatgen.core.structure import Structure
 from pymatgen.electronic_structure.core import Spin
 from pymatgen.util.coord import pbc_diff
+from scipy import sparse
 
 from amset.constants import numeric_types
 from amset.log import log_time_taken
 from amset.util import (
+    LazyBandArray,
     array_from_buffer,
     create_shared_array,
     create_shared_dict_array,
     dict_array_from_buffer,
+    get_index_dtype,
     get_progress_bar,
-    groupby,
 )
 
 __author__ = "Alex Ganose"
@@ -65,6 +70,44 @@ _tetrahedron_vectors = np.array(
 
 logger = logging.getLogger(__name__)
 
+# the integration weights are calculated in blocks of energies, with at most this many
+# elements in each dense block, before being stored as a sparse matrix
+_max_weights_block_size = 2**23
+
+# band dependent properties that are only calculated for the bands that are used
+_band_property_names = (
+    "vertex_order",
+    "e21",
+    "e31",
+    "e41",
+    "e32",
+    "e42",
+    "e43",
+    "cross_section_weights",
+)
+
+# the tetrahedron vertices used to calculate each energy difference
+_energy_diff_vertices = {
+    "e21": (1, 0),
+    "e31": (2, 0),
+    "e41": (3, 0),
+    "e32": (2, 1),
+    "e42": (3, 1),
+    "e43": (3, 2),
+}
+
+# the orderings of the four vertices of a tetrahedron; the order of the vertices of
+# each tetrahedron in the full mesh, sorted by energy, is stored as the (uint8) index
+# of the ordering in this table, rather than as a copy of the sorted tetrahedra
+_vertex_permutations = np.array(list(itertools.permutations(range(4))))
+
+# maps an ordering, encoded as a base 4 number, to its index in _vertex_permutations
+_permutation_base = 4 ** np.arange(4)
+_permutation_codes = np.zeros(4**4, dtype=np.uint8)
+_permutation_codes[_vertex_permutations @ _permutation_base] = np.arange(
+    len(_vertex_permutations)
+)
+
 
 def get_main_diagonal(reciprocal_lattice: np.ndarray) -> int:
     # want a list of tetrahedra as (k1, k2, k3, k4); as per the Bloechl paper,
@@ -116,13 +159,18 @@ def get_tetrahedra(
     tetrahedron_vertices = get_relative_tetrahedron_vertices(reciprocal_lattice)
 
     grid_order = [1, mesh[0], mesh[0] * mesh[1]]
+    index_dtype = get_index_dtype(len(grid_address) * len(tetrahedron_vertices))
 
-    all_grid_points = np.repeat(grid_address, [24] * len(grid_address), axis=0)
-    all_vertices = np.tile(tetrahedron_vertices, (len(grid_address), 1, 1))
-    points = all_grid_points.reshape(all_vertices.shape) + all_vertices
-
-    # fancy magic from phonopy to get neighboring indices given relative coordinates
-    tetrahedra = np.dot(points % mesh, grid_order)
+    # fancy magic from phonopy to get neighboring indices given relative coordinates;
+    # the indices are accumulated one axis at a time to avoid large intermediate
+    # arrays of the vertex coordinates
+    tetrahedra = np.zeros(
+        (len(grid_address),) + tetrahedron_vertices.shape[:2], dtype=index_dtype
+    )
+    for i in range(3):
+        axis_points = grid_address[:, None, None, i] + tetrahedron_vertices[..., i]
+        tetrahedra += (axis_points % mesh[i]).astype(index_dtype) * grid_order[i]
+    tetrahedra = tetrahedra.reshape(-1, 4)
 
     ir_tetrahedra_vertices = grid_address_mapping[tetrahedra]
     _, ir_tetrahedra_idx, ir_tetrahedra_to_full_idx, ir_weights = np.unique(
@@ -133,7 +181,12 @@ def get_tetrahedra(
         return_counts=True,
     )
 
-    return tetrahedra, ir_tetrahedra_idx, ir_tetrahedra_to_full_idx, ir_weights
+    return (
+        tetrahedra,
+        ir_tetrahedra_idx.astype(index_dtype),
+        ir_tetrahedra_to_full_idx.reshape(-1).astype(index_dtype),
+        ir_weights,
+    )
 
 
 class TetrahedralBandStructure:
@@ -144,61 +197,112 @@ class TetrahedralBandStructure:
         ir_kpoints_idx: np.ndarray,
         ir_kpoint_mapping: np.ndarray,
         ir_kpoint_weights: np.ndarray,
-        tetrahedra: Dict[Spin, np.ndarray],
+        tetrahedra: np.ndarray,
         ir_tetrahedra: Dict[Spin, np.ndarray],
         ir_tetrahedra_energies: Dict[Spin, np.ndarray],
         ir_tetrahedra_idx: np.ndarray,
         ir_tetrahedra_to_full_idx: np.ndarray,
         ir_tetrahedra_weights: np.ndarray,
-        e21: Dict[Spin, np.ndarray],
-        e31: Dict[Spin, np.ndarray],
-        e41: Dict[Spin, np.ndarray],
-        e32: Dict[Spin, np.ndarray],
-        e42: Dict[Spin, np.ndarray],
-        e43: Dict[Spin, np.ndarray],
-        max_tetrahedra_energies: Dict[Spin, np.ndarray],
-        min_tetrahedra_energies: Dict[Spin, np.ndarray],
-        cross_section_weights: Dict[Spin, np.ndarray],
+        reciprocal_lattice: np.ndarray,
         tetrahedron_volume: float,
-        weights_cache: Optional[Dict[Spin, np.ndarray]] = None,
-        weights_mask_cache: Optional[Dict[Spin, np.ndarray]] = None,
+        energy_diff_dtype: Union[type, np.dtype] = np.float64,
+        band_properties: Optional[Dict[str, Dict[Spin, tuple]]] = None,
+        weights_cache: Optional[Dict[Spin, sparse.csr_matrix]] = None,
         energies_cache: Optional[Dict[Spin, np.ndarray]] = None,
+        min_energy_order: Optional[Dict[Spin, np.ndarray]] = None,
+        sorted_min_energies: Optional[Dict[Spin, np.ndarray]] = None,
+        ir_to_full_order: Optional[np.ndarray] = None,
     ):
         self.energies = energies
         self.kpoints = kpoints
         self.ir_kpoints_idx = ir_kpoints_idx
         self.ir_kpoint_mapping = ir_kpoint_mapping
         self.ir_kpoint_weights = ir_kpoint_weights
-        self.tetrahedra = tetrahedra
+        self.mesh_tetrahedra = tetrahedra
         self.ir_tetrahedra = ir_tetrahedra
         self.ir_tetrahedra_energies = ir_tetrahedra_energies
         self.ir_tetrahedra_idx = ir_tetrahedra_idx
         self.ir_tetrahedra_to_full_idx = ir_tetrahedra_to_full_idx
         self.ir_tetrahedra_weights = ir_tetrahedra_weights
-        self.e21 = e21
-        self.e31 = e31
-        self.e41 = e41
-        self.e32 = e32
-        self.e42 = e42
-        self.e43 = e43
-        self.max_tetrahedra_energies = max_tetrahedra_energies
-        self.min_tetrahedra_energies = min_tetrahedra_energies
-        self.cross_section_weights = cross_section_weights
+        self.reciprocal_lattice = reciprocal_lattice
+        self.energy_diff_dtype = np.dtype(energy_diff_dtype)
         self._tetrahedron_volume = tetrahedron_volume
         self._weights_cache = {} if weights_cache is None else weights_cache
-        self._weights_mask_cache = (
-            {} if weights_mask_cache is None else weights_mask_cache
-        )
         self._energies_cache = {} if energies_cache is None else energies_cache
 
-        self.grouped_ir_to_full = groupby(
-            np.arange(len(ir_tetrahedra_to_full_idx)), ir_tetrahedra_to_full_idx
+        # the tetrahedra vertex energies are sorted, so the min and max energies are
+        # views of the first and last vertex energies
+        self.min_tetrahedra_energies = {
+            s: e[..., 0] for s, e in ir_tetrahedra_energies.items()
+        }
+        self.max_tetrahedra_energies = {
+            s: e[..., 3] for s, e in ir_tetrahedra_energies.items()
+        }
+
+        # the remaining properties are only needed for bands that are scattered, so
+        # they are calculated for each band the first time the band is used
+        band_properties = {} if band_properties is None else band_properties
+        for name in _band_property_names:
+            setattr(
+                self,
+                name,
+                {
+                    s: self._get_band_property_array(
+                        name, s, *band_properties.get(name, {}).get(s, ())
+                    )
+                    for s in energies
+                },
+            )
+
+        if min_energy_order is None or sorted_min_energies is None:
+            min_energy_order, sorted_min_energies = get_tetrahedra_energy_index(
+                self.min_tetrahedra_energies
+            )
+        self._min_energy_order = min_energy_order
+        self._sorted_min_energies = sorted_min_energies
+
+        # no tetrahedron spans a wider energy range than this, used to bound the
+        # search for intersecting tetrahedra
+        self._max_energy_spans = {
+            s: np.max(
+                self.max_tetrahedra_energies[s] - self.min_tetrahedra_energies[s],
+                axis=1,
+            )
+            for s in energies
+        }
+
+        # the full tetrahedra equivalent to each irreducible tetrahedron, stored in
+        # compressed sparse row format; the full tetrahedra of the ith irreducible
+        # tetrahedron are ir_to_full_order[offsets[i]:offsets[i + 1]]
+        if ir_to_full_order is None:
+            ir_to_full_order = np.argsort(
+                ir_tetrahedra_to_full_idx, kind="stable"
+            ).astype(ir_tetrahedra_to_full_idx.dtype)
+        self._ir_to_full_order = ir_to_full_order
+        self._ir_to_full_offsets = np.concatenate(
+            [[0], np.cumsum(ir_tetrahedra_weights)]
         )
+
+        # cumulative weights of the tetrahedra sorted by min and max energy, used to
+        # count intersecting tetrahedra; only calculated when needed
+        self._intersection_count_index = {}
         self._ir_weights_shape = {
             s: (len(energies[s]), len(ir_kpoints_idx)) for s in energies
         }
 
-    def to_reference(self):
+    def to_reference(self, energy_range: Optional[Tuple[float, float]] = None):
+        """Move the band structure to shared memory.
+
+        Args:
+            energy_range: The minimum and maximum energy of the bands that will be
+                used. The full tetrahedra, energy differences and cross section
+                weights of bands with energies in this range are calculated directly
+                in shared memory, rather than by each process separately.
+
+        Returns:
+            A reference to the band structure, which can be used to create the band
+            structure in another process using ``from_reference``.
+        """
         energies_buffer, self.energies = create_shared_dict_array(
             self.energies, return_shared_data=True
         )
@@ -214,8 +318,8 @@ class TetrahedralBandStructure:
         ir_kpoint_weights_buffer, self.ir_kpoint_weights = create_shared_array(
             self.ir_kpoint_weights, return_shared_data=True
         )
-        tetrahedra_buffer, self.tetrahedra = create_shared_dict_array(
-            self.tetrahedra, return_shared_data=True
+        tetrahedra_buffer, self.mesh_tetrahedra = create_shared_array(
+            self.mesh_tetrahedra, return_shared_data=True
         )
         ir_tetrahedra_buffer, self.ir_tetrahedra = create_shared_dict_array(
             self.ir_tetrahedra, return_shared_data=True
@@ -236,50 +340,33 @@ class TetrahedralBandStructure:
         ir_tetrahedra_weights_buffer, self.ir_tetrahedra_weights = create_shared_array(
             self.ir_tetrahedra_weights, return_shared_data=True
         )
-        e21_buffer, self.e21 = create_shared_dict_array(
-            self.e21, return_shared_data=True
-        )
-        e31_buffer, self.e31 = create_shared_dict_array(
-            self.e31, return_shared_data=True
-        )
-        e41_buffer, self.e41 = create_shared_dict_array(
-            self.e41, return_shared_data=True
-        )
-        e32_buffer, self.e32 = create_shared_dict_array(
-            self.e32, return_shared_data=True
-        )
-        e42_buffer, self.e42 = create_shared_dict_array(
-            self.e42, return_shared_data=True
-        )
-        e43_buffer, self.e43 = create_shared_dict_array(
-            self.e43, return_shared_data=True
+        self.min_tetrahedra_energies = {
+            s: e[..., 0] for s, e in self.ir_tetrahedra_energies.items()
+        }
+        self.max_tetrahedra_energies = {
+            s: e[..., 3] for s, e in self.ir_tetrahedra_energies.items()
+        }
+        band_properties_buffer = {}
+        for name in _band_property_names:
+            band_properties_buffer[name] = {}
+            for spin, array in getattr(self, name).items():
+                band_idxs = self._get_band_idxs(spin, energy_range)
+                band_properties_buffer[name][spin] = array.to_shared(band_idxs)
+        weights_cache_buffer, self._weights_cache = _create_shared_weights_cache(
+            self._weights_cache
         )
-        (
-            max_tetrahedra_energies_buffer,
-            self.max_tetrahedra_energies,
-        ) = create_shared_dict_array(
-            self.max_tetrahedra_energies, return_shared_data=True
+        energies_cache_buffer, self._energies_cache = create_shared_dict_array(
+            self._energies_cache, return_shared_data=True
         )
-        (
-            min_tetrahedra_energies_buffer,
-            self.min_tetrahedra_energies,
-        ) = create_shared_dict_array(
-            self.min_tetrahedra_energies, return_shared_data=True
+        min_energy_order_buffer, self._min_energy_order = create_shared_dict_array(
+            self._min_energy_order, return_shared_data=True
         )
         (
-            cross_section_weights_buffer,
-            self.cross_section_weights,
-        ) = create_shared_dict_array(
-            self.cross_section_weights, return_shared_data=True
-        )
-        weights_cache_buffer, self._weights_cache = create_shared_dict_array(
-            self._weights_cache, return_shared_data=True
-        )
-        weights_mask_cache_buffer, self._weights_mask_cache = create_shared_dict_array(
-            self._weights_mask_cache, return_shared_data=True
-        )
-        energies_cache_buffer, self._energies_cache = create_shared_dict_array(
-            self._energies_cache, return_shared_data=True
+            sorted_min_energies_buffer,
+            self._sorted_min_energies,
+        ) = create_shared_dict_array(self._sorted_min_energies, return_shared_data=True)
+        ir_to_full_order_buffer, self._ir_to_full_order = create_shared_array(
+            self._ir_to_full_order, return_shared_data=True
         )
 
         return (
@@ -294,19 +381,15 @@ class TetrahedralBandStructure:
             ir_tetrahedra_idx_buffer,
             ir_tetrahedra_to_full_idx_buffer,
             ir_tetrahedra_weights_buffer,
-            e21_buffer,
-            e31_buffer,
-            e41_buffer,
-            e32_buffer,
-            e42_buffer,
-            e43_buffer,
-            max_tetrahedra_energies_buffer,
-            min_tetrahedra_energies_buffer,
-            cross_section_weights_buffer,
+            self.reciprocal_lattice,
             self._tetrahedron_volume,
+            self.energy_diff_dtype,
+            band_properties_buffer,
             weights_cache_buffer,
-            weights_mask_cache_buffer,
             energies_cache_buffer,
+            min_energy_order_buffer,
+            sorted_min_energies_buffer,
+            ir_to_full_order_buffer,
         )
 
     @classmethod
@@ -323,19 +406,15 @@ class TetrahedralBandStructure:
         ir_tetrahedra_idx_buffer,
         ir_tetrahedra_to_full_idx_buffer,
         ir_tetrahedra_weights_buffer,
-        e21_buffer,
-        e31_buffer,
-        e41_buffer,
-        e32_buffer,
-        e42_buffer,
-        e43_buffer,
-        max_tetrahedra_energies_buffer,
-        min_tetrahedra_energies_buffer,
-        cross_section_weights_buffer,
+        reciprocal_lattice,
         tetrahedron_volume,
+        energy_diff_dtype,
+        band_properties_buffer,
         weights_cache_buffer,
-        weights_mask_cache_buffer,
         energies_cache_buffer,
+        min_energy_order_buffer,
+        sorted_min_energies_buffer,
+        ir_to_full_order_buffer,
     ):
         return cls(
             dict_array_from_buffer(energies_buffer),
@@ -343,25 +422,21 @@ class TetrahedralBandStructure:
             array_from_buffer(ir_kpoints_idx_buffer),
             array_from_buffer(ir_kpoint_mapping_buffer),
             array_from_buffer(ir_kpoint_weights_buffer),
-            dict_array_from_buffer(tetrahedra_buffer),
+            array_from_buffer(tetrahedra_buffer),
             dict_array_from_buffer(ir_tetrahedra_buffer),
             dict_array_from_buffer(ir_tetrahedra_energies_buffer),
             array_from_buffer(ir_tetrahedra_idx_buffer),
             array_from_buffer(ir_tetrahedra_to_full_idx_buffer),
             array_from_buffer(ir_tetrahedra_weights_buffer),
-            dict_array_from_buffer(e21_buffer),
-            dict_array_from_buffer(e31_buffer),
-            dict_array_from_buffer(e41_buffer),
-            dict_array_from_buffer(e32_buffer),
-            dict_array_from_buffer(e42_buffer),
-            dict_array_from_buffer(e43_buffer),
-            dict_array_from_buffer(max_tetrahedra_energies_buffer),
-            dict_array_from_buffer(min_tetrahedra_energies_buffer),
-            dict_array_from_buffer(cross_section_weights_buffer),
+            reciprocal_lattice,
             tetrahedron_volume,
-            dict_array_from_buffer(weights_cache_buffer),
-            dict_array_from_buffer(weights_mask_cache_buffer),
-            dict_array_from_buffer(energies_cache_buffer),
+            energy_diff_dtype=energy_diff_dtype,
+            band_properties=_band_properties_from_buffer(band_properties_buffer),
+            weights_cache=_weights_cache_from_buffer(weights_cache_buffer),
+            energies_cache=dict_array_from_buffer(energies_cache_buffer),
+            min_energy_order=dict_array_from_buffer(min_energy_order_buffer),
+            sorted_min_energies=dict_array_from_buffer(sorted_min_energies_buffer),
+            ir_to_full_order=array_from_buffer(ir_to_full_order_buffer),
         )
 
     @classmethod
@@ -376,6 +451,7 @@ class TetrahedralBandStructure:
         ir_tetrahedra_idx: Optional[np.ndarray] = None,
         ir_tetrahedra_to_full_idx: Optional[np.ndarray] = None,
         ir_tetrahedra_weights: Optional[np.ndarray] = None,
+        energy_diff_dtype: Union[type, np.dtype] = np.float64,
     ):
         logger.info("Initializing tetrahedron band structure")
         t0 = time.perf_counter()
@@ -392,40 +468,16 @@ class TetrahedralBandStructure:
             ir_tetrahedra_to_full_idx = np.ones_like(ir_tetrahedra_idx)
             ir_tetrahedra_weights = np.ones_like(ir_tetrahedra_idx)
 
-        ir_tetrahedra_to_full_idx = ir_tetrahedra_to_full_idx
-        ir_kpoints_idx = ir_kpoints_idx
-        ir_kpoint_mapping = ir_kpoint_mapping
-
         _, ir_kpoint_weights = np.unique(ir_kpoint_mapping, return_counts=True)
 
-        # need to keep track of full tetrahedra to recover full k-point indices
-        # when calculating scattering rates (i.e., k-k' is symmetry inequivalent).
-        full_tetrahedra, _ = process_tetrahedra(tetrahedra, energies)
-
-        # store irreducible tetrahedra and use energies to calculate diffs and min/maxes
+        # store irreducible tetrahedra sorted by energy; the energy differences,
+        # cross section weights and the full tetrahedra (needed to recover the full
+        # k-point indices when calculating scattering rates) are only calculated for
+        # the bands that are used
         ir_tetrahedra, ir_tetrahedra_energies = process_tetrahedra(
             tetrahedra[ir_tetrahedra_idx], energies
         )
 
-        # the remaining properties are given for each irreducible tetrahedra
-        (e21, e31, e41, e32, e42, e43) = get_tetrahedra_energy_diffs(
-            ir_tetrahedra_energies
-        )
-
-        (
-            max_tetrahedra_energies,
-            min_tetrahedra_energies,
-        ) = get_max_min_tetrahedra_energies(ir_tetrahedra_energies)
-
-        cross_section_weights = get_tetrahedra_cross_section_weights(
-            structure.lattice.reciprocal_lattice.matrix,
-            kpoints,
-            ir_tetrahedra,
-            e21,
-            e31,
-            e41,
-        )
-
         tetrahedron_volume = 1 / len(tetrahedra)
 
         log_time_taken(t0)
@@ -435,24 +487,121 @@ class TetrahedralBandStructure:
             ir_kpoints_idx,
             ir_kpoint_mapping,
             ir_kpoint_weights,
-            full_tetrahedra,
+            tetrahedra,
             ir_tetrahedra,
             ir_tetrahedra_energies,
             ir_tetrahedra_idx,
             ir_tetrahedra_to_full_idx,
             ir_tetrahedra_weights,
-            e21,
-            e31,
-            e41,
-            e32,
-            e42,
-            e43,
-            max_tetrahedra_energies,
-            min_tetrahedra_energies,
-            cross_section_weights,
+            structure.lattice.reciprocal_lattice.matrix,
             tetrahedron_volume,
+            energy_diff_dtype=energy_diff_dtype,
         )
 
+    @property
+    def nbytes(self) -> int:
+        """The memory used by the band structure arrays, in bytes."""
+        nbytes = 0
+        for name, value in vars(self).items():
+            if name in ("min_tetrahedra_energies", "max_tetrahedra_energies"):
+                # views of the tetrahedra energies
+                continue
+
+            values = value.values() if isinstance(value, dict) else [value]
+            for v in values:
+                if isinstance(v, LazyBandArray):
+                    nbytes += v.nbytes
+                elif isinstance(v, sparse.csr_matrix):
+                    nbytes += v.data.nbytes + v.indices.nbytes + v.indptr.nbytes
+                elif isinstance(v, np.ndarray):
+                    nbytes += v.nbytes
+        return nbytes
+
+    def _get_band_idxs(self, spin, energy_range=None):
+        # get the bands with any energies inside an energy range
+        if energy_range is None:
+            return np.zeros(0, dtype=int)
+        return np.where(
+            (self.energies[spin].max(axis=1) > energy_range[0])
+            & (self.energies[spin].min(axis=1) < energy_range[1])
+        )[0]
+
+    def _get_band_property_array(self, name, spin, data=None, band_rows=None):
+        nbands = len(self.energies[spin])
+        if name == "vertex_order":
+            return LazyBandArray(
+                (nbands, len(self.mesh_tetrahedra)),
+                partial(self._get_band_vertex_order, spin),
+                dtype=np.uint8,
+                data=data,
+                band_rows=band_rows,
+            )
+
+        shape = (nbands, len(self.ir_tetrahedra_idx))
+        if name == "cross_section_weights":
+            return LazyBandArray(
+                shape,
+                partial(self._get_band_cross_section_weights, spin),
+                data=data,
+                band_rows=band_rows,
+            )
+
+        return LazyBandArray(
+            shape,
+            partial(self._get_band_energy_diffs, spin, *_energy_diff_vertices[name]),
+            dtype=self.energy_diff_dtype,
+            data=data,
+            band_rows=band_rows,
+        )
+
+    def _get_band_vertex_order(self, spin, band_idxs):
+        # same sorting as process_tetrahedra, but only the ordering is stored
+        vertex_order = np.zeros((len(band_idxs), len(self.mesh_tetrahedra)), np.uint8)
+        for i, band_idx in enumerate(band_idxs):
+            band_energies = self.energies[spin][band_idx][self.mesh_tetrahedra]
+            sort_idx = np.argsort(band_energies, axis=1)
+            vertex_order[i] = _permutation_codes[sort_idx @ _permutation_base]
+        return vertex_order
+
+    def _get_full_tetrahedra_idx(self, ir_tetrahedra_idx):
+        # get the indices of the full tetrahedra equivalent to irreducible tetrahedra,
+        # in the same order as concatenating their groups of full tetrahedra
+        counts = self.ir_tetrahedra_weights[ir_tetrahedra_idx]
+        starts = self._ir_to_full_offsets[ir_tetrahedra_idx]
+        group_starts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+        return self._ir_to_full_order[group_starts + np.arange(len(group_starts))]
+
+    def _get_band_energy_diffs(self, spin, i, j, band_idxs):
+        energies = self.ir_tetrahedra_energies[spin][band_idxs]
+        return energies[..., i] - energies[..., j]
+
+    def _get_band_cross_section_weights(self, spin, band_idxs):
+        # always use double precision energy differences for the weights
+        diffs = [self._get_band_energy_diffs(spin, i, 0, band_idxs) for i in (1, 2, 3)]
+        cross_section_weights = get_tetrahedra_cross_section_weights(
+            self.reciprocal_lattice,
+            self.kpoints,
+            {spin: self.ir_tetrahedra[spin][band_idxs]},
+            *({spin: d} for d in diffs),
+        )
+        return cross_section_weights[spin]
+
+    def get_sorted_tetrahedra(self, spin, tetrahedra_mask):
+        """Get the k-point indices of tetrahedra, sorted by the vertex energies.
+
+        Args:
+            spin: The spin channel.
+            tetrahedra_mask: The band and tetrahedron indices of the tetrahedra, as
+                generated with ``symmetry_reduce=False``.
+
+        Returns:
+            The k-point indices of the tetrahedra vertices, with the shape
+            (ntetrahedra, 4).
+        """
+        order = _vertex_permutations[self.vertex_order[spin][tetrahedra_mask]]
+        tetrahedra = self.mesh_tetrahedra[tetrahedra_mask[1]]
+        return np.take_along_axis(tetrahedra, order, axis=1)
+
     def get_connected_kpoints(self, kpoint_idx: Union[int, List[int], np.ndarray]):
         """Given one or more k-point indices, get a list of all k-points that are in
         the same tetrahedra
@@ -466,21 +615,118 @@ class TetrahedralBandStructure:
         if isinstance(kpoint_idx, numeric_types):
             kpoint_idx = [kpoint_idx]
 
-        tetrahedra = self.tetrahedra[Spin.up][0]
+        tetrahedra = self.mesh_tetrahedra
         return np.unique(tetrahedra[np.isin(tetrahedra, kpoint_idx).any(axis=1)])
 
-    def get_intersecting_tetrahedra(self, spin, energy, band_idx=None):
-        max_energies = self.max_tetrahedra_energies[spin]
-        min_energies = self.min_tetrahedra_energies[spin]
+    def count_intersecting_tetrahedra(self, spin, energies):
+        """Count the tetrahedra in the full Brillouin zone that intersect energies.
 
-        if band_idx is not None:
-            mask = np.full_like(max_energies, False, dtype=bool)
-            mask[band_idx] = True
+        The counts include the tetrahedra in all bands and are obtained from the
+        sorted tetrahedra min and max energies, so the individual tetrahedra are never
+        found. This is useful as a cheap estimate of the cost of integrating over the
+        cross sections at an energy. Unlike ``get_intersecting_tetrahedra``,
+        tetrahedra with a max energy equal to the energy are included.
 
-            return (min_energies < energy) & (max_energies > energy) & mask
+        Args:
+            spin: The spin channel.
+            energies: One or more energies.
 
+        Returns:
+            The number of intersecting tetrahedra for each energy.
+        """
+        if spin not in self._intersection_count_index:
+            weights = self.ir_tetrahedra_weights
+            max_order = np.argsort(self.max_tetrahedra_energies[spin], axis=1)
+            sorted_max_energies = np.take_along_axis(
+                self.max_tetrahedra_energies[spin], max_order, axis=1
+            )
+
+            # pad with zeros so that the cumulative weight of the first n tetrahedra
+            # is found at index n
+            pad = ((0, 0), (1, 0))
+            cum_min_weights = np.pad(
+                np.cumsum(weights[self._min_energy_order[spin]], axis=1), pad
+            )
+            cum_max_weights = np.pad(np.cumsum(weights[max_order], axis=1), pad)
+            self._intersection_count_index[spin] = (
+                sorted_max_energies,
+                cum_min_weights,
+                cum_max_weights,
+            )
+
+        sorted_max_energies, cum_min_weights, cum_max_weights = (
+            self._intersection_count_index[spin]
+        )
+        sorted_min_energies = self._sorted_min_energies[spin]
+
+        # tetrahedra with min < energy, minus those that also have max < energy
+        energies = np.asarray(energies)
+        counts = np.zeros(energies.shape, dtype=int)
+        for b_idx in range(len(sorted_min_energies)):
+            n_min = np.searchsorted(sorted_min_energies[b_idx], energies, "left")
+            n_max = np.searchsorted(sorted_max_energies[b_idx], energies, "left")
+            counts += cum_min_weights[b_idx, n_min] - cum_max_weights[b_idx, n_max]
+        return counts
+
+    def get_intersecting_tetrahedra(
+        self, spin, energy, band_idx=None, return_indices=False
+    ):
+        """Get the irreducible tetrahedra that intersect an energy.
+
+        The tetrahedra are found using the energy index built on initialisation, so
+        the cost scales with the number of intersecting tetrahedra rather than the
+        total number of tetrahedra.
+
+        Args:
+            spin: The spin channel.
+            energy: The energy.
+            band_idx: One or more band indices to restrict the search to.
+            return_indices: Whether to return the band and tetrahedron indices of
+                the intersecting tetrahedra instead of a boolean mask. The indices
+                are in the same order as ``np.where`` applied to the mask.
+
+        Returns:
+            A boolean mask with the shape (nbands, n_ir_tetrahedra), or a tuple of
+            (band_idx, tetrahedra_idx) if ``return_indices`` is True.
+        """
+        max_energies = self.max_tetrahedra_energies[spin]
+        order = self._min_energy_order[spin]
+        sorted_min_energies = self._sorted_min_energies[spin]
+        max_spans = self._max_energy_spans[spin]
+
+        if band_idx is None:
+            bands = range(len(max_energies))
         else:
-            return (min_energies < energy) & (max_energies > energy)
+            bands = np.unique(band_idx)
+
+        band_idxs = []
+        tetrahedra_idxs = []
+        for b_idx in bands:
+            # only tetrahedra with max_span > energy - min > 0 can intersect
+            b_min_energies = sorted_min_energies[b_idx]
+            start = np.searchsorted(b_min_energies, energy - max_spans[b_idx], "left")
+            end = np.searchsorted(b_min_energies, energy, "left")
+            if start >= end:
+                continue
+
+            candidates = order[b_idx, start:end]
+            hits = np.sort(candidates[max_energies[b_idx, candidates] > energy])
+            band_idxs.append(np.full(len(hits), b_idx))
+            tetrahedra_idxs.append(hits)
+
+        if band_idxs:
+            band_idxs = np.concatenate(band_idxs)
+            tetrahedra_idxs = np.concatenate(tetrahedra_idxs)
+        else:
+            band_idxs = np.zeros(0, dtype=int)
+            tetrahedra_idxs = np.zeros(0, dtype=int)
+
+        if return_indices:
+            return band_idxs, tetrahedra_idxs
+
+        mask = np.full(max_energies.shape, False)
+        mask[band_idxs, tetrahedra_idxs] = True
+        return mask
 
     def get_tetrahedra_density_of_states(
         self,
@@ -491,10 +737,10 @@ class TetrahedralBandStructure:
         band_idx=None,
     ):
         tetrahedra_mask = self.get_intersecting_tetrahedra(
-            spin, energy, band_idx=band_idx
+            spin, energy, band_idx=band_idx, return_indices=True
         )
 
-        if not np.any(tetrahedra_mask):
+        if len(tetrahedra_mask[0]) == 0:
             if return_contributions:
                 return [], [], [], []
             else:
@@ -538,7 +784,7 @@ class TetrahedralBandStructure:
 
         tetrahedra_dos *= self._tetrahedron_volume
 
-        band_idx, tetrahedra_idx = np.where(tetrahedra_mask)
+        band_idx, tetrahedra_idx = tetrahedra_mask
         tetrahedra_weights = self.ir_tetrahedra_weights[tetrahedra_idx]
 
         if symmetry_reduce:
@@ -547,10 +793,7 @@ class TetrahedralBandStructure:
         else:
             # transform the mask to the full BZ
             band_idx = np.repeat(band_idx, tetrahedra_weights)
-            tetrahedra_grouped = self.grouped_ir_to_full[tetrahedra_idx]
-            tetrahedra_idx = np.concatenate(
-                tetrahedra_grouped, dtype=np.int_, casting="unsafe"
-            )
+            tetrahedra_idx = self._get_full_tetrahedra_idx(tetrahedra_idx)
             tetrahedra_mask = (band_idx, tetrahedra_idx)
 
             # tetrahedra_mask = tetrahedra_mask[:, self.ir_tetrahedra_to_full_idx]
@@ -690,76 +933,144 @@ class TetrahedralBandStructure:
         # integrand should have the shape (nbands, n_ir_kpts, ...)
         # the integrand should have been summed at all equivalent k-points
         # TODO: add support for variable shaped integrands
-        if integrand is None:
-            dos = np.zeros_like(energies)
-        else:
-            integrand_shape = integrand.shape[2:]
-            dos = np.zeros((len(energies),) + integrand_shape)
-
         if use_cached_weights:
-            if self._weights_cache is None:
+            if spin not in self._weights_cache:
                 raise ValueError("No integrand have been cached")
 
-            all_weights = self._weights_cache[spin]
-            all_weights_mask = self._weights_mask_cache[spin]
+            weights = self._weights_cache[spin]
             energies = self._energies_cache[spin]
         else:
-            all_weights = []
-            all_weights_mask = []
+            weights = self.get_integration_weights(
+                spin, energies, progress_bar=progress_bar
+            )
+            self._weights_cache[spin] = weights
+            self._energies_cache[spin] = energies
 
         nbands = len(self.energies[spin])
-        kpoint_multiplicity = np.tile(self.ir_kpoint_weights, (nbands, 1))
+        if integrand is None:
+            # weight each k-point by its multiplicity
+            integrand = np.tile(self.ir_kpoint_weights.astype(float), (nbands, 1))
+        # else: don't need to include the k-point multiplicity as this is included by
+        # pre-summing the integrand at symmetry equivalent points
 
-        if band_idx is not None and integrand is not None:
-            integrand = integrand[band_idx]
+        if band_idx is not None:
+            # exclude the contributions of all other bands
+            band_mask = np.zeros(nbands, dtype=bool)
+            band_mask[band_idx] = True
+            integrand = integrand * band_mask.reshape(
+                (-1,) + (1,) * (integrand.ndim - 1)
+            )
 
-        if band_idx is not None and integrand is None:
-            kpoint_multiplicity = kpoint_multiplicity[band_idx]
+        # weights has the shape (nenergies, nbands * n_ir_kpts)
+        integrand_shape = integrand.shape[2:]
+        dos = weights @ integrand.reshape((weights.shape[1], -1))
+        return energies, dos.reshape((len(energies),) + integrand_shape)
 
-        energies_iter = list(enumerate(energies))
-        if progress_bar:
-            energies_iter = get_progress_bar(iterable=energies_iter, desc="DOS")
+    def get_integration_weights(self, spin, energies, progress_bar=False):
+        """Get the integration weights of the irreducible k-points at several energies.
 
-        for i, energy in energies_iter:
-            if use_cached_weights:
-                weights = all_weights[i]
-                weights_mask = all_weights_mask[i]
-            else:
-                weights = self.get_energy_dependent_integration_weights(spin, energy)
-                weights_mask = weights != 0
-                all_weights.append(weights)
-                all_weights_mask.append(weights_mask)
-
-            if band_idx is not None:
-                weights = weights[band_idx]
-                weights_mask = weights_mask[band_idx]
-
-            if integrand is None:
-                dos[i] = np.sum(
-                    weights[weights_mask] * kpoint_multiplicity[weights_mask]
-                )
+        Gives the same weights as calling ``get_energy_dependent_integration_weights``
+        at each energy. However, rather than searching all tetrahedra at each energy,
+        each tetrahedron only contributes to the energies between its minimum and
+        maximum energy, so the cost scales with the number of tetrahedra and the
+        number of energies they span.
 
-            else:
-                # expand weights to match the dimensions of the integrand
-                expand_axis = [1 + i for i in range(len(integrand.shape[2:]))]
-                expand_weights = np.expand_dims(weights[weights_mask], axis=expand_axis)
+        As only the tetrahedra intersecting an energy contribute to its weights,
+        almost all weights are zero. The weights are therefore calculated in blocks
+        of energies, in which only the tetrahedra intersecting the block are visited
+        and only the non-zero weights are collected, and stored as a sparse matrix.
 
-                # don't need to include the k-point multiplicity as this is included by
-                # pre-summing the integrand at symmetry equivalent points
-                dos[i] = np.sum(expand_weights * integrand[weights_mask], axis=0)
+        Args:
+            spin: The spin channel.
+            energies: The energies.
+            progress_bar: Whether to show a progress bar.
 
-        if not use_cached_weights:
-            self._weights_cache[spin] = np.array(all_weights)
-            self._weights_mask_cache[spin] = np.array(all_weights_mask)
-            self._energies_cache[spin] = energies
+        Returns:
+            The integration weights, as a sparse matrix with the shape
+            (nenergies, nbands * n_ir_kpoints). The columns are ordered by band and
+            then by irreducible k-point.
+        """
+        energies = np.asarray(energies, dtype=float)
+        order = np.argsort(energies, kind="stable")
+        sorted_energies = energies[order]
 
-        return energies, np.asarray(dos)
+        # the range of energies intersecting each tetrahedron, i.e., min < e < max
+        starts = np.searchsorted(
+            sorted_energies, self.min_tetrahedra_energies[spin], "right"
+        )
+        ends = np.searchsorted(
+            sorted_energies, self.max_tetrahedra_energies[spin], "left"
+        )
+
+        weights_shape = self._ir_weights_shape[spin]
+        block_size = max(_max_weights_block_size // int(np.prod(weights_shape)), 1)
+        block_starts = range(0, len(energies), block_size)
+        block_tetrahedra, block_bounds = _get_block_tetrahedra(
+            starts, ends, block_size, len(block_starts)
+        )
+        if progress_bar:
+            block_starts = get_progress_bar(iterable=block_starts, desc="DOS")
+
+        kpoint_factor = self._tetrahedron_volume / self.ir_kpoint_weights
+        tetrahedra_weights = self.ir_tetrahedra_weights.astype(float)
+        ncolumns = int(np.prod(weights_shape))
+
+        # the block is reused and only the weights that have been set are reset, so
+        # the cost doesn't scale with the size of the dense block
+        block = np.zeros((min(block_size, len(energies)),) + weights_shape)
+        block_set = np.zeros(block.shape, dtype=bool)
+        set_idx = np.zeros(block.size, dtype=np.int64)
+        blocks = []
+        for block_idx, block_start in enumerate(block_starts):
+            block_end = min(block_start + block_size, len(energies))
+            nset = _add_integration_weights(
+                block,
+                block_set,
+                set_idx,
+                sorted_energies,
+                block_start,
+                block_end,
+                block_tetrahedra[block_bounds[block_idx] : block_bounds[block_idx + 1]],
+                starts,
+                ends,
+                self.ir_tetrahedra_energies[spin],
+                self.ir_tetrahedra[spin],
+                self.ir_kpoint_mapping,
+                tetrahedra_weights,
+            )
+
+            # the flat indices are sorted by energy, band and then k-point
+            flat_idx = np.sort(set_idx[:nset])
+            rows, columns = np.divmod(flat_idx, ncolumns)
+            data = block.reshape(-1)[flat_idx]
+            data *= kpoint_factor[columns % weights_shape[1]]
+            block.reshape(-1)[flat_idx] = 0
+            block_set.reshape(-1)[flat_idx] = False
+
+            nonzero = data != 0
+            blocks.append(
+                sparse.csr_matrix(
+                    (data[nonzero], (rows[nonzero], columns[nonzero])),
+                    shape=(block_end - block_start, ncolumns),
+                )
+            )
+
+        if blocks:
+            weights = sparse.vstack(blocks, format="csr")
+        else:
+            weights = sparse.csr_matrix((0, int(np.prod(weights_shape))))
+
+        if np.any(order != np.arange(len(order))):
+            weights = weights[np.argsort(order)]
+        return weights
 
     def get_energy_dependent_integration_weights(self, spin, energy):
         integration_weights = np.zeros(self._ir_weights_shape[spin])
-        tetrahedra_mask = self.get_intersecting_tetrahedra(spin, energy)
+        tetrahedra_mask = self.get_intersecting_tetrahedra(
+            spin, energy, return_indices=True
+        )
 
-        if not np.any(tetrahedra_mask):
+        if len(tetrahedra_mask[0]) == 0:
             return integration_weights
 
         energies = self.ir_tetrahedra_energies[spin][tetrahedra_mask]
@@ -821,7 +1132,7 @@ class TetrahedralBandStructure:
         # tetrahedra and multiplying by the tetrahedra multiplicity and
         # tetrahedra weight; Finally, divide by the k-point multiplicity
         # to get the final weight
-        band_idx, tetrahedra_idx = np.where(tetrahedra_mask)
+        band_idx, tetrahedra_idx = tetrahedra_mask
 
         # include tetrahedra multiplicity
         vert_weights *= self.ir_tetrahedra_weights[tetrahedra_idx][:, None]
@@ -847,7 +1158,7 @@ class TetrahedralBandStructure:
         # mask for example: energies[property_mask]
         property_mask = (
             np.repeat(band_idxs[:, None], 4, axis=1),
-            self.tetrahedra[spin][tetrahedra_mask],
+            self.get_sorted_tetrahedra(spin, tetrahedra_mask),
         )
 
         # band_kpoint_mask can be used to get the inequivalent band, k-point
@@ -866,6 +1177,34 @@ class TetrahedralBandStructure:
 
         return property_mask, band_kpoint_mask, band_mask, kpoint_mask
 
+    def get_vertex_states(self, spin, tetrahedra_mask):
+        """Get the unique band and k-point indices at the vertices of tetrahedra.
+
+        Unlike ``get_masks``, no arrays with the shape of the full band structure are
+        allocated, so the memory usage scales with the number of tetrahedra rather
+        than the size of the k-point mesh.
+
+        Args:
+            spin: The spin channel.
+            tetrahedra_mask: The band and tetrahedron indices of the tetrahedra, as
+                generated with ``symmetry_reduce=False``.
+
+        Returns:
+            The band and k-point indices of the unique states, in the same order as
+            the ``band_mask`` and ``kpoint_mask`` returned by ``get_masks``, and the
+            index of the state at each tetrahedron vertex, with the shape
+            (ntetrahedra, 4).
+        """
+        nkpoints = self.energies[spin].shape[1]
+        band_idxs = np.asarray(tetrahedra_mask[0], dtype=np.int64)
+        vertex_idxs = band_idxs[:, None] * nkpoints + self.get_sorted_tetrahedra(
+            spin, tetrahedra_mask
+        ).astype(np.int64)
+
+        state_idxs, vertex_states = np.unique(vertex_idxs, return_inverse=True)
+        band_mask, kpoint_mask = np.divmod(state_idxs, nkpoints)
+        return band_mask, kpoint_mask, vertex_states.reshape(vertex_idxs.shape)
+
 
 def _get_density_of_states_a(ee1, e21, e31, e41):
     return 3 * ee1**2 / (e21 * e31 * e41)
@@ -913,6 +1252,170 @@ def _get_energy_dependent_weight_c(ee1, ee2, ee3, e4e, e41, e42, e43):
     return np.stack([i1, i2, i3, i4], axis=1)
 
 
+def _get_block_tetrahedra(starts, ends, block_size, nblocks):
+    # get the tetrahedra intersecting each block of energies, where the tetrahedra
+    # intersect the (sorted) energies from starts to ends. The tetrahedra are given as
+    # flattened (band, tetrahedron) indices, in increasing order for each block; the
+    # tetrahedra of block i are block_tetrahedra[bounds[i]:bounds[i + 1]]
+    starts = starts.ravel()
+    ends = ends.ravel()
+    tetrahedra_idx = np.where(ends > starts)[0]
+    first_block = starts[tetrahedra_idx] // block_size
+    ntetrahedra_blocks = (ends[tetrahedra_idx] - 1) // block_size - first_block + 1
+
+    # each tetrahedron is listed once for every block it spans
+    block_offsets = np.cumsum(ntetrahedra_blocks) - ntetrahedra_blocks
+    block_idx = np.repeat(first_block - block_offsets, ntetrahedra_blocks)
+    block_idx += np.arange(len(block_idx))
+    tetrahedra_idx = np.repeat(tetrahedra_idx, ntetrahedra_blocks)
+
+    order = np.argsort(block_idx, kind="stable")
+    bounds = np.searchsorted(block_idx[order], np.arange(nblocks + 1))
+    return tetrahedra_idx[order], bounds
+
+
+@numba.njit
+def _add_integration_weights(
+    weights,
+    weights_set,
+    set_idx,
+    energies,
+    block_start,
+    block_end,
+    block_tetrahedra,
+    starts,
+    ends,
+    tetrahedra_energies,
+    tetrahedra,
+    ir_kpoint_mapping,
+    tetrahedra_weights,
+):
+    # adds the weights of each tetrahedron to the energies in its range that fall
+    # inside the block of energies [block_start, block_end). Only the tetrahedra
+    # intersecting the block, given as flattened (band, tetrahedron) indices, are
+    # visited, in the same order as get_energy_dependent_integration_weights so that
+    # the weights are summed in the same order. The flat indices of the weights that
+    # are set for the first time are added to set_idx, and their number is returned.
+    # The energy differences are calculated here so that they are never needed for
+    # bands outside the scattering window
+    vert_weights = np.zeros(4)
+    ntetrahedra = starts.shape[1]
+    nbands, nkpoints = weights.shape[1:]
+    nset = 0
+    for flat_idx in block_tetrahedra:
+        b_idx = flat_idx // ntetrahedra
+        t_idx = flat_idx % ntetrahedra
+        e1 = tetrahedra_energies[b_idx, t_idx, 0]
+        e2 = tetrahedra_energies[b_idx, t_idx, 1]
+        e3 = tetrahedra_energies[b_idx, t_idx, 2]
+        e4 = tetrahedra_energies[b_idx, t_idx, 3]
+        t21 = e2 - e1
+        t31 = e3 - e1
+        t41 = e4 - e1
+        t32 = e3 - e2
+        t42 = e4 - e2
+        t43 = e4 - e3
+        tetrahedron_weight = tetrahedra_weights[t_idx]
+
+        e_start = max(starts[b_idx, t_idx], block_start)
+        e_end = min(ends[b_idx, t_idx], block_end)
+        for e_idx in range(e_start, e_end):
+            energy = energies[e_idx]
+            ee1 = energy - e1
+            ee2 = energy - e2
+            ee3 = energy - e3
+            e2e = e2 - energy
+            e3e = e3 - energy
+            e4e = e4 - energy
+
+            if e1 < energy < e2:
+                c = ee1**2 / (t21 * t31 * t41)
+                vert_weights[0] = c * (e2e / t21 + e3e / t31 + e4e / t41)
+                vert_weights[1] = c * (ee1 / t21)
+                vert_weights[2] = c * (ee1 / t31)
+                vert_weights[3] = c * (ee1 / t41)
+            elif e2 <= energy < e3:
+                c = (ee1 * e4e) / (t31 * t41 * t42)
+                x = e3e / t31
+                y = e4e / t42
+                z = ee2 / (t32 * t42)
+                zx = z * x
+                k = ee1 / t31
+                n = ee2 / t42
+                vert_weights[0] = c * (x + e4e / t41) + z * x**2
+                vert_weights[1] = c * y + zx * (e3e / t32 + y)
+                vert_weights[2] = c * k + zx * (k + ee2 / t32)
+                vert_weights[3] = c * (ee1 / t41 + n) + zx * n
+            elif e3 <= energy < e4:
+                c = e4e**2 / (t41 * t42 * t43)
+                vert_weights[0] = c * e4e / t41
+                vert_weights[1] = c * e4e / t42
+                vert_weights[2] = c * e4e / t43
+                vert_weights[3] = c * (ee1 / t41 + ee2 / t42 + ee3 / t43)
+            else:
+                continue
+
+            row = e_idx - block_start
+            for v_idx in range(4):
+                k_idx = ir_kpoint_mapping[tetrahedra[b_idx, t_idx, v_idx]]
+                if not weights_set[row, b_idx, k_idx]:
+                    weights_set[row, b_idx, k_idx] = True
+                    set_idx[nset] = (row * nbands + b_idx) * nkpoints + k_idx
+                    nset += 1
+                weights[row, b_idx, k_idx] += vert_weights[v_idx] * tetrahedron_weight
+    return nset
+
+
+def _create_shared_weights_cache(weights_cache):
+    # the sparse weights matrices are shared as their data, indices and indptr arrays
+    arrays = {
+        name: {s: getattr(w, name) for s, w in weights_cache.items()}
+        for name in ("data", "indices", "indptr")
+    }
+    shapes = {s: w.shape for s, w in weights_cache.items()}
+
+    buffers = {}
+    shared = {}
+    for name, name_arrays in arrays.items():
+        buffers[name], shared[name] = create_shared_dict_array(
+            name_arrays, return_shared_data=True
+        )
+
+    buffer = (buffers["data"], buffers["indices"], buffers["indptr"], shapes)
+    return buffer, _weights_cache_from_arrays(shared, shapes)
+
+
+def _weights_cache_from_buffer(buffer):
+    data_buffer, indices_buffer, indptr_buffer, shapes = buffer
+    arrays = {
+        "data": dict_array_from_buffer(data_buffer),
+        "indices": dict_array_from_buffer(indices_buffer),
+        "indptr": dict_array_from_buffer(indptr_buffer),
+    }
+    return _weights_cache_from_arrays(arrays, shapes)
+
+
+def _band_properties_from_buffer(buffer):
+    return {
+        name: {
+            spin: (array_from_buffer(data_buffer), array_from_buffer(rows_buffer))
+            for spin, (data_buffer, rows_buffer) in spin_buffers.items()
+        }
+        for name, spin_buffers in buffer.items()
+    }
+
+
+def _weights_cache_from_arrays(arrays, shapes):
+    return {
+        s: sparse.csr_matrix(
+            (arrays["data"][s], arrays["indices"][s], arrays["indptr"][s]),
+            shape=shape,
+            copy=False,
+        )
+        for s, shape in shapes.items()
+    }
+
+
 def get_cross_section_values(
     property_values,
     cond_a_mask,
@@ -1101,7 +1604,7 @@ def process_tetrahedra(tetrahedra, energies):
 
     for spin, spin_energies in energies.items():
         data_shape = (len(spin_energies),) + tetrahedra.shape
-        spin_tetrahedra = np.zeros(data_shape, dtype=int)
+        spin_tetrahedra = np.zeros(data_shape, dtype=tetrahedra.dtype)
         spin_tetrahedra_energies = np.zeros(data_shape)
 
         for band_idx, band_energies in enumerate(spin_energies):
@@ -1152,6 +1655,31 @@ def get_max_min_tetrahedra_energies(tetrahedra_energies):
     return max_tetrahedra_energies, min_tetrahedra_energies
 
 
+def get_tetrahedra_energy_index(min_tetrahedra_energies):
+    """Sort the tetrahedra in each band by their minimum energy.
+
+    Combined with the largest energy span of the tetrahedra in a band, this allows
+    the tetrahedra intersecting an energy to be found using a binary search.
+
+    Args:
+        min_tetrahedra_energies: The minimum energy of each tetrahedron, given as a
+            dict of ``{spin: energies}``, where energies has the shape
+            (nbands, ntetrahedra).
+
+    Returns:
+        The order that sorts the tetrahedra by minimum energy and the sorted minimum
+        energies, both given as dicts of ``{spin: array}`` with the shape
+        (nbands, ntetrahedra).
+    """
+    min_energy_order = {}
+    sorted_min_energies = {}
+    for spin, s_min_energies in min_tetrahedra_energies.items():
+        order = np.argsort(s_min_energies, axis=1, kind="stable")
+        min_energy_order[spin] = order
+        sorted_min_energies[spin] = np.take_along_axis(s_min_energies, order, axis=1)
+    return min_energy_order, sorted_min_energies
+
+
 def get_tetrahedra_cross_section_weights(
     reciprocal_lattice, kpoints, tetrahedra, e21, e31, e41
 ):
@@ -1,7 +1,6 @@
 """Band structure interpolation using BolzTraP2."""
 
 import logging
-import multiprocessing
 import time
 from collections import defaultdict
 from typing import Dict, List, Optional, Tuple, Union
@@ -136,6 +135,7 @@ class Interpolator(MSONable):
         bandgap: float = None,
         symprec: float = defaults["symprec"],
         nworkers: int = defaults["nworkers"],
+        single_precision_energy_diffs: bool = defaults["single_precision_energy_diffs"],
     ) -> AmsetData:
         """Gets an AmsetData object using the interpolated bands.
 
@@ -164,7 +164,11 @@ class Interpolator(MSONable):
                 inequivalent k-points on which to interpolate.
             nworkers: The number of processors used to perform the
                 interpolation. If set to ``-1``, the number of workers will
-                be set to the number of CPU cores.
+                be set to the number of available CPU cores, limited to the
+                number of workers that fit in memory.
+            single_precision_energy_diffs: Whether to store the energy differences
+                between the tetrahedron vertices in single precision, reducing
+                memory usage at the cost of slightly less accurate scattering rates.
 
         Returns:
             The electronic structure (including energies, velocities, density of
@@ -179,8 +183,6 @@ class Interpolator(MSONable):
                 )
             )
 
-        nworkers = multiprocessing.cpu_count() if nworkers == -1 else nworkers
-
         logger.info("Interpolation parameters:")
         iinfo = [
             "k-point mesh: {}".format("x".join(map(str, self.interpolation_mesh))),
@@ -272,6 +274,7 @@ class Interpolator(MSONable):
             is_metal,
             self._soc,
             vb_idx=new_vb_idx,
+            single_precision_energy_diffs=single_precision_energy_diffs,
         )
 
     def get_energies(
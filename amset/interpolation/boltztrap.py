@@ -5,6 +5,12 @@ from BoltzTraP2.fite import BOLTZMANN, FFTc, FFTev
 
 from amset.constants import defaults
 from amset.electronic_structure.fd import dfdde, fd
+from amset.util import get_nworkers
+
+# the number of float64 values per k-point held by each FFT worker while interpolating
+# a band, used to limit the number of workers to those that fit in memory
+_fft_worker_floats = 40
+_fft_worker_effective_mass_floats = 40
 
 
 def get_bands_fft(
@@ -21,7 +27,9 @@ def get_bands_fft(
         coeffs: interpolation coefficients
         lattvec: lattice vectors of the system
         return_effective_mass: Whether to calculate the effective mass.
-        nworkers: number of working processes to span
+        nworkers: number of working processes to span. If -1, one process per
+            available processor is used, limited to the processes that fit in
+            memory.
 
     Returns:
         A 3-tuple (eband, vvband, cband): energy bands, v x v outer product
@@ -45,6 +53,18 @@ def get_bands_fft(
     else:
         effective_mass = None
 
+    nfloats = _fft_worker_floats
+    if return_effective_mass:
+        nfloats += _fft_worker_effective_mass_floats
+    results_nbytes = eband.nbytes + vvband.nbytes + vb.nbytes
+    if return_effective_mass:
+        results_nbytes += effective_mass.nbytes
+    nworkers = get_nworkers(
+        nworkers,
+        worker_memory=nfloats * np.prod(dims) * eband.itemsize,
+        shared_memory=results_nbytes,
+    )
+
     # Span as many worker processes as needed, put all the bands in the queue,
     # and let them work until all the required FFTs have been computed.
     workers = []
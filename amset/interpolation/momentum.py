@@ -22,3 +22,23 @@ class MRTACalculator(PeriodicLinearInterpolator):
             return factor[0]
         else:
             return factor
+
+    def get_mrta_factors(self, spin, band_a, kpoints_a, bands_b, kpoints_b, mapping):
+        """
+        Get the MRTA factors for several initial k-points at once.
+
+        Args:
+            spin: The spin.
+            band_a: The band index of the initial states.
+            kpoints_a: The initial k-points, with shape (nkpoints, 3).
+            bands_b: The band indices of the final states.
+            kpoints_b: The final k-points, with shape (nfinal, 3).
+            mapping: The index of the initial k-point for each final state.
+
+        Returns:
+            The MRTA factor for each final state.
+        """
+        p_a = self.interpolate(spin, np.full(len(kpoints_a), band_a), kpoints_a)
+        p_b = self.interpolate(spin, bands_b, kpoints_b)
+        norm_sq = np.linalg.norm(p_a, axis=-1) ** 2
+        return 1 - np.einsum("ij,ij->i", p_b, p_a[mapping]) / norm_sq[mapping]
@@ -2,11 +2,17 @@
 This module implements methods to calculate electron scattering.
 """
 
+import ctypes
 import logging
 import multiprocessing
+import os
+import threading
 import time
 import traceback
-from multiprocessing import cpu_count
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
 from queue import Empty
 from typing import Any, Dict, List, Optional, Union
 
@@ -14,23 +20,16 @@ import numba
 import numpy as np
 from pymatgen.electronic_structure.core import Spin
 from pymatgen.util.coord import pbc_diff
-from scipy.interpolate import griddata
-
-from amset.constants import (
-    boltzmann_au,
-    defaults,
-    ev_to_hartree,
-    hbar,
-    small_val,
-    spin_name,
-)
+from scipy.spatial import cKDTree
+
+from amset.constants import boltzmann_au, defaults, ev_to_hartree, small_val, spin_name
 from amset.core.data import AmsetData
 from amset.electronic_structure.fd import fd
 from amset.electronic_structure.kpoints import kpoints_to_first_bz
+from amset.electronic_structure.symmetry import get_kpoint_symmetry_mapping
 from amset.electronic_structure.tetrahedron import (
     TetrahedralBandStructure,
     get_cross_section_values,
-    get_projected_intersections,
 )
 from amset.interpolation.momentum import MRTACalculator
 from amset.interpolation.projections import ProjectionOverlapCalculator
@@ -47,14 +46,25 @@ from amset.interpolation.wavefunction import (
 )
 from amset.log import log_list, log_time_taken
 from amset.scattering.basic import AbstractBasicScattering
+from amset.scattering.checkpoint import (
+    ScatteringCheckpoint,
+    ScatteringIntegrandCache,
+    get_inputs_hash,
+)
 from amset.scattering.elastic import (
     AbstractElasticScattering,
     AcousticDeformationPotentialScattering,
 )
 from amset.scattering.inelastic import AbstractInelasticScattering
 from amset.util import (
+    IrreducibleArray,
+    allocate_shared_array,
+    array_from_buffer,
+    create_shared_array,
     create_shared_dict_array,
     dict_array_from_buffer,
+    get_available_memory,
+    get_nworkers,
     get_progress_bar,
 )
 
@@ -64,6 +74,69 @@ __email__ = "aganose@lbl.gov"
 
 logger = logging.getLogger(__name__)
 
+# controls the size of the blocks of k-points sent to the scattering workers. The cost
+# of each k-point is estimated from the number of tetrahedra intersecting its energy.
+# Chunks are sized so that each takes roughly _target_chunk_time seconds to compute,
+# while each worker still receives at least _min_chunks_per_worker chunks per band so
+# that the load remains balanced
+_target_chunk_time = 0.5  # in s
+_min_chunks_per_worker = 4
+
+# maximum number of elements in the scattering factor arrays evaluated at once when
+# calculating the rates for several k-points
+_max_batch_size = 2**22
+
+# used to estimate the memory needed by each scattering worker. Idle workers use
+# _worker_base_memory bytes once amset has been imported and the numba kernels compiled.
+# While calculating rates, a worker holds _worker_scratch_arrays float arrays the size
+# of a batch of scattering factors, plus the tetrahedron masks and final state indices,
+# estimated at _worker_bytes_per_state bytes per band and k-point
+_worker_base_memory = 256 * 1024**2
+_worker_scratch_arrays = 4
+_worker_bytes_per_state = 64
+
+# the cross sections are integrated using the high precision quadrature scheme if they
+# are closer than high_tol to the initial k-point, otherwise the medium scheme if they
+# are closer than med_tol, otherwise the low precision scheme. The tolerances are
+# given as (high_tol, med_tol) in multiples of the k-point spacing
+quadrature_tolerances = {
+    "fast": (0.25, 0.5),
+    "balanced": (0.5, 2),
+    "accurate": (1, 4),
+}
+
+# how often the rates of unfinished bands are written to the checkpoint file
+_checkpoint_interval = 60  # in s
+
+# settings that don't affect the scattering rates, and so are not used to identify
+# the inputs of a checkpoint
+_checkpoint_ignored_settings = (
+    "nworkers",
+    "min_free_memory",
+    "cache_wavefunction",
+    "scattering_checkpoint",
+    "scattering_integrand_cache",
+    "calculate_mobility",
+    "separate_mobility",
+    "mobility_rates_only",
+    "file_format",
+    "write_input",
+    "write_mesh",
+    "print_log",
+    "write_log",
+    "fd_tol",
+)
+
+# settings that affect the scattering integrand but not the band structure
+_integrand_settings = (
+    "symprec",
+    "soc",
+    "use_projections",
+    "unity_overlap",
+    "wavefunction_coefficients",
+    "pop_frequency",
+)
+
 _all_scatterers: Union = (
     AbstractElasticScattering.__subclasses__()
     + AbstractInelasticScattering.__subclasses__()
@@ -99,19 +172,38 @@ class ScatteringCalculator:
         nworkers: int = defaults["nworkers"],
         progress_bar: bool = defaults["print_log"],
         cache_wavefunction: bool = defaults["cache_wavefunction"],
+        worker_pool: Optional["AbstractScatteringWorkerPool"] = None,
+        symmetry_reduce_final_states: bool = defaults["symmetry_reduce_final_states"],
+        quadrature_precision: str = defaults["quadrature_precision"],
+        checkpoint: Optional[str] = defaults["scattering_checkpoint"],
+        integrand_cache: Optional[str] = defaults["scattering_integrand_cache"],
     ):
         if amset_data.temperatures is None or amset_data.doping is None:
             raise RuntimeError(
                 "AmsetData doesn't contain doping levels or temperatures"
             )
 
+        if quadrature_precision not in quadrature_tolerances:
+            raise ValueError(
+                f"Unrecognised quadrature precision: {quadrature_precision}, options "
+                f"are: {', '.join(quadrature_tolerances)}"
+            )
+
         self.scattering_type = scattering_type
         self.settings = settings
-        self.nworkers = nworkers if nworkers != -1 else cpu_count()
+        if worker_pool is not None:
+            nworkers = worker_pool.nworkers
+        # -1 is resolved by the worker pool once the memory requirements are known
+        self.nworkers = nworkers
         self.scatterers = self.get_scatterers(scattering_type, settings, amset_data)
         self.amset_data = amset_data
         self.progress_bar = progress_bar
         self.cache_wavefunction = cache_wavefunction
+        self.symmetry_reduce_final_states = symmetry_reduce_final_states
+        self.quadrature_precision = quadrature_precision
+        self.checkpoint = checkpoint
+        self.integrand_cache = integrand_cache
+        self.cutoff_pad = cutoff_pad
 
         buf = 0.05 * ev_to_hartree
         if self.amset_data.fd_cutoffs:
@@ -197,17 +289,25 @@ class ScatteringCalculator:
                     self._coeffs_mapping = None
                     break
 
-        self.in_queue = None
-        self.out_queue = None
+        # if a worker pool is supplied it is left running after the scattering rates
+        # have been calculated, so that it can be reused by other calculations
+        self.worker_pool = worker_pool
+        self._owns_worker_pool = worker_pool is None
         self.workers = None
+        self._rates = None
+        self._time_per_cost = {"elastic": None, "inelastic": None}
+        self._checkpoint = None
+        self._integrand_cache = None
         self.initialize_workers()
 
     def initialize_workers(self):
         if self._basic_only:
             return
 
-        logger.info(f"Forking {self.nworkers} processes to calculate scattering")
-        t0 = time.perf_counter()
+        if self.worker_pool is None:
+            self.worker_pool = ScatteringWorkerPool(
+                nworkers=self.nworkers, progress_bar=self.progress_bar
+            )
 
         if isinstance(self.amset_data.overlap_calculator, ProjectionOverlapCalculator):
             overlap_type = "projection"
@@ -220,14 +320,18 @@ class ScatteringCalculator:
             coeffs_buffer = None
             coeffs_mapping_buffer = None
         else:
-            coeffs_buffer, self._coeffs = create_shared_dict_array(
-                self._coeffs, return_shared_data=True
-            )
-            coeffs_mapping_buffer, self._coeffs_mapping = create_shared_dict_array(
-                self._coeffs_mapping, return_shared_data=True
-            )
+            coeffs_buffer = create_shared_dict_array(self._coeffs)
+            coeffs_mapping_buffer = create_shared_dict_array(self._coeffs_mapping)
+
+        kpoint_symmetry_mapping = None
+        if self.symmetry_reduce_final_states:
+            kpoint_symmetry_mapping = self.get_kpoint_symmetry_mapping()
 
-        amset_data_min = _AmsetDataMin.from_amset_data(self.amset_data)
+        amset_data_min = _AmsetDataMin.from_amset_data(
+            self.amset_data,
+            kpoint_symmetry_mapping=kpoint_symmetry_mapping,
+            quadrature_tolerances=quadrature_tolerances[self.quadrature_precision],
+        )
         amset_data_min_reference = amset_data_min.to_reference()
 
         # deformation potential is a large tensor that should be put into shared memory
@@ -240,11 +344,22 @@ class ScatteringCalculator:
             for s in self.elastic_scatterers
         ]
 
-        ctx = multiprocessing.get_context("spawn")
-        self.in_queue = ctx.Queue()
-        self.out_queue = ctx.Queue()
-        args = (
-            self.amset_data.tetrahedral_band_structure.to_reference(),
+        tbs = self.amset_data.tetrahedral_band_structure
+
+        # the workers write the rates for each block of k-points directly into the
+        # shared rates array, rather than sending them back through the queue
+        _, elastic_slice, inelastic_slice = self._scatterer_slices
+        rates_slices = {"elastic": elastic_slice, "inelastic": inelastic_slice}
+        # inelastic scattering reaches final states up to the maximum phonon energy
+        # (the cutoff pad) outside the scattering cutoffs
+        energy_range = (
+            self.scattering_energy_cutoffs[0] - self.cutoff_pad,
+            self.scattering_energy_cutoffs[1] + self.cutoff_pad,
+        )
+        reference = (
+            # the band properties needed for scattering are calculated once in shared
+            # memory, rather than by each worker
+            tbs.to_reference(energy_range=energy_range),
             overlap_type,
             self.amset_data.overlap_calculator.to_reference(),
             self.amset_data.mrta_calculator.to_reference(),
@@ -253,39 +368,189 @@ class ScatteringCalculator:
             amset_data_min_reference,
             coeffs_buffer,
             coeffs_mapping_buffer,
-            self.in_queue,
-            self.out_queue,
+            self._get_empty_rates(),
+            rates_slices,
         )
 
-        self.workers = []
-        for _ in range(self.nworkers):
-            self.workers.append(ctx.Process(target=scattering_worker, args=args))
+        # pools that choose the number of workers automatically must know the memory
+        # requirements before they start
+        arrays = []
+        _split_reference(reference, arrays)
+        shared_memory = sum(a.nbytes for a in arrays)
+        logger.info("Shared scattering data:")
+        log_list(
+            [
+                f"tetrahedron band structure: {tbs.nbytes / 1024**2:.1f} MB",
+                f"total: {shared_memory / 1024**2:.1f} MB",
+            ]
+        )
+        self.worker_pool.set_memory_requirements(
+            self.estimate_worker_memory(), shared_memory
+        )
+        self.worker_pool.start()
 
-        iterable = self.workers
-        if self.progress_bar:
-            iterable = get_progress_bar(self.workers, desc="workers")
+        # the number of workers of some pools is only known once they have started
+        self.nworkers = self.worker_pool.nworkers
 
-        for w in iterable:
-            w.start()
+        logger.info(f"Loading scattering data into {self.nworkers} processes")
+        t0 = time.perf_counter()
+        reference = self.worker_pool.load(reference)
+        self._rates = dict_array_from_buffer(reference[-2])
+        self.workers = self.worker_pool.workers
 
         log_time_taken(t0)
         return self.workers
 
-    def terminate_workers(self):
-        # The "None"s at the end of the queue signals to the workers that there are
-        # no more jobs left and they must therefore exit.
-        if self.workers is not None:
-            for i in range(self.nworkers):
-                self.in_queue.put(None)
+    def estimate_worker_memory(self) -> int:
+        """
+        Estimate the memory needed by each scattering worker.
+
+        The estimate includes the memory of an idle worker, the scattering factors
+        evaluated in each batch, and the tetrahedron masks and final state indices,
+        which scale with the number of bands and the size of the k-point mesh. Data
+        shared between the workers, such as the band structure and the cached
+        wavefunction coefficients, is not included.
+
+        Returns:
+            The memory needed by each worker, in bytes.
+        """
+        amset_data = self.amset_data
+        nstates = len(amset_data.kpoints) * max(
+            len(amset_data.energies[s]) for s in amset_data.spins
+        )
+        nscatterers = max(len(self.elastic_scatterers), len(self.inelastic_scatterers))
+        batch_size = min(
+            nscatterers * amset_data.fermi_levels.size * nstates, _max_batch_size
+        )
+        return (
+            _worker_base_memory
+            + _worker_scratch_arrays * batch_size * np.dtype(np.float64).itemsize
+            + _worker_bytes_per_state * nstates
+        )
 
-            for w in self.workers:
-                w.terminate()
-                w.join(0)
+    def get_kpoint_symmetry_mapping(self):
+        # use the same symmetry as when generating the irreducible k-points
+        symprec = self.settings.get("symprec", defaults["symprec"]) or 1e-8
+        mapping = get_kpoint_symmetry_mapping(
+            self.amset_data.structure,
+            self.amset_data.kpoints,
+            self.amset_data.kpoint_mesh,
+            symprec=symprec,
+            time_reversal=not self.settings.get("soc", defaults["soc"]),
+        )
 
-            self.in_queue.close()
-            self.out_queue.close()
+        # only use operations that are consistent with the irreducible k-points
+        ir_mapping = self.amset_data.ir_to_full_kpoint_mapping
+        mapping = mapping[np.all(ir_mapping[mapping] == ir_mapping, axis=1)]
+        logger.info(f"Reducing final states using {len(mapping)} symmetry operations")
+        return mapping
+
+    def get_checkpoint_key(self) -> str:
+        """
+        Get a key identifying the inputs that affect the scattering rates.
+
+        The key includes the k-point mesh, band energies and velocities, Fermi levels,
+        temperatures, scattering settings, and the source of the overlaps.
+
+        Returns:
+            The key, as a hex string.
+        """
+        settings = {
+            k: v
+            for k, v in self.settings.items()
+            if k not in _checkpoint_ignored_settings
+        }
+
+        # the contents of input files are included rather than their paths
+        for name in ("wavefunction_coefficients", "deformation_potential"):
+            if isinstance(settings.get(name), str) and Path(settings[name]).exists():
+                settings[name] = Path(settings[name])
+
+        amset_data = self.amset_data
+        return get_inputs_hash(
+            amset_data.kpoint_mesh,
+            amset_data.kpoints,
+            amset_data.ir_kpoints_idx,
+            amset_data.energies,
+            amset_data.velocities,
+            amset_data.fermi_levels,
+            amset_data.temperatures,
+            self.scattering_energy_cutoffs,
+            self.scatterer_labels,
+            type(amset_data.overlap_calculator).__name__,
+            self.symmetry_reduce_final_states,
+            self.quadrature_precision,
+            settings,
+        )
 
-            self.workers = None
+    def get_integrand_cache_key(self) -> str:
+        """
+        Get a key identifying the inputs that affect the scattering integrand.
+
+        Unlike :meth:`get_checkpoint_key`, the key doesn't depend on the doping,
+        temperatures or scattering mechanisms.
+
+        Returns:
+            The key, as a hex string.
+        """
+        settings = {k: self.settings.get(k) for k in _integrand_settings}
+        wavefunction_coefficients = settings["wavefunction_coefficients"]
+        if isinstance(wavefunction_coefficients, str):
+            if Path(wavefunction_coefficients).exists():
+                settings["wavefunction_coefficients"] = Path(wavefunction_coefficients)
+
+        amset_data = self.amset_data
+        return get_inputs_hash(
+            amset_data.structure.lattice.matrix,
+            amset_data.kpoint_mesh,
+            amset_data.kpoints,
+            amset_data.ir_kpoints_idx,
+            amset_data.energies,
+            amset_data.velocities,
+            type(amset_data.overlap_calculator).__name__,
+            self.symmetry_reduce_final_states,
+            self.quadrature_precision,
+            settings,
+        )
+
+    def _get_integrand_cache(self):
+        if self.integrand_cache is None or self._basic_only:
+            return None
+
+        if self._integrand_cache is None:
+            self._integrand_cache = ScatteringIntegrandCache(
+                self.integrand_cache, self.get_integrand_cache_key()
+            )
+        return self._integrand_cache
+
+    def _get_checkpoint(self):
+        if self.checkpoint is None:
+            return None
+
+        if self._checkpoint is None:
+            empty_rates = self._get_empty_rates()
+            _, elastic_slice, inelastic_slice = self._scatterer_slices
+            scatterer_slices = {}
+            if len(self.elastic_scatterers) > 0:
+                scatterer_slices["elastic"] = elastic_slice
+            if len(self.inelastic_scatterers) > 0:
+                scatterer_slices["inelastic"] = inelastic_slice
+
+            self._checkpoint = ScatteringCheckpoint(
+                self.checkpoint,
+                self.get_checkpoint_key(),
+                {s: r.shape for s, r in empty_rates.items()},
+                scatterer_slices,
+            )
+        return self._checkpoint
+
+    def terminate_workers(self):
+        self.workers = None
+        self._rates = None
+
+        if self._owns_worker_pool and self.worker_pool is not None:
+            self.worker_pool.close()
+            self.worker_pool = None
 
     @property
     def basic_scatterers(self):
@@ -351,151 +616,700 @@ class ScatteringCalculator:
         str_scats = ", ".join(scattering_type)
         logger.info(f"Scattering mechanisms to be calculated: {str_scats}")
 
-        return [
-            _scattering_mechanisms[name].from_amset_data(settings, amset_data)
-            for name in scattering_type
-        ]
+        scatterers = []
+        for name in scattering_type:
+            mechanism = _scattering_mechanisms[name]
+            if issubclass(mechanism, AbstractInelasticScattering):
+                # one scatterer per phonon mode
+                scatterers.extend(mechanism.from_amset_data_modes(settings, amset_data))
+            else:
+                scatterers.append(mechanism.from_amset_data(settings, amset_data))
+        return scatterers
 
     def calculate_scattering_rates(self):
         spins = self.amset_data.spins
         kpoints = self.amset_data.kpoints
-        energies = self.amset_data.energies
-        fermi_shape = self.amset_data.fermi_levels.shape
-        scattering_shape = (len(self.scatterer_labels),) + fermi_shape
-        rate_shape = {s: scattering_shape + energies[s].shape for s in spins}
-
-        # rates has shape (spin, nscatterers, ndoping, ntemp, nbands, nkpoints)
-        rates = {s: np.zeros(rate_shape[s]) for s in spins}
-        masks = {s: np.full(rate_shape[s], True) for s in spins}
+        ir_kpoints_idx = self.amset_data.ir_kpoints_idx
+        n_ir_kpoints = len(ir_kpoints_idx)
 
         logger.info("Scattering information:")
-        log_list([f"# ir k-points: {len(self.amset_data.ir_kpoints_idx)}"])
+        log_list([f"# ir k-points: {n_ir_kpoints}"])
 
-        for spin in spins:
-            for b_idx in range(len(self.amset_data.energies[spin])):
-                str_b = "Calculating rates for {} band {}"
-                logger.info(str_b.format(spin_name[spin], b_idx + 1))
+        # rates are only stored for the irreducible k-points and have the shape
+        # (spin, nscatterers, ndoping, ntemp, nbands, n_ir_kpoints); the elastic and
+        # inelastic rates are written directly into these arrays by the workers
+        bands = [(s, b) for s in spins for b in range(len(self.amset_data.energies[s]))]
+        band_masks = self._calculate_rates(bands)
+        rates = self._rates
 
-                t0 = time.perf_counter()
-                (
-                    rates[spin][..., b_idx, :],
-                    masks[spin][..., b_idx, :],
-                ) = self.calculate_band_rates(spin, b_idx)
-
-                info = [
-                    f"max rate: {rates[spin][..., b_idx, :].max():.4g}",
-                    f"min rate: {rates[spin][..., b_idx, :].min():.4g}",
-                ]
-                log_list(info, level=logging.DEBUG)
-                log_list([f"time: {time.perf_counter() - t0:.4f} s"])
+        masks = {}
+        for spin in spins:
+            masks[spin] = np.array(
+                [m for (s, _), m in zip(bands, band_masks) if s == spin]
+            )
 
             # fill in k-points outside Fermi-Dirac cutoffs with a default value
-            rates[spin][masks[spin]] = 1e14
+            rates[spin][..., masks[spin]] = 1e14
 
         # if the k-point density is low, some k-points may not have other k-points
         # within the energy tolerance leading to zero rates
         rates = _interpolate_zero_rates(
-            rates, kpoints, masks, progress_bar=self.progress_bar
+            rates,
+            kpoints,
+            masks,
+            progress_bar=self.progress_bar,
+            ir_kpoints_idx=ir_kpoints_idx,
+            ir_to_full_idx=self.amset_data.ir_to_full_kpoint_mapping,
         )
 
-        # enforce symmetry of interpolated points
-        ir_idx = self.amset_data.ir_kpoints_idx
-        ir_to_full = self.amset_data.ir_to_full_kpoint_mapping
-        rates = {s: sr[..., ir_idx][..., ir_to_full] for s, sr in rates.items()}
+        # copy the rates out of shared memory, as this may be reused by the workers
+        rates = {
+            s: IrreducibleArray(
+                sr.copy(), ir_kpoints_idx, self.amset_data.ir_to_full_kpoint_mapping
+            )
+            for s, sr in rates.items()
+        }
 
         self.terminate_workers()
         return rates
 
     def calculate_band_rates(self, spin: Spin, b_idx: int):
+        """Calculate the scattering rates for a band at the irreducible k-points.
+
+        The rates are also stored in the rates array used by the workers.
+
+        Returns:
+            The rates with the shape (nscatterers, ndoping, ntemperatures,
+            n_ir_kpoints), and a mask of the irreducible k-points outside the
+            Fermi–Dirac cut-offs, for which the rates are not calculated.
+        """
+        (mask,) = self._calculate_rates([(spin, b_idx)])
+        return self._rates[spin][..., b_idx, :].copy(), mask
+
+    def _calculate_rates(self, bands):
+        # the jobs for all bands are submitted at once, so that the workers don't go
+        # idle at the end of each band. Results can arrive for any band but the bands
+        # are reported in order, each as soon as it and all previous bands finish
         if self.workers is None and not self._basic_only:
             self.initialize_workers()
+        elif self._rates is None:
+            # without a worker pool, nothing allocates the rates for us
+            self._rates = {
+                s: np.zeros(r.shape, dtype=r.dtype)
+                for s, r in self._get_empty_rates().items()
+            }
 
-        vol = self.amset_data.structure.lattice.reciprocal_lattice.volume
-        conversion = vol / (4 * np.pi**2)
-        kpoints_idx = self.amset_data.ir_kpoints_idx
-        nkpoints = len(kpoints_idx)
+        t0 = time.perf_counter()
+        checkpoint = self._get_checkpoint()
+        integrand_cache = self._get_integrand_cache()
+        band_jobs = [
+            self._submit_band_jobs(spin, b_idx, checkpoint, integrand_cache)
+            for spin, b_idx in bands
+        ]
+        t_saved = t0
+        band_positions = {band: i for i, band in enumerate(bands)}
+        ndone = np.zeros(len(bands), dtype=int)
+        worker_times = defaultdict(float)
+        type_times = defaultdict(float)
+
+        t_band = t0
+        for i, (spin, b_idx) in enumerate(bands):
+            str_b = "Calculating rates for {} band {}"
+            logger.info(str_b.format(spin_name[spin], b_idx + 1))
+            n = band_jobs[i]["n_in_cutoff"]
+            logger.info(f"  ├── # k-points within Fermi–Dirac cut-offs: {n}")
+
+            njobs = band_jobs[i]["njobs"]
+            if self.progress_bar and njobs > 0:
+                pbar = get_progress_bar(total=njobs, desc="scattering")
+                pbar.update(ndone[i])
+            else:
+                pbar = None
+
+            while ndone[i] < njobs:
+                result = self._get_rate_from_queue()
+                r_spin, r_b_idx, scattering_type, ir_idxs = result[:4]
+                chunk_time, nqpoints, worker_id, integrands, chunk_rates = result[4:]
+                if chunk_rates is not None:
+                    # workers without access to the shared memory return the rates
+                    self._set_chunk_rates(
+                        r_spin, r_b_idx, scattering_type, ir_idxs, chunk_rates
+                    )
+                if integrands is not None:
+                    integrand_cache.save_kpoints(
+                        r_spin, r_b_idx, scattering_type, ir_idxs, integrands
+                    )
+
+                j = band_positions[(r_spin, r_b_idx)]
+                ndone[j] += len(ir_idxs)
+                band_jobs[j]["nqpoints"][scattering_type] += nqpoints
+                band_jobs[j]["done"][scattering_type][ir_idxs] = True
+                band_jobs[j]["saved"] = False
+                worker_times[worker_id] += chunk_time
+                type_times[scattering_type] += chunk_time
+                if pbar and j == i:
+                    pbar.update(len(ir_idxs))
+
+                if checkpoint is not None and (
+                    time.perf_counter() - t_saved > _checkpoint_interval
+                ):
+                    self._save_partial_rates(checkpoint, bands, band_jobs)
+                    t_saved = time.perf_counter()
+
+            if pbar:
+                pbar.close()
+
+            self._finish_band_rates(spin, b_idx, band_jobs[i])
+            if checkpoint is not None and not band_jobs[i]["restored"]:
+                checkpoint.save_band(
+                    spin, b_idx, self._rates[spin], band_jobs[i]["done"], complete=True
+                )
+                band_jobs[i]["saved"] = True
+            log_list([f"time: {time.perf_counter() - t_band:.4f} s"])
+            t_band = time.perf_counter()
 
+        for scattering_type, total_cost in self._total_costs(band_jobs).items():
+            self._time_per_cost[scattering_type] = (
+                type_times[scattering_type] / total_cost
+            )
+
+        if worker_times:
+            # workers that didn't receive any jobs count as idle
+            total_time = sum(worker_times.values())
+            utilisation = total_time / (self.nworkers * (time.perf_counter() - t0))
+            imbalance = max(worker_times.values()) * self.nworkers / total_time
+            logger.info(
+                f"Worker utilisation: {utilisation:.1%} (max/mean worker time: "
+                f"{imbalance:.2f})"
+            )
+
+        return [jobs["mask"] for jobs in band_jobs]
+
+    def _submit_band_jobs(self, spin, b_idx, checkpoint=None, integrand_cache=None):
+        # fill in the basic rates and queue the elastic and inelastic jobs for a band;
+        # returns the information needed to track the jobs. Only the k-points missing
+        # from the checkpoint are calculated, and the rates of k-points in the
+        # integrand cache are integrated here rather than by the workers
+        kpoints_idx = self.amset_data.ir_kpoints_idx
         band_energies = self.amset_data.energies[spin][b_idx, kpoints_idx]
         mask = band_energies < self.scattering_energy_cutoffs[0]
         mask |= band_energies > self.scattering_energy_cutoffs[1]
-        fill_mask = mask[self.amset_data.ir_to_full_kpoint_mapping]
-
-        n = np.sum(~fill_mask)
-        logger.info(f"  ├── # k-points within Fermi–Dirac cut-offs: {n}")
 
         k_idx_in_cutoff = kpoints_idx[~mask]
-        ir_idx_in_cutoff = np.arange(nkpoints)[~mask]
-        iterable = list(zip(k_idx_in_cutoff, ir_idx_in_cutoff))
+        ir_idx_in_cutoff = np.arange(len(kpoints_idx))[~mask]
 
-        to_stack = []
+        basic_slice, _, _ = self._scatterer_slices
         if len(self.basic_scatterers) > 0:
-            basic_rates = np.array(
-                [m.rates[spin][:, :, b_idx, kpoints_idx] for m in self.basic_scatterers]
+            self._rates[spin][basic_slice, ..., b_idx, :] = [
+                m.rates[spin][:, :, b_idx, kpoints_idx] for m in self.basic_scatterers
+            ]
+
+        scattering_types = self._scattering_types
+        for scattering_type in scattering_types:
+            scatterer_slice = self._scatterer_slices[
+                1 if scattering_type == "elastic" else 2
+            ]
+            self._rates[spin][scatterer_slice, ..., b_idx, :] = 0
+
+        jobs = {
+            "mask": mask,
+            "n_in_cutoff": np.sum(~mask[self.amset_data.ir_to_full_kpoint_mapping]),
+            "njobs": 0,
+            "nqpoints": {},
+            "costs": {},
+            "nchunks": {},
+            "done": {t: np.full(len(kpoints_idx), False) for t in scattering_types},
+            "restored": False,
+            "saved": True,
+            "ncached": 0,
+        }
+        if checkpoint is not None:
+            complete, done = checkpoint.load_band(spin, b_idx, self._rates[spin])
+            jobs["restored"] = complete
+            jobs["done"].update(done)
+
+        for scattering_type in scattering_types:
+            todo = ~jobs["done"][scattering_type][ir_idx_in_cutoff]
+            if jobs["restored"]:
+                todo[:] = False
+
+            k_idxs = k_idx_in_cutoff[todo]
+            ir_idxs = ir_idx_in_cutoff[todo]
+            cached, integrands = np.full(len(ir_idxs), False), []
+            if integrand_cache is not None:
+                cached, integrands = integrand_cache.load_kpoints(
+                    spin, b_idx, scattering_type, ir_idxs
+                )
+
+            costs, nchunks = self._submit_jobs(
+                spin, b_idx, k_idxs[~cached], ir_idxs[~cached], scattering_type
             )
-            to_stack.append(basic_rates)
+            jobs["njobs"] += len(costs)
+            jobs["nqpoints"][scattering_type] = 0
+            jobs["costs"][scattering_type] = costs.sum()
+            jobs["nchunks"][scattering_type] = nchunks
+
+            if cached.any():
+                # the workers are already busy with the jobs submitted above
+                self._integrate_cached_rates(
+                    spin,
+                    b_idx,
+                    k_idxs[cached],
+                    ir_idxs[cached],
+                    scattering_type,
+                    integrands,
+                )
+                jobs["done"][scattering_type][ir_idxs[cached]] = True
+                jobs["nqpoints"][scattering_type] += sum(
+                    n.sum() for *_, n in integrands
+                )
+                jobs["ncached"] += cached.sum()
+                jobs["saved"] = False
+        return jobs
+
+    def _integrate_cached_rates(
+        self, spin, b_idx, k_idxs, ir_idxs, scattering_type, integrands
+    ):
+        # integrate the rates from the cached integrand; only the scattering factors
+        # need to be evaluated
+        inelastic = scattering_type == "inelastic"
+        if inelastic:
+            scatterers = self.inelastic_scatterers
+        else:
+            scatterers = self.elastic_scatterers
+        energy_diffs = _get_energy_diffs(scatterers, inelastic)
+
+        amset_data = self.amset_data
+        fermi_shape = amset_data.fermi_levels.shape
+        max_qpoints = max(
+            _max_batch_size // (len(scatterers) * np.prod(fermi_shape)), 1
+        )
+        rates = np.zeros((len(scatterers),) + fermi_shape + (len(k_idxs),))
+        for (ediff, idxs), integrand in zip(energy_diffs, integrands):
+            qpoints, weights, nqpoints = integrand
+            energies = amset_data.energies[spin][b_idx, k_idxs]
+            if ediff:
+                energies = energies + ediff
+
+            # evaluate the scattering factors in batches to limit the memory usage
+            ends = np.cumsum(nqpoints)
+            starts = ends - nqpoints
+            for batch in _split_by_cost(nqpoints, max_qpoints):
+                q_slice = slice(starts[batch.start], ends[batch.stop - 1])
+                rates[idxs, ..., batch] += integrate_rates(
+                    [scatterers[i] for i in idxs],
+                    spin,
+                    b_idx,
+                    amset_data.kpoints[k_idxs[batch]],
+                    amset_data.velocities[spin][b_idx, k_idxs[batch]],
+                    energies[batch],
+                    amset_data.fermi_levels,
+                    amset_data.temperatures,
+                    qpoints[q_slice],
+                    weights[q_slice],
+                    nqpoints[batch],
+                    energy_diff=ediff,
+                )
+
+        self._set_chunk_rates(spin, b_idx, scattering_type, ir_idxs, rates)
+
+    def _finish_band_rates(self, spin, b_idx, jobs):
+        # apply the prefactors once all the jobs for a band have finished
+        if jobs["restored"]:
+            logger.info("  ├── rates restored from checkpoint")
+            return
+
+        vol = self.amset_data.structure.lattice.reciprocal_lattice.volume
+        conversion = vol / (4 * np.pi**2)
+        band_rates = self._rates[spin][..., b_idx, :]
 
+        _, elastic_slice, inelastic_slice = self._scatterer_slices
         if len(self.elastic_scatterers) > 0:
             elastic_prefactors = conversion * np.array(
                 [m.prefactor(spin, b_idx) for m in self.elastic_scatterers]
             )
-            elastic_rates = np.zeros(elastic_prefactors.shape + (nkpoints,))
+            band_rates[elastic_slice] *= elastic_prefactors[..., None]
 
-            if len(k_idx_in_cutoff) > 0:
-                if self.progress_bar:
-                    pbar = get_progress_bar(total=len(iterable), desc="elastic")
-                else:
-                    pbar = None
+        if len(self.inelastic_scatterers) > 0:
+            inelastic_prefactors = conversion * np.array(
+                [m.prefactor(spin, b_idx) for m in self.inelastic_scatterers]
+            )
+            band_rates[inelastic_slice] *= inelastic_prefactors[..., None]
 
-                for k_idx, ir_idx in iterable:
-                    self.in_queue.put((spin, b_idx, k_idx, False, ir_idx))
+        for scattering_type, nqpoints in jobs["nqpoints"].items():
+            logger.info(f"  ├── # {scattering_type} q-points: {nqpoints}")
 
-                for _ in range(len(iterable)):
-                    ir_idx, elastic_rates[..., ir_idx] = self._get_rate_from_queue()
-                    if pbar:
-                        pbar.update()
+        if jobs["ncached"] > 0:
+            ncached = jobs["ncached"]
+            logger.info(f"  ├── # k-points integrated from cache: {ncached}")
 
-                if pbar:
-                    pbar.close()
+        info = [f"# {t} chunks: {n}" for t, n in jobs["nchunks"].items()]
+        info += [
+            f"max rate: {band_rates.max():.4g}",
+            f"min rate: {band_rates.min():.4g}",
+        ]
+        log_list(info, level=logging.DEBUG)
 
-            elastic_rates *= elastic_prefactors[..., None]
-            to_stack.append(elastic_rates)
+    def _save_partial_rates(self, checkpoint, bands, band_jobs):
+        # save the rates of the bands that have new results since the last save; the
+        # prefactors have not yet been applied to these rates
+        for (spin, b_idx), jobs in zip(bands, band_jobs):
+            if not jobs["saved"]:
+                checkpoint.save_band(spin, b_idx, self._rates[spin], jobs["done"])
+                jobs["saved"] = True
 
+    @property
+    def _scattering_types(self):
+        # the scattering types that are calculated by the workers; each inelastic job
+        # covers the absorption and emission of all phonon energies
+        scattering_types = []
+        if len(self.elastic_scatterers) > 0:
+            scattering_types.append("elastic")
         if len(self.inelastic_scatterers) > 0:
-            inelastic_prefactors = conversion * np.array(
-                [m.prefactor(spin, b_idx) for m in self.inelastic_scatterers]
+            scattering_types.append("inelastic")
+        return scattering_types
+
+    @staticmethod
+    def _total_costs(band_jobs):
+        total_costs = defaultdict(int)
+        for jobs in band_jobs:
+            for scattering_type, cost in jobs["costs"].items():
+                total_costs[scattering_type] += cost
+        return {t: c for t, c in total_costs.items() if c > 0}
+
+    def _get_empty_rates(self):
+        # the rates array is the largest array of the calculation, so it is only
+        # allocated (and zeroed) by the worker pool, rather than copied into it
+        fermi_shape = self.amset_data.fermi_levels.shape
+        n_ir_kpoints = len(self.amset_data.ir_kpoints_idx)
+        return {
+            s: _EmptySharedArray(
+                (len(self.scatterers),) + fermi_shape + (len(e), n_ir_kpoints)
             )
-            inelastic_rates = np.zeros(inelastic_prefactors.shape + (nkpoints,))
-            f_pop = self.settings["pop_frequency"]
-            energy_diff = f_pop * 1e12 * 2 * np.pi * hbar * ev_to_hartree
+            for s, e in self.amset_data.energies.items()
+        }
 
-            if len(k_idx_in_cutoff) > 0:
-                if self.progress_bar:
-                    pbar = get_progress_bar(total=len(iterable) * 2, desc="inelastic")
-                else:
-                    pbar = None
+    @property
+    def _scatterer_slices(self):
+        # the position of the basic, elastic and inelastic rates in the rates array
+        nbasic = len(self.basic_scatterers)
+        nelastic = len(self.elastic_scatterers)
+        return (
+            slice(0, nbasic),
+            slice(nbasic, nbasic + nelastic),
+            slice(nbasic + nelastic, len(self.scatterers)),
+        )
 
-                inelastic_rates[:, :, :, ir_idx_in_cutoff] = 0
-                for k_idx, ir_idx in iterable:
-                    for ediff in [energy_diff, -energy_diff]:
-                        self.in_queue.put((spin, b_idx, k_idx, ediff, ir_idx))
+    def _set_chunk_rates(self, spin, b_idx, scattering_type, ir_idxs, chunk_rates):
+        scatterer_slice = self._scatterer_slices[
+            1 if scattering_type == "elastic" else 2
+        ]
+        self._rates[spin][scatterer_slice, ..., b_idx, :][..., ir_idxs] = chunk_rates
+
+    def _submit_jobs(self, spin, b_idx, k_idxs, ir_idxs, scattering_type):
+        # the workers write the rates directly into the shared rates array; returns the
+        # cost of each k-point and the number of chunks
+        if len(k_idxs) == 0:
+            return np.zeros(0, dtype=int), 0
+
+        # dispatch the most expensive k-points first, so that the cheap k-points fill
+        # in the gaps at the end; the workers take jobs from the queue as they become
+        # free. k-points with the same energy are kept together as the workers can
+        # reuse the tetrahedron intersections
+        costs = self._get_kpoint_costs(spin, b_idx, k_idxs, scattering_type)
+        energies = self.amset_data.energies[spin][b_idx, k_idxs]
+        order = np.lexsort((energies, -costs))
+        k_idxs = k_idxs[order]
+        ir_idxs = ir_idxs[order]
+        costs = costs[order]
+
+        chunks = self._get_chunks(costs, scattering_type)
+        for chunk in chunks:
+            job = (
+                spin,
+                b_idx,
+                k_idxs[chunk],
+                ir_idxs[chunk],
+                scattering_type,
+                self.integrand_cache is not None,
+            )
+            self.worker_pool.submit(job)
+        return costs, len(chunks)
+
+    def _get_kpoint_costs(self, spin, b_idx, k_idxs, scattering_type):
+        # the cost of a k-point is dominated by the number of intersected tetrahedra;
+        # each k-point also has a fixed overhead, equivalent to one tetrahedron
+        tbs = self.amset_data.tetrahedral_band_structure
+        energies = self.amset_data.energies[spin][b_idx, k_idxs]
+        if scattering_type == "inelastic":
+            energy_diffs = _get_energy_diffs(self.inelastic_scatterers, True)
+            energies = np.stack([energies + ediff for ediff, _ in energy_diffs])
+            return tbs.count_intersecting_tetrahedra(spin, energies).sum(axis=0) + 1
+        return tbs.count_intersecting_tetrahedra(spin, energies) + 1
+
+    def _get_chunks(self, costs, scattering_type):
+        max_cost = costs.sum() / (self.nworkers * _min_chunks_per_worker)
+        time_per_cost = self._time_per_cost[scattering_type]
+        if time_per_cost:
+            target_cost = min(_target_chunk_time / time_per_cost, max_cost)
+        else:
+            # no timing information yet; use the largest balanced chunk size
+            target_cost = max_cost
+        return _split_by_cost(costs, target_cost)
 
-                for i in range(len(iterable) * 2):
-                    ir_idx, rate = self._get_rate_from_queue()
-                    inelastic_rates[..., ir_idx] += rate
-                    if pbar:
-                        pbar.update()
+    def _get_rate_from_queue(self):
+        try:
+            return self.worker_pool.get_result()
+        except BaseException:
+            self.terminate_workers()
+            raise
+
+
+class AbstractScatteringWorkerPool(ABC):
+    """
+    Base class for the executors used to calculate scattering rates.
+
+    Pools receive the worker inputs once through :meth:`load` and are then sent jobs
+    using :meth:`submit`. Each job is a tuple of ``(spin, b_idx, k_idxs, ir_idxs,
+    scattering_type, return_integrand)`` and gives one result, as returned by
+    :meth:`get_result`, of ``(spin, b_idx, scattering_type, ir_idxs, time, nqpoints,
+    worker_id, integrands, rates)``. The integrands are None unless requested. The
+    rates are None if the worker wrote them into the shared rates array directly.
+
+    Attributes:
+        nworkers: The total number of workers. Only required to be set once the pool
+            has been started.
+        workers: None if the pool has not been started.
+        startup_time: The total time spent starting the pool.
+    """
+
+    nworkers: int
+    workers: Optional[Any]
+    startup_time: float
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @abstractmethod
+    def start(self):
+        """Start the workers. Does nothing if the pool is already running."""
+
+    @abstractmethod
+    def load(self, reference: tuple) -> tuple:
+        """
+        Load the data needed to calculate scattering into the workers.
+
+        Args:
+            reference: The worker inputs, in which arrays are given as shared buffers
+                (see ``amset.util.create_shared_array``). Arrays that only need to
+                be allocated, such as the rates, are given as ``_EmptySharedArray``.
+
+        Returns:
+            The reference in which the rates buffer is the array that the rates are
+            written to.
+        """
+
+    def set_memory_requirements(self, worker_memory: int, shared_memory: int = 0):
+        """
+        Set the memory needed to calculate the scattering rates.
+
+        Pools that choose the number of workers automatically can use this to limit
+        the number of workers to those that fit in memory. It must be called before
+        the pool is started to have any effect. The default implementation does
+        nothing.
+
+        Args:
+            worker_memory: The memory needed by each worker, in bytes.
+            shared_memory: The memory shared between all workers, in bytes.
+        """
+
+    @abstractmethod
+    def submit(self, job: tuple):
+        """Add a job to the queue."""
+
+    @abstractmethod
+    def get_result(self) -> tuple:
+        """Wait for the next finished job and return its result."""
+
+    @abstractmethod
+    def close(self):
+        """Stop the workers and release any resources."""
+
+
+class ScatteringWorkerPool(AbstractScatteringWorkerPool):
+    """
+    A pool of scattering worker processes that can be reused between calculations.
+
+    Starting the workers is expensive, as each process must import amset and compile
+    the numba kernels. The pool keeps the processes alive until :meth:`close` is
+    called, so the same pool can be passed to several ``ScatteringCalculator``
+    instances or ``Runner.run`` calls. Input data is held in named shared memory; when
+    new data is loaded, arrays that have not changed size are updated in place and
+    only the remaining arrays are reallocated.
+
+    Args:
+        nworkers: The number of processes. -1 uses all available processors, limited
+            to the number of workers that fit in the available memory if the memory
+            requirements are set before the pool is started (see
+            :meth:`set_memory_requirements`).
+        progress_bar: Whether to show a progress bar when starting the processes.
+        min_free_memory: If set, jobs are held back while the available memory is
+            below this value (in GB), until the running jobs have finished. At least
+            one job is always kept running.
+    """
 
-                if pbar:
-                    pbar.close()
+    def __init__(
+        self,
+        nworkers: int = defaults["nworkers"],
+        progress_bar: bool = defaults["print_log"],
+        min_free_memory: Optional[float] = defaults["min_free_memory"],
+    ):
+        self.nworkers = get_nworkers(nworkers)
+        self.progress_bar = progress_bar
+        self.min_free_memory = min_free_memory
+        self._auto_nworkers = nworkers == -1
+        self._queued_jobs = deque()
+        self._njobs = 0
+        self._lock = threading.Lock()
+        self.startup_time = 0
+        self.workers = None
+        self.in_queue = None
+        self.out_queue = None
+        self._barrier = None
+        self._shared_memory = []
 
-            inelastic_rates *= inelastic_prefactors[..., None]
-            to_stack.append(inelastic_rates)
+    def start(self):
+        if self.workers is not None:
+            return
 
-        all_band_rates = np.vstack(to_stack)
+        logger.info(f"Forking {self.nworkers} processes to calculate scattering")
+        t0 = time.perf_counter()
 
-        return all_band_rates[..., self.amset_data.ir_to_full_kpoint_mapping], fill_mask
+        ctx = multiprocessing.get_context("spawn")
+        self.in_queue = ctx.Queue()
+        self.out_queue = ctx.Queue()
+        self._barrier = ctx.Barrier(self.nworkers)
+        args = (self.in_queue, self.out_queue, self._barrier)
 
-    def _get_rate_from_queue(self):
+        self.workers = []
+        for _ in range(self.nworkers):
+            self.workers.append(ctx.Process(target=scattering_worker, args=args))
+
+        iterable = self.workers
+        if self.progress_bar:
+            iterable = get_progress_bar(self.workers, desc="workers")
+
+        for w in iterable:
+            w.start()
+        self._queued_jobs.clear()
+        self._njobs = 0
+
+        self.startup_time += time.perf_counter() - t0
+        log_time_taken(t0)
+
+    def load(self, reference: tuple) -> tuple:
+        """
+        Load the data needed to calculate scattering into the workers.
+
+        Args:
+            reference: The worker inputs, in which arrays are given as shared buffers
+                (see ``amset.util.create_shared_array``).
+
+        Returns:
+            The reference with all buffers replaced by the shared memory of the pool.
+        """
+        arrays = []
+        skeleton = _split_reference(reference, arrays)
+        return self.load_split(skeleton, arrays)
+
+    def load_split(self, skeleton: tuple, arrays: List[Any]) -> tuple:
+        """
+        Load worker inputs that have already been split from their arrays.
+
+        This is used by scattering servers, which receive the inputs from a client
+        with the arrays sent separately.
+
+        Args:
+            skeleton: The worker inputs, in which arrays are replaced by their index
+                in ``arrays``.
+            arrays: The arrays of the worker inputs. Arrays that only need to be
+                allocated are given as ``_EmptySharedArray``.
+
+        Returns:
+            The worker inputs with all arrays replaced by the shared memory of the
+            pool.
+        """
+        self.start()
+
+        nreallocated = 0
+        for i, array in enumerate(arrays):
+            nbytes = max(array.nbytes, 1)
+            if i == len(self._shared_memory):
+                self._shared_memory.append(None)
+            elif self._shared_memory[i].size >= nbytes:
+                shared = np.ndarray(
+                    array.shape, array.dtype, self._shared_memory[i].buf
+                )
+                shared[...] = 0 if isinstance(array, _EmptySharedArray) else array
+                continue
+            else:
+                _release_shared_memory(self._shared_memory[i])
+
+            self._shared_memory[i] = SharedMemory(create=True, size=nbytes)
+            shared = np.ndarray(array.shape, array.dtype, self._shared_memory[i].buf)
+            shared[...] = 0 if isinstance(array, _EmptySharedArray) else array
+            nreallocated += 1
+
+        for shared_memory in self._shared_memory[len(arrays) :]:
+            _release_shared_memory(shared_memory)
+        del self._shared_memory[len(arrays) :]
+        logger.debug(f"Reallocated {nreallocated} of {len(arrays)} shared arrays")
+
+        names = [m.name for m in self._shared_memory]
+        for _ in range(self.nworkers):
+            self.in_queue.put(("load", skeleton, names))
+
+        for _ in range(self.nworkers):
+            self._get_result()
+
+        return _join_reference(skeleton, [m.buf for m in self._shared_memory])
+
+    def set_memory_requirements(self, worker_memory: int, shared_memory: int = 0):
+        if self._auto_nworkers and self.workers is None:
+            self.nworkers = get_nworkers(-1, worker_memory, shared_memory)
+
+    def submit(self, job: tuple):
+        if self.min_free_memory is None:
+            self.in_queue.put(job)
+        else:
+            with self._lock:
+                self._queued_jobs.append(job)
+                self._send_jobs()
+
+    def get_result(self):
+        result = self._get_result()
+        if self.min_free_memory is not None:
+            with self._lock:
+                self._njobs -= 1
+                self._send_jobs()
+        return result
+
+    def _send_jobs(self):
+        # keep one job waiting for each worker, but pause sending new jobs while
+        # memory is low so that running jobs can finish and release their memory
+        min_free_memory = self.min_free_memory * 1024**3
+        while self._queued_jobs and self._njobs < 2 * self.nworkers:
+            if self._njobs > 0 and get_available_memory() < min_free_memory:
+                logger.debug(f"Low memory; holding {len(self._queued_jobs)} jobs")
+                break
+            self.in_queue.put(self._queued_jobs.popleft())
+            self._njobs += 1
+
+    def _get_result(self):
         # handle exception gracefully to avoid hanging processes
         try:
             result = self.out_queue.get(timeout=10)
@@ -503,13 +1317,13 @@ class ScatteringCalculator:
             # didn't receive anything for 10 seconds; this could be OK or it could
             # the processes have been killed
             if not self._workers_alive():
-                self.terminate_workers()
+                self.close()
                 raise MemoryError(
                     "Some subprocessess were killed unexpectedly. Could be OOM "
-                    "Killer?\nTry reducing nworkers."
+                    "Killer?\nTry reducing nworkers or setting min_free_memory."
                 )
             else:
-                return self._get_rate_from_queue()
+                return self._get_result()
 
         if isinstance(result[0], Exception):
             logger.error(
@@ -517,61 +1331,109 @@ class ScatteringCalculator:
                     str(result[1])
                 )
             )
-            self.terminate_workers()
+            self.close()
             raise result[0]
         return result
 
+    def close(self):
+        # The "None"s at the end of the queue signals to the workers that there are
+        # no more jobs left and they must therefore exit.
+        if self.workers is not None:
+            for i in range(self.nworkers):
+                self.in_queue.put(None)
+
+            for w in self.workers:
+                w.terminate()
+                w.join(0)
+
+            self.in_queue.close()
+            self.out_queue.close()
+
+            self.workers = None
+
+        for shared_memory in self._shared_memory:
+            _release_shared_memory(shared_memory)
+        self._shared_memory = []
+
     def _workers_alive(self):
         return all([worker.is_alive() for worker in self.workers])
 
 
-def scattering_worker(
-    tbs_reference,
-    overlap_type,
-    overlap_calculator_reference,
-    mrta_calculator_reference,
-    elastic_scatterers,
-    inelastic_scatterers,
-    amset_data_min_reference,
-    coeffs_buffer,
-    coeffs_mapping_buffer,
-    in_queue,
-    out_queue,
-):
+class _SharedArrayKey:
+    # placeholder for a shared buffer when sending a reference to the workers
+    def __init__(self, index, shape, data_type, nbytes):
+        self.index = index
+        self.shape = shape
+        self.data_type = data_type
+        self.nbytes = nbytes
+
+
+class _EmptySharedArray:
+    # placeholder for a zeroed shared array that is allocated by the worker pool
+    def __init__(self, shape, dtype=np.float64):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.nbytes = int(np.prod(self.shape)) * self.dtype.itemsize
+
+
+def _allocate_empty_arrays(obj):
+    # replace the empty array placeholders in a (nested) reference with new buffers
+    if isinstance(obj, _EmptySharedArray):
+        return allocate_shared_array(obj.shape, obj.dtype)[0]
+    elif isinstance(obj, (tuple, list)):
+        return type(obj)(_allocate_empty_arrays(x) for x in obj)
+    elif isinstance(obj, dict):
+        return {k: _allocate_empty_arrays(v) for k, v in obj.items()}
+    return obj
+
+
+def _is_buffer(obj):
+    return isinstance(obj, tuple) and len(obj) == 3 and isinstance(obj[0], ctypes.Array)
+
+
+def _split_reference(obj, arrays):
+    # replace all shared buffers in a (nested) reference with keys, and add the
+    # underlying arrays to arrays
+    if _is_buffer(obj):
+        array = array_from_buffer(obj)
+        arrays.append(array)
+        return _SharedArrayKey(len(arrays) - 1, obj[1], obj[2], array.nbytes)
+    elif isinstance(obj, _EmptySharedArray):
+        arrays.append(obj)
+        data_type = np.ctypeslib.as_ctypes_type(obj.dtype)
+        return _SharedArrayKey(len(arrays) - 1, obj.shape, data_type, obj.nbytes)
+    elif isinstance(obj, (tuple, list)):
+        return type(obj)(_split_reference(x, arrays) for x in obj)
+    elif isinstance(obj, dict):
+        return {k: _split_reference(v, arrays) for k, v in obj.items()}
+    return obj
+
+
+def _join_reference(obj, buffers):
+    # inverse of _split_reference, using memory buffers in place of the arrays
+    if isinstance(obj, _SharedArrayKey):
+        return buffers[obj.index][: obj.nbytes], obj.shape, obj.data_type
+    elif isinstance(obj, (tuple, list)):
+        return type(obj)(_join_reference(x, buffers) for x in obj)
+    elif isinstance(obj, dict):
+        return {k: _join_reference(v, buffers) for k, v in obj.items()}
+    return obj
+
+
+def _release_shared_memory(shared_memory, unlink=True):
     try:
-        tbs = TetrahedralBandStructure.from_reference(*tbs_reference)
-        mrta_calculator = MRTACalculator.from_reference(*mrta_calculator_reference)
-        amset_data_min = _AmsetDataMin.from_reference(*amset_data_min_reference)
-
-        if coeffs_buffer is None:
-            coeffs = None
-            coeffs_mapping = None
-        else:
-            coeffs = dict_array_from_buffer(coeffs_buffer)
-            coeffs_mapping = dict_array_from_buffer(coeffs_mapping_buffer)
-
-        if overlap_type == "wavefunction":
-            overlap_calculator = WavefunctionOverlapCalculator.from_reference(
-                *overlap_calculator_reference
-            )
-        elif overlap_type == "unity":
-            overlap_calculator = UnityWavefunctionOverlap()
-        elif overlap_type == "projection":
-            overlap_calculator = ProjectionOverlapCalculator.from_reference(
-                *overlap_calculator_reference
-            )
-        else:
-            raise ValueError(f"Unrecognised overlap type: {overlap_type}")
+        shared_memory.close()
+    except BufferError:
+        # arrays still reference the memory; it will be freed once they are deleted
+        pass
+    if unlink:
+        shared_memory.unlink()
 
-        elastic_scatterers = [
-            (
-                AcousticDeformationPotentialScattering.from_reference(*s)
-                if isinstance(s, tuple)
-                else s
-            )
-            for s in elastic_scatterers
-        ]
 
+def scattering_worker(in_queue, out_queue, barrier):
+    shared_memory = {}
+    data = None
+    try:
         with np.errstate(all="ignore"):
             while True:
                 job = in_queue.get()
@@ -579,51 +1441,174 @@ def scattering_worker(
                 if job is None:
                     break
 
-                spin, b_idx, k_idx, energy_diff, ir_k_idx = job
-                rate = calculate_rate(
-                    tbs,
-                    overlap_calculator,
-                    mrta_calculator,
-                    elastic_scatterers,
-                    inelastic_scatterers,
-                    amset_data_min,
-                    coeffs,
-                    coeffs_mapping,
+                if job[0] == "load":
+                    _, skeleton, names = job
+
+                    # only attach to shared memory that has been newly allocated
+                    data = None
+                    for name in set(shared_memory).difference(names):
+                        _release_shared_memory(shared_memory.pop(name), unlink=False)
+                    for name in names:
+                        if name not in shared_memory:
+                            shared_memory[name] = SharedMemory(name=name)
+
+                    buffers = [shared_memory[name].buf for name in names]
+                    data = _load_worker_data(*_join_reference(skeleton, buffers))
+                    out_queue.put(("loaded", None))
+
+                    # ensure each worker receives exactly one load message
+                    barrier.wait()
+                    continue
+
+                t0 = time.perf_counter()
+                spin, b_idx, k_idxs, ir_idxs, scattering_type, return_integrand = job
+                rates, nqpoints, *integrands = calculate_rates(
+                    data["tbs"],
+                    data["overlap_calculator"],
+                    data["mrta_calculator"],
+                    data["elastic_scatterers"],
+                    data["inelastic_scatterers"],
+                    data["amset_data_min"],
+                    data["coeffs"],
+                    data["coeffs_mapping"],
                     spin,
                     b_idx,
-                    k_idx,
-                    energy_diff=energy_diff,
+                    k_idxs,
+                    inelastic=scattering_type == "inelastic",
+                    return_nqpoints=True,
+                    return_integrand=return_integrand,
+                )
+                rates_slice = data["rates_slices"][scattering_type]
+                data["rates"][spin][rates_slice, ..., b_idx, :][..., ir_idxs] = rates
+
+                # the rates have already been written to shared memory so are not
+                # included in the result
+                chunk_time = time.perf_counter() - t0
+                out_queue.put(
+                    (
+                        spin,
+                        b_idx,
+                        scattering_type,
+                        ir_idxs,
+                        chunk_time,
+                        nqpoints,
+                        os.getpid(),
+                        integrands[0] if return_integrand else None,
+                        None,
+                    )
                 )
-                out_queue.put((ir_k_idx, rate))
 
     except BaseException as e:
+        barrier.abort()
         error_msg = traceback.format_exc()
         out_queue.put((e, error_msg))
 
 
+def _load_worker_data(
+    tbs_reference,
+    overlap_type,
+    overlap_calculator_reference,
+    mrta_calculator_reference,
+    elastic_scatterers,
+    inelastic_scatterers,
+    amset_data_min_reference,
+    coeffs_buffer,
+    coeffs_mapping_buffer,
+    rates_buffer,
+    rates_slices,
+):
+    if coeffs_buffer is None:
+        coeffs = None
+        coeffs_mapping = None
+    else:
+        coeffs = dict_array_from_buffer(coeffs_buffer)
+        coeffs_mapping = dict_array_from_buffer(coeffs_mapping_buffer)
+
+    if overlap_type == "wavefunction":
+        overlap_calculator = WavefunctionOverlapCalculator.from_reference(
+            *overlap_calculator_reference
+        )
+    elif overlap_type == "unity":
+        overlap_calculator = UnityWavefunctionOverlap()
+    elif overlap_type == "projection":
+        overlap_calculator = ProjectionOverlapCalculator.from_reference(
+            *overlap_calculator_reference
+        )
+    else:
+        raise ValueError(f"Unrecognised overlap type: {overlap_type}")
+
+    elastic_scatterers = [
+        (
+            AcousticDeformationPotentialScattering.from_reference(*s)
+            if isinstance(s, tuple)
+            else s
+        )
+        for s in elastic_scatterers
+    ]
+
+    return {
+        "tbs": TetrahedralBandStructure.from_reference(*tbs_reference),
+        "overlap_calculator": overlap_calculator,
+        "mrta_calculator": MRTACalculator.from_reference(*mrta_calculator_reference),
+        "elastic_scatterers": elastic_scatterers,
+        "inelastic_scatterers": inelastic_scatterers,
+        "amset_data_min": _AmsetDataMin.from_reference(*amset_data_min_reference),
+        "coeffs": coeffs,
+        "coeffs_mapping": coeffs_mapping,
+        "rates": dict_array_from_buffer(rates_buffer),
+        "rates_slices": rates_slices,
+    }
+
+
 class _AmsetDataMin:
-    def __init__(self, structure, kpoint_mesh, velocities, fermi_levels, temperatures):
+    def __init__(
+        self,
+        structure,
+        kpoint_mesh,
+        velocities,
+        fermi_levels,
+        temperatures,
+        kpoint_symmetry_mapping=None,
+        quadrature_tolerances=quadrature_tolerances["balanced"],
+    ):
         self.structure = structure
         self.kpoint_mesh = kpoint_mesh
         self.velocities = velocities
         self.fermi_levels = fermi_levels
         self.temperatures = temperatures
+        self.kpoint_symmetry_mapping = kpoint_symmetry_mapping
+        self.quadrature_tolerances = quadrature_tolerances
 
     def to_reference(self):
         velocities_buffer, self.velocities = create_shared_dict_array(
             self.velocities, return_shared_data=True
         )
+        if self.kpoint_symmetry_mapping is None:
+            mapping_buffer = None
+        else:
+            mapping_buffer, self.kpoint_symmetry_mapping = create_shared_array(
+                self.kpoint_symmetry_mapping, return_shared_data=True
+            )
         return (
             self.structure,
             self.kpoint_mesh,
             velocities_buffer,
             self.fermi_levels,
             self.temperatures,
+            mapping_buffer,
+            self.quadrature_tolerances,
         )
 
     @classmethod
     def from_reference(
-        cls, structure, kpoint_mesh, velocities_buffer, fermi_levels, temperatures
+        cls,
+        structure,
+        kpoint_mesh,
+        velocities_buffer,
+        fermi_levels,
+        temperatures,
+        mapping_buffer,
+        tolerances,
     ):
         return cls(
             structure,
@@ -631,16 +1616,25 @@ class _AmsetDataMin:
             dict_array_from_buffer(velocities_buffer),
             fermi_levels,
             temperatures,
+            None if mapping_buffer is None else array_from_buffer(mapping_buffer),
+            tolerances,
         )
 
     @classmethod
-    def from_amset_data(cls, amset_data):
+    def from_amset_data(
+        cls,
+        amset_data,
+        kpoint_symmetry_mapping=None,
+        quadrature_tolerances=quadrature_tolerances["balanced"],
+    ):
         return cls(
             amset_data.structure,
             amset_data.kpoint_mesh,
             amset_data.velocities,
             amset_data.fermi_levels,
             amset_data.temperatures,
+            kpoint_symmetry_mapping=kpoint_symmetry_mapping,
+            quadrature_tolerances=quadrature_tolerances,
         )
 
 
@@ -656,35 +1650,297 @@ def calculate_rate(
     spin,
     b_idx,
     k_idx,
-    energy_diff=None,
+    inelastic=False,
 ):
+    return calculate_rates(
+        tbs,
+        overlap_calculator,
+        mrta_calculator,
+        elastic_scatterers,
+        inelastic_scatterers,
+        amset_data_min,
+        coeffs,
+        coeffs_mapping,
+        spin,
+        b_idx,
+        [k_idx],
+        inelastic=inelastic,
+    )[..., 0]
+
+
+def calculate_rates(
+    tbs: TetrahedralBandStructure,
+    overlap_calculator,
+    mrta_calculator,
+    elastic_scatterers,
+    inelastic_scatterers,
+    amset_data_min: _AmsetDataMin,
+    coeffs,
+    coeffs_mapping,
+    spin,
+    b_idx,
+    k_idxs,
+    inelastic=False,
+    return_nqpoints=False,
+    return_integrand=False,
+):
+    """
+    Calculate the scattering rates for several initial k-points in the same band.
+
+    The tetrahedron intersections are found separately for each k-point, but the
+    scattering factors for all k-points are evaluated together over the stacked
+    q-points, and summed for each k-point using segment sums.
+
+    For inelastic scattering, the rates of all scatterers are calculated in a single
+    pass over the k-points, including both the absorption and emission of each unique
+    phonon energy. The overlaps with the final states of all energies are calculated
+    together for each k-point.
+
+    Returns:
+        The rates with the shape (nscatterers, ndoping, ntemperatures, nkpoints). If
+        ``return_nqpoints`` is True, the total number of q-points used to integrate
+        the rates is also returned. If ``return_integrand`` is True, the integrand is
+        also returned as a list with a tuple of the q-points, their integration
+        weights, and the number of q-points of each k-point for each energy
+        difference (see ``_get_energy_diffs``). The integrand does not depend on the
+        doping or temperature, and can be integrated using ``integrate_rates``.
+    """
+    scatterers = inelastic_scatterers if inelastic else elastic_scatterers
+    energy_diffs = _get_energy_diffs(scatterers, inelastic)
+    k_idxs = np.asarray(k_idxs)
+    fermi_shape = amset_data_min.fermi_levels.shape
+    rates = np.zeros((len(scatterers),) + fermi_shape + (len(k_idxs),))
+
+    # k-points with the same energy intersect the same tetrahedra; process the
+    # k-points sorted by energy so the intersections only need to be found once
+    energies = tbs.energies[spin][b_idx, k_idxs]
+    unique_energies, energy_idxs = np.unique(energies, return_inverse=True)
+    geometries = [None] * len(k_idxs)
+    last_energy_idx = None
+    tetrahedra_dos = None
+    for i in np.argsort(energy_idxs, kind="stable"):
+        if energy_idxs[i] != last_energy_idx:
+            last_energy_idx = energy_idxs[i]
+            energy = unique_energies[last_energy_idx]
+            tetrahedra_dos = [
+                tbs.get_tetrahedra_density_of_states(
+                    spin,
+                    energy + ediff if ediff else energy,
+                    return_contributions=True,
+                    symmetry_reduce=False,
+                    # band_idx=b_idx,  # turn this on to disable interband scattering
+                )
+                for ediff, _ in energy_diffs
+            ]
+
+        geometries[i] = _get_scattering_geometries(
+            tbs,
+            overlap_calculator,
+            amset_data_min,
+            coeffs,
+            coeffs_mapping,
+            spin,
+            b_idx,
+            k_idxs[i],
+            tetrahedra_dos,
+        )
+
+    # evaluate the scattering factors in batches to limit the memory usage
+    max_qpoints = max(_max_batch_size // max(rates[..., 0].size, 1), 1)
+    all_nqpoints = np.zeros((len(energy_diffs), len(k_idxs)), dtype=int)
+    integrands = []
+    for j, (ediff, idxs) in enumerate(energy_diffs):
+        batches = [[]]
+        nqpoints = 0
+        for i, k_geometries in enumerate(geometries):
+            if k_geometries[j] is None:
+                continue
+
+            if nqpoints >= max_qpoints:
+                batches.append([])
+                nqpoints = 0
+            batches[-1].append(i)
+            nqpoints += len(k_geometries[j][0])
+
+        all_qpoints = [np.zeros((0, 3))]
+        all_weights = [np.zeros(0)]
+        for batch in filter(None, batches):
+            qpoints, weights, nqpoints = _get_batch_integrand(
+                tbs,
+                mrta_calculator,
+                amset_data_min,
+                spin,
+                b_idx,
+                k_idxs[batch],
+                [geometries[i][j] for i in batch],
+                ediff,
+            )
+            batch_rates = integrate_rates(
+                [scatterers[s] for s in idxs],
+                spin,
+                b_idx,
+                tbs.kpoints[k_idxs[batch]],
+                amset_data_min.velocities[spin][b_idx, k_idxs[batch]],
+                energies[batch] + ediff if ediff else energies[batch],
+                amset_data_min.fermi_levels,
+                amset_data_min.temperatures,
+                qpoints,
+                weights,
+                nqpoints,
+                energy_diff=ediff,
+            )
+            for s_idx, s_rates in zip(idxs, batch_rates):
+                rates[s_idx][..., batch] += s_rates
+            all_nqpoints[j, batch] = nqpoints
+            if return_integrand:
+                all_qpoints.append(qpoints)
+                all_weights.append(weights)
+
+        if return_integrand:
+            integrands.append(
+                (np.concatenate(all_qpoints), np.concatenate(all_weights))
+                + (all_nqpoints[j],)
+            )
+
+    results = (rates,)
+    if return_nqpoints:
+        results += (all_nqpoints.sum(),)
+    if return_integrand:
+        results += (integrands,)
+    return results if len(results) > 1 else rates
+
+
+def _get_energy_diffs(scatterers, inelastic):
+    # get the energy differences between the initial and final states, and the
+    # indices of the scatterers that use each one. Inelastic rates are calculated for
+    # both +ħω (absorption) and -ħω (emission) for each unique phonon energy, whereas
+    # the energy difference is None for elastic scattering
+    if not inelastic:
+        return [(None, list(range(len(scatterers))))]
+
+    phonon_energies = np.array([s.energy_diff for s in scatterers])
+    energy_diffs = []
+    for energy in np.unique(phonon_energies):
+        idxs = np.where(phonon_energies == energy)[0].tolist()
+        energy_diffs.extend([(energy, idxs), (-energy, idxs)])
+    return energy_diffs
+
+
+def _get_scattering_geometries(
+    tbs: TetrahedralBandStructure,
+    overlap_calculator,
+    amset_data_min: _AmsetDataMin,
+    coeffs,
+    coeffs_mapping,
+    spin,
+    b_idx,
+    k_idx,
+    tetrahedra_dos,
+):
+    # get the q-points, their integration weights (including the overlap), and the
+    # band index of the final state for a single initial k-point. tetrahedra_dos
+    # contains the intersected tetrahedra for each final state energy; the overlaps
+    # for all energies are calculated at once
+    intersections = []
+    for tet_dos, tet_mask, cs_weights, tet_contributions in tetrahedra_dos:
+        if len(tet_dos) == 0:
+            intersections.append(None)
+            continue
+
+        if amset_data_min.kpoint_symmetry_mapping is not None:
+            # only integrate over the tetrahedra that are inequivalent under the
+            # little group of k, weighted by the number of equivalent tetrahedra
+            reduced = _get_little_group_tetrahedra(
+                tbs.get_sorted_tetrahedra(spin, tet_mask),
+                tet_mask[0],
+                amset_data_min.kpoint_symmetry_mapping,
+                k_idx,
+            )
+            if reduced is not None:
+                tet_idx, multiplicity = reduced
+                tet_mask = (tet_mask[0][tet_idx], tet_mask[1][tet_idx])
+                cs_weights = cs_weights[tet_idx] * multiplicity
+                tet_contributions = tuple(c[tet_idx] for c in tet_contributions)
+        intersections.append((tet_mask, cs_weights, tet_contributions))
+
+    if all(intersection is None for intersection in intersections):
+        return intersections
+
+    if isinstance(overlap_calculator, UnityWavefunctionOverlap):
+        # the overlaps are constant so don't need to be calculated or interpolated
+        tet_overlaps = [None] * len(intersections)
+    else:
+        tet_overlaps = _get_cross_section_overlaps(
+            tbs,
+            overlap_calculator,
+            coeffs,
+            coeffs_mapping,
+            spin,
+            b_idx,
+            k_idx,
+            intersections,
+        )
+
+    k = tbs.kpoints[k_idx]
     rlat = amset_data_min.structure.lattice.reciprocal_lattice.matrix
-    velocity = amset_data_min.velocities[spin][b_idx, k_idx]
-    energy = tbs.energies[spin][b_idx, k_idx]
+    k_spacing = np.linalg.norm(np.dot(rlat, 1 / amset_data_min.kpoint_mesh))
+    high_tol, med_tol = amset_data_min.quadrature_tolerances
+
+    geometries = []
+    for intersection, tet_overlap in zip(intersections, tet_overlaps):
+        if intersection is None:
+            geometries.append(None)
+            continue
+
+        tet_mask, cs_weights, tet_contributions = intersection
+        tetrahedra = tbs.get_sorted_tetrahedra(spin, tet_mask)
+
+        # have to deal with the case where the tetrahedron cross section crosses the
+        # zone boundary. This is a slight inaccuracy but we just treat the
+        # cross section as if it is on one side of the boundary
+        tet_kpoints = tbs.kpoints[tetrahedra]
+        base_kpoints = tet_kpoints[:, 0][:, None, :]
+        k_diff = pbc_diff(tet_kpoints, base_kpoints) + pbc_diff(base_kpoints, k)
+
+        # project the tetrahedron cross sections onto 2D surfaces in either a
+        # triangle or quadrilateral
+        k_diff = np.dot(k_diff, rlat)
+        qpoints, weights, mapping = get_cross_section_qpoints(
+            k_diff,
+            tet_contributions,
+            cs_weights,
+            high_tol=k_spacing * high_tol,
+            med_tol=k_spacing * med_tol,
+        )
 
-    if energy_diff:
-        energy += energy_diff
-
-    (
-        tet_dos,
-        tet_mask,
-        cs_weights,
-        tet_contributions,
-    ) = tbs.get_tetrahedra_density_of_states(
-        spin,
-        energy,
-        return_contributions=True,
-        symmetry_reduce=False,
-        # band_idx=b_idx,  # turn this on to disable interband scattering
-    )
+        # this is too expensive vs tetrahedron integration and doesn't add much more
+        # accuracy; could offer this as an option
+        # overlap = self.amset_data.overlap_calculator.get_overlap(
+        #     spin, b_idx, k, tet_mask[0][mapping], k_primes
+        # )
+        if tet_overlap is not None:
+            weights = tet_overlap[mapping] * weights
+        geometries.append((qpoints, weights, tet_mask[0][mapping]))
+    return geometries
 
-    if len(tet_dos) == 0:
-        return 0
 
-    # next, get k-point indices and band_indices
-    property_mask, band_kpoint_mask, band_mask, kpoint_mask = tbs.get_masks(
-        spin, tet_mask
-    )
+def _get_cross_section_overlaps(
+    tbs: TetrahedralBandStructure,
+    overlap_calculator,
+    coeffs,
+    coeffs_mapping,
+    spin,
+    b_idx,
+    k_idx,
+    intersections,
+):
+    # get the overlap at the centre of the cross sections of each set of intersected
+    # tetrahedra; the overlaps with the final states at the tetrahedron vertices are
+    # calculated for all sets at once. The final states are indexed using compact
+    # maps, so no arrays with the shape (nbands, nkpoints) are needed
+    tet_masks = [i[0] for i in intersections if i is not None]
+    tet_mask = tuple(np.concatenate(m) for m in zip(*tet_masks))
+    band_mask, kpoint_mask, vertex_states = tbs.get_vertex_states(spin, tet_mask)
     k = tbs.kpoints[k_idx]
     k_primes = tbs.kpoints[kpoint_mask]
 
@@ -704,80 +1960,194 @@ def calculate_rate(
             )
     else:
         overlap = overlap_calculator.get_overlap(spin, b_idx, k, band_mask, k_primes)
+    overlap = np.broadcast_to(overlap, band_mask.shape)
+
+    tet_overlaps = []
+    start = 0
+    for intersection in intersections:
+        if intersection is None:
+            tet_overlaps.append(None)
+            continue
+
+        # now select the properties at the tetrahedron vertices
+        end = start + len(intersection[0][0])
+        vert_overlap = overlap[vertex_states[start:end]]
+        start = end
+
+        # get interpolated overlap at centre of tetrahedra cross sections
+        tet_overlaps.append(get_cross_section_values(vert_overlap, *intersection[2]))
+    return tet_overlaps
+
+
+def _get_little_group_tetrahedra(tetrahedra, band_idxs, kpoint_symmetry_mapping, k_idx):
+    # group the tetrahedra into orbits under the operations that leave k unchanged;
+    # returns the index of one tetrahedron per orbit and the size of the orbit
+    little_group = kpoint_symmetry_mapping[kpoint_symmetry_mapping[:, k_idx] == k_idx]
+    if len(little_group) == 1:
+        return None
+
+    # the images of each tetrahedron as sorted vertex indices, packed into two keys
+    nkpoints = np.int64(kpoint_symmetry_mapping.shape[1])
+    images = np.sort(little_group[:, tetrahedra], axis=-1).astype(np.int64)
+    key_a = images[..., 0] * nkpoints + images[..., 1]
+    key_b = images[..., 2] * nkpoints + images[..., 3]
+
+    # label each orbit by its lexicographically smallest image
+    min_a = key_a.min(axis=0)
+    min_b = np.where(key_a == min_a, key_b, np.iinfo(np.int64).max).min(axis=0)
+
+    order = np.lexsort((min_b, min_a, band_idxs))
+    new_orbit = np.full(len(order), True)
+    new_orbit[1:] = (
+        (np.diff(band_idxs[order]) != 0)
+        | (np.diff(min_a[order]) != 0)
+        | (np.diff(min_b[order]) != 0)
+    )
+    starts = np.where(new_orbit)[0]
+    multiplicity = np.diff(np.append(starts, len(order)))
+    representatives = order[starts]
 
-    # put overlap back in array with shape (nbands, nkpoints)
-    all_overlap = np.zeros(tbs.energies[spin].shape)
-    all_overlap[band_kpoint_mask] = overlap
-
-    # now select the properties at the tetrahedron vertices
-    vert_overlap = all_overlap[property_mask]
+    sort_idx = np.argsort(representatives)
+    return representatives[sort_idx], multiplicity[sort_idx]
 
-    # get interpolated overlap at centre of tetrahedra cross sections
-    tet_overlap = get_cross_section_values(vert_overlap, *tet_contributions)
-    tetrahedra = tbs.tetrahedra[spin][tet_mask]
 
-    # have to deal with the case where the tetrahedron cross section crosses the
-    # zone boundary. This is a slight inaccuracy but we just treat the
-    # cross section as if it is on one side of the boundary
-    tet_kpoints = tbs.kpoints[tetrahedra]
-    base_kpoints = tet_kpoints[:, 0][:, None, :]
-    k_diff = pbc_diff(tet_kpoints, base_kpoints) + pbc_diff(base_kpoints, k)
+def _get_batch_integrand(
+    tbs: TetrahedralBandStructure,
+    mrta_calculator,
+    amset_data_min: _AmsetDataMin,
+    spin,
+    b_idx,
+    k_idxs,
+    geometries,
+    energy_diff,
+):
+    # combine the q-points of several k-points with their integration weights; the
+    # weights include the overlap and MRTA factors, neither of which depend on the
+    # doping or temperature
+    rlat = amset_data_min.structure.lattice.reciprocal_lattice.matrix
+    nqpoints = np.array([len(g[0]) for g in geometries])
+    qpoints = np.concatenate([g[0] for g in geometries])
+    weights = np.concatenate([g[1] for g in geometries])
+
+    if not energy_diff:
+        kpoints = tbs.kpoints[k_idxs]
+        segments = np.repeat(np.arange(len(geometries)), nqpoints)
+        k_primes = np.dot(qpoints, np.linalg.inv(rlat)) + kpoints[segments]
+        k_primes = kpoints_to_first_bz(k_primes)
+        weights = weights * mrta_calculator.get_mrta_factors(
+            spin,
+            b_idx,
+            kpoints,
+            np.concatenate([g[2] for g in geometries]),
+            k_primes,
+            segments,
+        )
+    weights = weights / amset_data_min.structure.lattice.reciprocal_lattice.volume
+    return qpoints, weights, nqpoints
+
+
+def integrate_rates(
+    scatterers,
+    spin: Spin,
+    b_idx: int,
+    kpoints: np.ndarray,
+    velocities: np.ndarray,
+    energies: np.ndarray,
+    fermi_levels: np.ndarray,
+    temperatures: np.ndarray,
+    qpoints: np.ndarray,
+    weights: np.ndarray,
+    nqpoints: np.ndarray,
+    energy_diff=None,
+) -> np.ndarray:
+    """
+    Integrate the scattering rates for several k-points from their scattering
+    integrand.
+
+    Only the scattering factors, which depend on the doping and temperature, are
+    evaluated. The integrand is obtained from ``calculate_rates`` with
+    ``return_integrand=True``.
+
+    Args:
+        scatterers: The elastic or inelastic scatterers.
+        spin: The spin.
+        b_idx: The band index.
+        kpoints: The initial k-points, with the shape (nkpoints, 3).
+        velocities: The group velocity of each k-point, with the shape (nkpoints, 3).
+        energies: The energy of the final states of each k-point, i.e., including
+            the energy difference for inelastic scattering.
+        fermi_levels: The Fermi levels with the shape (ndoping, ntemperatures).
+        temperatures: The temperatures.
+        qpoints: The q-points of all k-points, in Cartesian reciprocal coordinates.
+        weights: The integration weight of each q-point.
+        nqpoints: The number of q-points of each k-point.
+        energy_diff: The energy difference for inelastic scattering.
+
+    Returns:
+        The rates with the shape (nscatterers, ndoping, ntemperatures, nkpoints),
+        excluding the scattering prefactors.
+    """
+    rates = np.zeros((len(scatterers),) + fermi_levels.shape + (len(kpoints),))
+    has_qpoints = nqpoints > 0
+    if not has_qpoints.any():
+        return rates
 
-    # project the tetrahedron cross sections onto 2D surfaces in either a triangle
-    # or quadrilateral
-    k_diff = np.dot(k_diff, rlat)
-    intersections = get_cross_section_values(k_diff, *tet_contributions, average=False)
-    projected_intersections, basis = get_projected_intersections(intersections)
+    nqpoints = nqpoints[has_qpoints]
+    kpoints = kpoints[has_qpoints]
+    starts = np.cumsum(nqpoints) - nqpoints
+    segments = np.repeat(np.arange(len(nqpoints)), nqpoints)
 
-    k_spacing = np.linalg.norm(np.dot(rlat, 1 / amset_data_min.kpoint_mesh))
-    qpoints, weights, mapping = get_fine_mesh_qpoints(
-        projected_intersections,
-        basis,
-        *tet_contributions[0:3],
-        high_tol=k_spacing * 0.5,
-        med_tol=k_spacing * 2,
-        cross_section_weights=cs_weights,
-    )
     qpoint_norm_sq = np.sum(qpoints**2, axis=-1)
 
-    k_primes = np.dot(qpoints, np.linalg.inv(rlat)) + k
-    k_primes = kpoints_to_first_bz(k_primes)
-
     # unit q in reciprocal cartesian coordinates
     unit_q = qpoints / np.sqrt(qpoint_norm_sq)[:, None]
     if energy_diff:
-        e_fd = _get_fd(energy, amset_data_min.fermi_levels, amset_data_min.temperatures)
+        # the occupation factor differs for each initial k-point
         emission = energy_diff <= 0
-        rates = [
-            s.factor(unit_q, qpoint_norm_sq, emission, e_fd)
-            for s in inelastic_scatterers
-        ]
-        mrta_factor = 1
+        factors = []
+        for energy, start, nq in zip(energies[has_qpoints], starts, nqpoints):
+            e_fd = _get_fd(energy, fermi_levels, temperatures)
+            q_slice = slice(start, start + nq)
+            factors.append(
+                [
+                    s.factor(unit_q[q_slice], qpoint_norm_sq[q_slice], emission, e_fd)
+                    for s in scatterers
+                ]
+            )
+        factors = np.concatenate(factors, axis=-1)
     else:
-        mrta_factor = mrta_calculator.get_mrta_factor(
-            spin, b_idx, k, tet_mask[0][mapping], k_primes
+        velocities = velocities[has_qpoints]
+        factors = np.array(
+            [
+                s.factor(
+                    unit_q,
+                    qpoint_norm_sq,
+                    spin,
+                    b_idx,
+                    kpoints[segments],
+                    velocities[segments],
+                )
+                for s in scatterers
+            ]
         )
-        rates = [
-            s.factor(unit_q, qpoint_norm_sq, spin, b_idx, k, velocity)
-            for s in elastic_scatterers
-        ]
 
-    rates = np.array(rates)
-    rates /= amset_data_min.structure.lattice.reciprocal_lattice.volume
-    rates *= tet_overlap[mapping] * weights * mrta_factor
-
-    # this is too expensive vs tetrahedron integration and doesn't add much more
-    # accuracy; could offer this as an option
-    # overlap = self.amset_data.overlap_calculator.get_overlap(
-    #     spin, b_idx, k, tet_mask[0][mapping], k_primes
-    # )
-    # rates *= overlap * weights * mrta_factor
+    factors *= weights
 
     # sometimes the projected intersections can be nan when the density of states
     # contribution is infinitesimally small; this catches those errors
-    rates[np.isnan(rates)] = 0
+    factors[np.isnan(factors)] = 0
+
+    rates[..., has_qpoints] = np.add.reduceat(factors, starts, axis=-1)
+    return rates
 
-    return np.sum(rates, axis=-1)
+
+def _split_by_cost(costs, target_cost):
+    # split the jobs into contiguous chunks with roughly equal cost; jobs that are more
+    # expensive than the target cost are given their own chunk
+    chunk_idxs = ((np.cumsum(costs) - costs) // max(target_cost, 1)).astype(int)
+    starts = np.where(np.diff(chunk_idxs, prepend=-1) != 0)[0]
+    ends = np.append(starts[1:], len(costs))
+    return [slice(start, end) for start, end in zip(starts, ends)]
 
 
 @numba.njit
@@ -812,10 +2182,17 @@ def _get_overlap_ncl(
 
 
 def _interpolate_zero_rates(
-    rates, kpoints, masks: Optional = None, progress_bar: bool = defaults["print_log"]
+    rates,
+    kpoints,
+    masks: Optional = None,
+    progress_bar: bool = defaults["print_log"],
+    ir_kpoints_idx: Optional[np.ndarray] = None,
+    ir_to_full_idx: Optional[np.ndarray] = None,
 ):
-    # loop over all scattering types, doping, temps, and bands and interpolate
-    # zero scattering rates based on the nearest k-point
+    # loop over all scattering types and bands and set zero scattering rates to the
+    # rate at the nearest k-point. If ir_kpoints_idx and ir_to_full_idx are given, the
+    # rates and masks are only given for the irreducible k-points, but the nearest
+    # k-point is still found in the full BZ
     logger.info("Interpolating missing scattering rates")
     n_rates = sum([np.prod(rates[spin].shape[:-1]) for spin in rates])
     if progress_bar:
@@ -823,6 +2200,14 @@ def _interpolate_zero_rates(
     else:
         pbar = None
 
+    if ir_kpoints_idx is None:
+        ir_kpoints_idx = np.arange(len(kpoints))
+        ir_to_full_idx = np.arange(len(kpoints))
+
+    # k-points in the range [0, 1) so that periodic images can be accounted for
+    kpoints = np.mod(kpoints, 1)
+    kpoints[kpoints >= 1] = 0
+
     t0 = time.perf_counter()
     k_idx = np.arange(len(kpoints))
     for spin in rates:
@@ -830,38 +2215,37 @@ def _interpolate_zero_rates(
             # if a rate at a k-point for any doping, or temperature is zero then
             # flag it for interpolation
             all_non_zero_rates = (rates[spin][s] > 1e6).all(axis=(0, 1))
-            for d, t, b in np.ndindex(rates[spin].shape[1:-1]):
+            for b in range(rates[spin].shape[-2]):
                 if masks is not None:
-                    mask = np.invert(masks[spin][s, d, t, b])
+                    ir_mask = np.invert(masks[spin][b])
                 else:
-                    mask = [True] * len(rates[spin][s, d, t, b])
-
-                non_zero_rates = all_non_zero_rates[b][mask]
-                zero_rate_idx = k_idx[mask][~non_zero_rates]
-                non_zero_rate_idx = k_idx[mask][non_zero_rates]
+                    ir_mask = np.full(rates[spin].shape[-1], True)
 
+                non_zero_rates = all_non_zero_rates[b][ir_mask]
                 if not np.any(non_zero_rates):
                     # all scattering rates are zero so cannot interpolate
                     # generally this means the scattering prefactor is zero. E.g.
                     # for POP when studying non polar materials
-                    rates[spin][s, d, t, b, mask] += small_val
-
-                elif np.sum(non_zero_rates) != np.sum(mask):
-                    # seems to work best when all the kpoints are +ve therefore add 0.5
-                    # Todo: Use cartesian coordinates?
-                    # interpolate log rates to avoid the bias towards large rates
-                    rates[spin][s, d, t, b, zero_rate_idx] = np.exp(
-                        griddata(
-                            points=kpoints[non_zero_rate_idx] + 0.5,
-                            values=np.log(rates[spin][s, d, t, b, non_zero_rate_idx]),
-                            xi=kpoints[zero_rate_idx] + 0.5,
-                            method="nearest",
-                        )
-                    )
-                    # rates[spin][s, d, t, b, zero_rate_idx] = 10 ** (15 + s)
+                    rates[spin][s, ..., b, ir_mask] += small_val
+
+                elif np.sum(non_zero_rates) != np.sum(ir_mask):
+                    # the nearest k-point can be any k-point in the full BZ
+                    mask = ir_mask[ir_to_full_idx]
+                    full_non_zero_rates = all_non_zero_rates[b][ir_to_full_idx]
+                    non_zero_rate_idx = k_idx[mask & full_non_zero_rates]
+                    ir_zero_rate_idx = np.where(ir_mask & ~all_non_zero_rates[b])[0]
+
+                    # the zero rate k-points are the same for all dopings and
+                    # temperatures so only one nearest neighbour search is needed
+                    tree = cKDTree(kpoints[non_zero_rate_idx], boxsize=1)
+                    _, nearest = tree.query(kpoints[ir_kpoints_idx[ir_zero_rate_idx]])
+                    ir_nearest_idx = ir_to_full_idx[non_zero_rate_idx[nearest]]
+                    rates[spin][s, ..., b, ir_zero_rate_idx] = rates[spin][
+                        s, ..., b, ir_nearest_idx
+                    ]
 
                 if pbar is not None:
-                    pbar.update()
+                    pbar.update(np.prod(rates[spin].shape[1:3]))
 
     if pbar is not None:
         pbar.close()
@@ -950,6 +2334,250 @@ def get_fine_mesh_qpoints(
     return get_kpoints_in_original_basis(qpoints, basis[mapping]), qweights, mapping
 
 
+def get_cross_section_qpoints(
+    tetrahedra_kpoints,
+    tet_contributions,
+    cross_section_weights,
+    high_tol=0.1,
+    med_tol=0.2,
+):
+    """
+    Get the integration q-points on the cross sections of intersecting tetrahedra.
+
+    This is a compiled equivalent of calling ``get_cross_section_values`` (with
+    ``average=False``), ``get_projected_intersections`` and
+    ``get_fine_mesh_qpoints`` in turn.
+
+    Args:
+        tetrahedra_kpoints: The cartesian coordinates of the tetrahedra vertices, with
+            the shape (ntetrahedra, 4, 3).
+        tet_contributions: The tetrahedra contributions, as returned by
+            ``TetrahedralBandStructure.get_tetrahedra_density_of_states``.
+        cross_section_weights: The cross section weight for each tetrahedron.
+        high_tol: Cross sections closer than this use the high precision scheme.
+        med_tol: Cross sections closer than this use the medium precision scheme.
+
+    Returns:
+        The q-points in cartesian coordinates, their weights, and the index of the
+        tetrahedron each q-point belongs to.
+    """
+    return _get_cross_section_qpoints(
+        np.ascontiguousarray(tetrahedra_kpoints, dtype=np.float64),
+        *tet_contributions,
+        np.ascontiguousarray(cross_section_weights, dtype=np.float64),
+        high_tol,
+        med_tol,
+        _triangle_points,
+        _triangle_weights,
+        _quad_points,
+        _quad_weights,
+    )
+
+
+_precisions = ("high", "medium", "low")
+_triangle_points = tuple(
+    np.ascontiguousarray(ni[p]["triangle"]["points"]) for p in _precisions
+)
+_triangle_weights = tuple(
+    np.ascontiguousarray(ni[p]["triangle"]["weights"]) for p in _precisions
+)
+_quad_points = tuple(np.ascontiguousarray(ni[p]["quad"]["points"]) for p in _precisions)
+_quad_weights = tuple(
+    np.ascontiguousarray(ni[p]["quad"]["weights"]) for p in _precisions
+)
+
+
+@numba.njit
+def _get_cross_section_qpoints(
+    tetrahedra_kpoints,
+    cond_a_mask,
+    cond_b_mask,
+    cond_c_mask,
+    frac_21,
+    frac_31,
+    frac_41,
+    frac_32,
+    frac_42,
+    frac_c_41,
+    frac_c_42,
+    frac_c_43,
+    cross_section_weights,
+    high_tol,
+    med_tol,
+    triangle_points,
+    triangle_weights,
+    quad_points,
+    quad_weights,
+):
+    ntet = len(tetrahedra_kpoints)
+
+    # intersections of the cross section with the tetrahedron edges; see
+    # get_cross_section_values for the ordering of the intersections
+    intersections = np.zeros((ntet, 4, 3))
+    for i in range(ntet):
+        v = tetrahedra_kpoints[i]
+        for d in range(3):
+            if cond_a_mask[i]:
+                intersections[i, 0, d] = (v[1, d] - v[0, d]) * frac_21[i] + v[0, d]
+                intersections[i, 1, d] = (v[2, d] - v[0, d]) * frac_31[i] + v[0, d]
+                intersections[i, 2, d] = (v[3, d] - v[0, d]) * frac_41[i] + v[0, d]
+            elif cond_b_mask[i]:
+                intersections[i, 0, d] = (v[2, d] - v[0, d]) * frac_31[i] + v[0, d]
+                intersections[i, 1, d] = (v[2, d] - v[1, d]) * frac_32[i] + v[1, d]
+                intersections[i, 2, d] = (v[3, d] - v[0, d]) * frac_41[i] + v[0, d]
+                intersections[i, 3, d] = (v[3, d] - v[1, d]) * frac_42[i] + v[1, d]
+            elif cond_c_mask[i]:
+                intersections[i, 0, d] = v[3, d] - (v[3, d] - v[0, d]) * frac_c_41[i]
+                intersections[i, 1, d] = v[3, d] - (v[3, d] - v[1, d]) * frac_c_42[i]
+                intersections[i, 2, d] = v[3, d] - (v[3, d] - v[2, d]) * frac_c_43[i]
+
+    # project the intersections onto the plane of the cross section; the columns of
+    # basis are the new basis vectors, the last of which is normal to the plane
+    basis = np.zeros((ntet, 3, 3))
+    projected = np.zeros((ntet, 4, 3))
+
+    # the precision used for each cross section; -1 indicates no q-points
+    precision = np.full(ntet, -1)
+    axis_a = np.zeros(3)
+    axis_c = np.zeros(3)
+    other_side = np.zeros(3)
+    for i in range(ntet):
+        axis_a[:] = intersections[i, 1] - intersections[i, 0]
+        axis_a /= np.sqrt(np.sum(axis_a**2))
+        other_side[:] = intersections[i, 2] - intersections[i, 0]
+        _cross(axis_a, other_side, axis_c)
+        axis_c /= np.sqrt(np.sum(axis_c**2))
+        basis[i, :, 0] = axis_a
+        _cross(axis_a, axis_c, basis[i, :, 1])
+        basis[i, :, 2] = axis_c
+
+        # the basis is orthonormal so its inverse is its transpose
+        for vert in range(4):
+            for k in range(3):
+                projected[i, vert, k] = (
+                    basis[i, 0, k] * intersections[i, vert, 0]
+                    + basis[i, 1, k] * intersections[i, vert, 1]
+                    + basis[i, 2, k] * intersections[i, vert, 2]
+                )
+
+        if cond_b_mask[i]:
+            nvertices = 4
+        elif cond_a_mask[i] or cond_c_mask[i]:
+            # triangle intersections always have [0, 0, 0] as the last coordinate
+            nvertices = 3
+        else:
+            continue
+
+        min_norm = np.inf
+        for vert in range(nvertices):
+            norm = np.sqrt(np.sum(projected[i, vert] ** 2))
+            if np.isnan(norm) or norm < min_norm:
+                min_norm = norm
+                if np.isnan(norm):
+                    break
+
+        if min_norm < high_tol:
+            precision[i] = 0
+        elif min_norm < med_tol:
+            precision[i] = 1
+        elif min_norm < np.inf:
+            precision[i] = 2
+
+    # q-points are ordered by shape (triangle then quadrilateral), then by precision
+    # (high to low), then by tetrahedron index
+    nqpoints = 0
+    for i in range(ntet):
+        if precision[i] == -1:
+            continue
+        elif cond_b_mask[i]:
+            nqpoints += len(quad_weights[precision[i]])
+        else:
+            nqpoints += len(triangle_weights[precision[i]])
+
+    qpoints = np.zeros((nqpoints, 3))
+    qweights = np.zeros(nqpoints)
+    mapping = np.zeros(nqpoints, dtype=np.int64)
+
+    n = 0
+    for is_quad in (False, True):
+        for prec in range(3):
+            for i in range(ntet):
+                if precision[i] != prec or cond_b_mask[i] != is_quad:
+                    continue
+
+                c = projected[i]
+                b = basis[i]
+                z = c[0, 2]
+                if is_quad:
+                    points = quad_points[prec]
+                    weights = quad_weights[prec]
+                else:
+                    points = triangle_points[prec]
+                    weights = triangle_weights[prec]
+
+                    # triangle area; equivalent to the Cayley–Menger determinant used
+                    # in get_triangle_vol but much cheaper
+                    vol = 0.5 * abs(
+                        (c[1, 0] - c[0, 0]) * (c[2, 1] - c[0, 1])
+                        - (c[2, 0] - c[0, 0]) * (c[1, 1] - c[0, 1])
+                    )
+
+                for p in range(len(weights)):
+                    if is_quad:
+                        # bilinear map from the reference square; the vertices are
+                        # ordered as (0, 0), (0, 1), (1, 0), (1, 1)
+                        a0 = 0.5 * (1.0 - points[0, p])
+                        a1 = 0.5 * (1.0 + points[0, p])
+                        b0 = 0.5 * (1.0 - points[1, p])
+                        b1 = 0.5 * (1.0 + points[1, p])
+                        x = a0 * b0 * c[0, 0] + a0 * b1 * c[1, 0]
+                        x += a1 * b0 * c[2, 0] + a1 * b1 * c[3, 0]
+                        y = a0 * b0 * c[0, 1] + a0 * b1 * c[1, 1]
+                        y += a1 * b0 * c[2, 1] + a1 * b1 * c[3, 1]
+
+                        # determinant of the Jacobian of the bilinear map
+                        dx_da = 0.5 * (
+                            b0 * (c[2, 0] - c[0, 0]) + b1 * (c[3, 0] - c[1, 0])
+                        )
+                        dy_da = 0.5 * (
+                            b0 * (c[2, 1] - c[0, 1]) + b1 * (c[3, 1] - c[1, 1])
+                        )
+                        dx_db = 0.5 * (
+                            a0 * (c[1, 0] - c[0, 0]) + a1 * (c[3, 0] - c[2, 0])
+                        )
+                        dy_db = 0.5 * (
+                            a0 * (c[1, 1] - c[0, 1]) + a1 * (c[3, 1] - c[2, 1])
+                        )
+                        vol = abs(dx_da * dy_db - dy_da * dx_db) * 4
+                    else:
+                        x = (
+                            c[0, 0] * points[0, p]
+                            + c[1, 0] * points[1, p]
+                            + c[2, 0] * points[2, p]
+                        )
+                        y = (
+                            c[0, 1] * points[0, p]
+                            + c[1, 1] * points[1, p]
+                            + c[2, 1] * points[2, p]
+                        )
+
+                    # transform q back to the original basis in cartesian coords
+                    for k in range(3):
+                        qpoints[n, k] = b[k, 0] * x + b[k, 1] * y + b[k, 2] * z
+                    qweights[n] = weights[p] * vol * cross_section_weights[i]
+                    mapping[n] = i
+                    n += 1
+
+    return qpoints, qweights, mapping
+
+
+@numba.njit
+def _cross(a, b, out):
+    out[0] = a[1] * b[2] - a[2] * b[1]
+    out[1] = a[2] * b[0] - a[0] * b[2]
+    out[2] = a[0] * b[1] - a[1] * b[0]
+
+
 def get_kpoints_in_original_basis(q, basis):
     # transform k back to original lattice basis in cartesian coords
     return np.einsum("ikj,ij->ik", basis, q)
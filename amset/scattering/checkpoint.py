@@ -0,0 +1,331 @@
+"""
+This module implements checkpointing of scattering rates, so that calculations can be
+restarted, and caching of the scattering integrand, so that rates can be recalculated
+for new doping levels and temperatures.
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Dict, List, Tuple, Union
+
+import numpy as np
+from pymatgen.electronic_structure.core import Spin
+
+__author__ = "Alex Ganose"
+__maintainer__ = "Alex Ganose"
+__email__ = "aganose@lbl.gov"
+
+logger = logging.getLogger(__name__)
+
+
+class ScatteringCheckpoint:
+    """
+    Store the scattering rates of finished bands and k-points in an HDF5 file.
+
+    The file is labelled with a key that identifies the calculation inputs. If an
+    existing file has a different key, it is replaced by an empty checkpoint.
+
+    The rates of each spin are stored with the shape (nscatterers, ndoping,
+    ntemperatures, nbands, n_ir_kpoints). The rates of completed bands include the
+    scattering prefactors, whereas the rates of unfinished bands do not. For each
+    scattering type, a mask of the irreducible k-points that have been calculated is
+    also stored.
+
+    Args:
+        filename: Path to the checkpoint file.
+        key: The key identifying the calculation inputs, e.g., from
+            :func:`get_inputs_hash`.
+        rates_shapes: The shape of the rates for each spin.
+        scatterer_slices: The position of the rates for each scattering type (e.g.,
+            "elastic" and "inelastic") in the first axis of the rates array.
+    """
+
+    def __init__(
+        self,
+        filename: Union[str, Path],
+        key: str,
+        rates_shapes: Dict[Spin, Tuple[int, ...]],
+        scatterer_slices: Dict[str, slice],
+    ):
+        import h5py
+
+        self.filename = Path(filename)
+        self.key = key
+        self.scatterer_slices = scatterer_slices
+
+        if self.filename.exists():
+            with h5py.File(self.filename, "r") as f:
+                if f.attrs.get("key") == key:
+                    ncomplete = sum(
+                        f[f"complete_{s.name}"][()].sum() for s in rates_shapes
+                    )
+                    logger.info(
+                        f"Restarting from checkpoint: {self.filename} ({ncomplete} "
+                        "bands completed)"
+                    )
+                    return
+            logger.info(
+                f"Inputs of checkpoint {self.filename} have changed, starting a new "
+                "checkpoint"
+            )
+
+        with h5py.File(self.filename, "w") as f:
+            f.attrs["key"] = key
+            for spin, shape in rates_shapes.items():
+                nbands, nkpoints = shape[-2:]
+                f.create_dataset(f"rates_{spin.name}", shape=shape, dtype=np.float64)
+                f.create_dataset(f"complete_{spin.name}", data=np.full(nbands, False))
+                for scattering_type in scatterer_slices:
+                    f.create_dataset(
+                        f"done_{scattering_type}_{spin.name}",
+                        data=np.full((nbands, nkpoints), False),
+                    )
+
+    def load_band(
+        self, spin: Spin, b_idx: int, rates: np.ndarray
+    ) -> Tuple[bool, Dict[str, np.ndarray]]:
+        """
+        Load the rates for a band.
+
+        Args:
+            spin: The spin.
+            b_idx: The band index.
+            rates: The rates array for the spin, with the shape (nscatterers,
+                ndoping, ntemperatures, nbands, n_ir_kpoints). For completed bands,
+                all rates are overwritten, otherwise only the rates of the calculated
+                k-points are set.
+
+        Returns:
+            Whether the band is complete, and a mask of the calculated irreducible
+            k-points for each scattering type.
+        """
+        import h5py
+
+        with h5py.File(self.filename, "r") as f:
+            complete = bool(f[f"complete_{spin.name}"][b_idx])
+            done = {t: f[f"done_{t}_{spin.name}"][b_idx] for t in self.scatterer_slices}
+            if complete or any(mask.any() for mask in done.values()):
+                band_rates = f[f"rates_{spin.name}"][..., b_idx, :]
+
+        if complete:
+            rates[..., b_idx, :] = band_rates
+        else:
+            for scattering_type, scatterer_slice in self.scatterer_slices.items():
+                mask = done[scattering_type]
+                if mask.any():
+                    rates[scatterer_slice, ..., b_idx, mask] = band_rates[
+                        scatterer_slice, ..., mask
+                    ]
+        return complete, done
+
+    def save_band(
+        self,
+        spin: Spin,
+        b_idx: int,
+        rates: np.ndarray,
+        done: Dict[str, np.ndarray],
+        complete: bool = False,
+    ):
+        """
+        Save the rates for a band.
+
+        Args:
+            spin: The spin.
+            b_idx: The band index.
+            rates: The rates array for the spin, with the shape (nscatterers,
+                ndoping, ntemperatures, nbands, n_ir_kpoints).
+            done: A mask of the calculated irreducible k-points for each scattering
+                type.
+            complete: Whether the band is complete, i.e., the scattering prefactors
+                have been applied.
+        """
+        import h5py
+
+        # the file is only open while writing, so that it is left in a consistent
+        # state if the calculation is killed
+        with h5py.File(self.filename, "a") as f:
+            f[f"rates_{spin.name}"][..., b_idx, :] = rates[..., b_idx, :]
+            for scattering_type, mask in done.items():
+                f[f"done_{scattering_type}_{spin.name}"][b_idx] = mask
+            f[f"complete_{spin.name}"][b_idx] = complete
+
+
+class ScatteringIntegrandCache:
+    """
+    Store the scattering integrand of each k-point in an HDF5 file.
+
+    The integrand consists of the q-points used to integrate the rates of a k-point
+    and their integration weights, which include the overlap and MRTA factors. As
+    the integrand doesn't depend on the doping or temperature, rates for new doping
+    levels and temperatures can be obtained by only evaluating the scattering
+    factors and prefactors.
+
+    The integrand is stored separately for each spin, band and scattering type. For
+    inelastic scattering, the integrand is stored for both the absorption and
+    emission energies.
+
+    Args:
+        filename: Path to the cache file.
+        key: The key identifying the inputs that affect the integrand, e.g., from
+            :func:`get_inputs_hash`. If an existing file has a different key, it is
+            replaced by an empty cache.
+    """
+
+    def __init__(self, filename: Union[str, Path], key: str):
+        import h5py
+
+        self.filename = Path(filename)
+        self.key = key
+
+        if self.filename.exists():
+            with h5py.File(self.filename, "r") as f:
+                if f.attrs.get("key") == key:
+                    logger.info(f"Using scattering integrand cache: {self.filename}")
+                    return
+            logger.info(
+                f"Inputs of integrand cache {self.filename} have changed, starting a "
+                "new cache"
+            )
+
+        with h5py.File(self.filename, "w") as f:
+            f.attrs["key"] = key
+
+    def load_kpoints(
+        self, spin: Spin, b_idx: int, scattering_type: str, ir_idxs: np.ndarray
+    ) -> Tuple[np.ndarray, List[Tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """
+        Load the integrand for several k-points.
+
+        Args:
+            spin: The spin.
+            b_idx: The band index.
+            scattering_type: The scattering type, i.e., "elastic" or "inelastic".
+            ir_idxs: The irreducible k-point indices.
+
+        Returns:
+            A mask of the k-points found in the cache, and the integrand of these
+            k-points for each energy difference, as a tuple of the q-points, their
+            weights, and the number of q-points of each k-point.
+        """
+        import h5py
+
+        ir_idxs = np.asarray(ir_idxs)
+        group_name = f"{spin.name}/{b_idx}/{scattering_type}"
+        with h5py.File(self.filename, "r") as f:
+            if group_name not in f:
+                return np.full(len(ir_idxs), False), []
+
+            group = f[group_name]
+            cached_ir_idxs = group["ir_idxs"][()]
+            nqpoints = group["nqpoints"][()]
+            found = np.isin(ir_idxs, cached_ir_idxs)
+            if not found.any():
+                return found, []
+
+            # position of the requested k-points in the cache
+            order = np.argsort(cached_ir_idxs)
+            positions = order[np.searchsorted(cached_ir_idxs[order], ir_idxs[found])]
+
+            integrands = []
+            for i in range(nqpoints.shape[1]):
+                starts = np.cumsum(nqpoints[:, i]) - nqpoints[:, i]
+                counts = nqpoints[positions, i]
+                idxs = _get_segment_indices(starts[positions], counts)
+                integrands.append(
+                    (group[f"qpoints_{i}"][()][idxs], group[f"weights_{i}"][()][idxs])
+                    + (counts,)
+                )
+        return found, integrands
+
+    def save_kpoints(
+        self,
+        spin: Spin,
+        b_idx: int,
+        scattering_type: str,
+        ir_idxs: np.ndarray,
+        integrands: List[Tuple[np.ndarray, np.ndarray, np.ndarray]],
+    ):
+        """
+        Add the integrand of several k-points to the cache.
+
+        Args:
+            spin: The spin.
+            b_idx: The band index.
+            scattering_type: The scattering type, i.e., "elastic" or "inelastic".
+            ir_idxs: The irreducible k-point indices.
+            integrands: The integrand for each energy difference, as a tuple of the
+                q-points, their weights, and the number of q-points of each k-point.
+        """
+        import h5py
+
+        new_data = {
+            "ir_idxs": np.asarray(ir_idxs),
+            "nqpoints": np.stack([n for _, _, n in integrands], axis=1),
+        }
+        for i, (qpoints, weights, _) in enumerate(integrands):
+            new_data[f"qpoints_{i}"] = qpoints
+            new_data[f"weights_{i}"] = weights
+
+        group_name = f"{spin.name}/{b_idx}/{scattering_type}"
+        with h5py.File(self.filename, "a") as f:
+            group = f.require_group(group_name)
+            for name, data in new_data.items():
+                if name not in group:
+                    group.create_dataset(
+                        name,
+                        data=data,
+                        maxshape=(None,) + data.shape[1:],
+                        chunks=True,
+                    )
+                else:
+                    dataset = group[name]
+                    n = len(dataset)
+                    dataset.resize(n + len(data), axis=0)
+                    dataset[n:] = data
+
+
+def _get_segment_indices(starts, counts):
+    # indices of the elements in several segments of an array, given the start and
+    # length of each segment
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+
+def get_inputs_hash(*inputs) -> str:
+    """
+    Get a hash that identifies a set of inputs.
+
+    Args:
+        *inputs: The inputs. Can include numpy arrays, numbers, strings, paths (for
+            which the file contents are used) and nested lists, tuples and
+            dictionaries of these.
+
+    Returns:
+        The sha256 hash of the inputs, as a hex string.
+    """
+    sha = hashlib.sha256()
+    _update_hash(sha, inputs)
+    return sha.hexdigest()
+
+
+def _update_hash(sha, obj):
+    if isinstance(obj, np.ndarray):
+        sha.update(f"array{obj.dtype.str}{obj.shape}".encode())
+        sha.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        sha.update(f"dict{len(obj)}".encode())
+        for key in sorted(obj, key=str):
+            _update_hash(sha, str(key))
+            _update_hash(sha, obj[key])
+    elif isinstance(obj, Path):
+        # the contents of files are used rather than their paths
+        with open(obj, "rb") as f:
+            for block in iter(lambda: f.read(2**20), b""):
+                sha.update(block)
+    elif isinstance(obj, (list, tuple)):
+        sha.update(f"list{len(obj)}".encode())
+        for item in obj:
+            _update_hash(sha, item)
+    else:
+        sha.update(repr(obj).encode())
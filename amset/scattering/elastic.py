@@ -62,6 +62,8 @@ class AbstractElasticScattering(ABC):
         kpoint: np.ndarray,
         velocity: np.ndarray,
     ):
+        # kpoint and velocity are either those of a single initial state, with the
+        # shape (3, ), or of the initial state of each q-point, with shape (nq, 3)
         pass
 
     def to_reference(self):
@@ -177,31 +179,48 @@ class AcousticDeformationPotentialScattering(AbstractElasticScattering):
         kpoint: np.ndarray,
         velocity: np.ndarray,
     ):
-        christoffel_tensors = get_christoffel_tensors(self.elastic_constant, unit_q)
-        (
-            (c_trans_a, c_trans_b, c_long),
-            (v_trans_a, v_trans_b, v_long),
-        ) = solve_christoffel_equation(christoffel_tensors)
         if isinstance(self.deformation_potential, DeformationPotentialInterpolator):
-            deform = self.deformation_potential.interpolate(spin, [band_idx], [kpoint])
-            deform = np.abs(deform[0])
-            deform += np.outer(velocity, velocity)  # velocity correction
-            strain_long, strain_trans_a, strain_trans_b = prepare_acoustic_strains(
-                unit_q, v_long, v_trans_a, v_trans_b
-            )
-            factor = (
-                np.tensordot(strain_long, deform) ** 2 / c_long
-                + np.tensordot(strain_trans_a, deform) ** 2 / c_trans_a
-                + np.tensordot(strain_trans_b, deform) ** 2 / c_trans_b
-            )
-        elif self.is_metal:
-            factor = self.deformation_potential**2 / c_long
+            # the sum over the acoustic modes of (q ⊗ v : D)² / c is equal to
+            # dᵀ Γ⁻¹ d, where d = D ᵀ q and Γ is the Christoffel tensor
+            deform = self._get_deformation_potential(spin, band_idx, kpoint, velocity)
+            deform_q = np.einsum("ni,nij->nj", unit_q, deform)
+            factor = get_acoustic_mode_sum(self.elastic_constant, unit_q, deform_q)
         else:
-            def_idx = 1 if band_idx > self.vb_idx[spin] else 0
-            factor = self.deformation_potential[def_idx] ** 2 / c_long
+            # only the longitudinal mode is needed so skip the polarization vectors
+            c_long = get_longitudinal_elastic_constants(self.elastic_constant, unit_q)
+            if self.is_metal:
+                factor = self.deformation_potential**2 / c_long
+            else:
+                def_idx = 1 if band_idx > self.vb_idx[spin] else 0
+                factor = self.deformation_potential[def_idx] ** 2 / c_long
 
         return factor[None, None] * np.ones(self.fermi_levels.shape + norm_q_sq.shape)
 
+    def _get_deformation_potential(self, spin, band_idx, kpoint, velocity):
+        # kpoint and velocity can either be given for a single initial state or for
+        # each q-point, in which case the interpolation is only performed once for
+        # each run of identical k-points
+        kpoint = np.asarray(kpoint)
+        velocity = np.asarray(velocity)
+        if kpoint.ndim == 1:
+            kpoints = kpoint[None]
+            velocities = velocity[None]
+            inverse = [0]
+        else:
+            new_kpoint = np.ones(len(kpoint), dtype=bool)
+            new_kpoint[1:] = np.any(kpoint[1:] != kpoint[:-1], axis=1)
+            kpoints = kpoint[new_kpoint]
+            velocities = velocity[new_kpoint]
+            inverse = np.cumsum(new_kpoint) - 1
+
+        deform = self.deformation_potential.interpolate(
+            spin, [band_idx] * len(kpoints), kpoints
+        )
+        deform = np.abs(deform)
+        # velocity correction
+        deform += velocities[:, :, None] * velocities[:, None, :]
+        return deform[inverse]
+
     def to_reference(self):
         base_reference = super().to_reference()
         if isinstance(self.deformation_potential, DeformationPotentialInterpolator):
@@ -264,7 +283,108 @@ def prepare_acoustic_strains(unit_q, v_long, v_trans_a, v_trans_b):
 
 
 def get_christoffel_tensors(elastic_constant, unit_q):
-    return np.einsum("ijkl,ni,nl->njk", elastic_constant, unit_q, unit_q)
+    # equivalent to einsum("ijkl,ni,nl->njk") but written as a single matrix product,
+    # which is much faster for large numbers of q-points
+    q_outer = (unit_q[:, :, None] * unit_q[:, None, :]).reshape(-1, 9)
+    elastic_matrix = elastic_constant.transpose(0, 3, 1, 2).reshape(9, 9)
+    return np.dot(q_outer, elastic_matrix).reshape(-1, 3, 3)
+
+
+def get_acoustic_mode_sum(elastic_constant, unit_q, vectors):
+    """
+    Sum the coupling to the three acoustic modes for each q-point.
+
+    Calculates Σₘ (vₘ · x)² / cₘ, where cₘ and vₘ are the elastic constant and
+    polarization of acoustic mode m, obtained from the Christoffel equation, and x
+    is the vector of each q-point. This is equivalent to xᵀ Γ⁻¹ x, where Γ is the
+    Christoffel tensor, so the Christoffel equation doesn't need to be solved.
+
+    Args:
+        elastic_constant: The elastic constant with the shape (3, 3, 3, 3).
+        unit_q: The unit q-vectors with the shape (nq, 3).
+        vectors: The vector of each q-point with the shape (nq, 3).
+
+    Returns:
+        The sum for each q-point with the shape (nq, ).
+    """
+    inverse_tensors = _get_christoffel_data(elastic_constant, unit_q, "inverse")
+    return np.einsum("nj,njk,nk->n", vectors, inverse_tensors, vectors)
+
+
+def get_longitudinal_elastic_constants(elastic_constant, unit_q):
+    """
+    Get the elastic constant of the longitudinal acoustic mode for each q-point.
+
+    This is the largest eigenvalue of the Christoffel tensor, calculated using the
+    closed-form solution for symmetric 3×3 matrices.
+
+    Args:
+        elastic_constant: The elastic constant with the shape (3, 3, 3, 3).
+        unit_q: The unit q-vectors with the shape (nq, 3).
+
+    Returns:
+        The longitudinal elastic constants with the shape (nq, ).
+    """
+    return _get_christoffel_data(elastic_constant, unit_q, "c_long")
+
+
+# the acoustic scattering mechanisms are evaluated for the same q-points, so the
+# Christoffel data for the most recent q-points is kept and shared between them
+_christoffel_cache = {}
+
+
+def _get_christoffel_data(elastic_constant, unit_q, name):
+    cache = _christoffel_cache
+    if cache.get("unit_q") is not unit_q or not np.array_equal(
+        cache["elastic_constant"], elastic_constant
+    ):
+        # holding a reference to unit_q ensures its id can't be reused
+        cache.clear()
+        cache["unit_q"] = unit_q
+        cache["elastic_constant"] = elastic_constant
+        cache["tensors"] = get_christoffel_tensors(elastic_constant, unit_q)
+
+    if name not in cache:
+        if name == "inverse":
+            cache[name] = _invert_symmetric_tensors(cache["tensors"])
+        else:
+            cache[name] = _get_largest_eigenvalues(cache["tensors"])
+    return cache[name]
+
+
+def _invert_symmetric_tensors(tensors):
+    # invert a stack of symmetric 3×3 matrices using the adjugate
+    a, b, c = tensors[:, 0, 0], tensors[:, 1, 1], tensors[:, 2, 2]
+    d, e, f = tensors[:, 1, 2], tensors[:, 0, 2], tensors[:, 0, 1]
+    adjugate = np.empty_like(tensors)
+    adjugate[:, 0, 0] = b * c - d * d
+    adjugate[:, 1, 1] = a * c - e * e
+    adjugate[:, 2, 2] = a * b - f * f
+    adjugate[:, 0, 1] = adjugate[:, 1, 0] = d * e - f * c
+    adjugate[:, 0, 2] = adjugate[:, 2, 0] = f * d - b * e
+    adjugate[:, 1, 2] = adjugate[:, 2, 1] = e * f - a * d
+    determinant = a * adjugate[:, 0, 0] + f * adjugate[:, 0, 1] + e * adjugate[:, 0, 2]
+    return adjugate / determinant[:, None, None]
+
+
+def _get_largest_eigenvalues(tensors):
+    # trigonometric solution for the eigenvalues of a stack of symmetric 3×3 matrices
+    mean = np.trace(tensors, axis1=1, axis2=2) / 3
+    shifted = tensors - mean[:, None, None] * np.eye(3)
+    scale = np.sqrt(np.sum(shifted**2, axis=(1, 2)) / 6)
+
+    # matrices that are a multiple of the identity have three equal eigenvalues
+    isotropic = scale == 0
+    scale[isotropic] = 1
+    a, b, c = (shifted[:, i, i] / scale for i in range(3))
+    d, e, f = (
+        shifted[:, 1, 2] / scale,
+        shifted[:, 0, 2] / scale,
+        shifted[:, 0, 1] / scale,
+    )
+    half_det = (a * (b * c - d * d) - f * (f * c - d * e) + e * (f * d - b * e)) / 2
+    angle = np.arccos(np.clip(half_det, -1, 1)) / 3
+    return mean + 2 * scale * np.cos(angle) * ~isotropic
 
 
 def solve_christoffel_equation(christoffel_tensors):
@@ -437,23 +557,11 @@ class PiezoelectricScattering(AbstractElasticScattering):
         kpoint: np.ndarray,
         velocity: np.ndarray,
     ):
-        christoffel_tensors = get_christoffel_tensors(self.elastic_constant, unit_q)
-        (
-            (c_trans_a, c_trans_b, c_long),
-            (v_trans_a, v_trans_b, v_long),
-        ) = solve_christoffel_equation(christoffel_tensors)
-
-        strain_long, strain_trans_a, strain_trans_b = prepare_acoustic_strains(
-            unit_q, v_long, v_trans_a, v_trans_b
-        )
+        # the sum over the acoustic modes of (q ⊗ v : qh)² / c is equal to wᵀ Γ⁻¹ w,
+        # where w = qhᵀ q and Γ is the Christoffel tensor
         qh = np.einsum("ijk,nj->nik", self.piezoelectric_constant, unit_q)
-
-        # einsum is double dot product along first axis
-        factor = (
-            np.einsum("nij,nij->n", strain_long, qh) ** 2 / c_long
-            + np.einsum("nij,nij->n", strain_trans_a, qh) ** 2 / c_trans_a
-            + np.einsum("nij,nij->n", strain_trans_b, qh) ** 2 / c_trans_b
-        )
+        qh_q = np.einsum("ni,nik->nk", unit_q, qh)
+        factor = get_acoustic_mode_sum(self.elastic_constant, unit_q, qh_q)
 
         return (
             factor[None, None]
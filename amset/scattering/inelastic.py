@@ -1,11 +1,11 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
 import numpy as np
 from pymatgen.electronic_structure.core import Spin
 
-from amset.constants import boltzmann_au, hbar, s_to_au
+from amset.constants import boltzmann_au, ev_to_hartree, hbar, s_to_au
 from amset.core.data import AmsetData
 from amset.log import log_list
 from amset.scattering.common import calculate_inverse_screening_length_sq
@@ -21,6 +21,10 @@ class AbstractInelasticScattering(ABC):
     name: str
     required_properties: Tuple[str]
 
+    # the energy exchanged with the phonon, in Hartree; scatterers with the same
+    # energy are integrated over the same final states
+    energy_diff: float
+
     def __init__(self, properties, doping, temperatures, nbands):
         self.properties = properties
         self.doping = doping
@@ -39,6 +43,14 @@ class AbstractInelasticScattering(ABC):
             cls.get_nbands(amset_data),
         )
 
+    @classmethod
+    def from_amset_data_modes(
+        cls, materials_properties: Dict[str, Any], amset_data: AmsetData
+    ) -> List["AbstractInelasticScattering"]:
+        # mechanisms that support several phonon modes return one scatterer per mode,
+        # so that the rates of each mode are reported separately
+        return [cls.from_amset_data(materials_properties, amset_data)]
+
     @abstractmethod
     def prefactor(self, spin: Spin, b_idx: int):
         pass
@@ -74,18 +86,28 @@ class PolarOpticalScattering(AbstractInelasticScattering):
         pop_frequency,
         n_po,
         inverse_screening_length_sq,
+        weight=1.0,
+        name=None,
     ):
         super().__init__(properties, doping, temperatures, nbands)
         self.pop_frequency = pop_frequency
         self.n_po = n_po
         self.inverse_screening_length_sq = inverse_screening_length_sq
-        self._prefactor = s_to_au * pop_frequency / 2
+        self.weight = weight
+        if name is not None:
+            self.name = name
+        self.energy_diff = pop_frequency * s_to_au * hbar * ev_to_hartree
+        self._prefactor = weight * s_to_au * pop_frequency / 2
 
     @classmethod
     def from_amset_data(
-        cls, materials_properties: Dict[str, Any], amset_data: AmsetData
+        cls,
+        materials_properties: Dict[str, Any],
+        amset_data: AmsetData,
+        weight: float = 1.0,
+        name: Optional[str] = None,
     ):
-        logger.info("Initializing POP scattering")
+        logger.info(f"Initializing {name or cls.name} scattering")
 
         # convert from THz to angular frequency in Hz
         pop_frequency = (
@@ -118,6 +140,7 @@ class PolarOpticalScattering(AbstractInelasticScattering):
                 ),
                 f"ħω: {pop_frequency * hbar * s_to_au:.4f} eV",
             ]
+            + ([f"weight: {weight:.4g}"] if name is not None else [])
         )
 
         # want to store two intermediate properties for:
@@ -147,8 +170,44 @@ class PolarOpticalScattering(AbstractInelasticScattering):
             pop_frequency,
             n_po,
             inverse_screening_length_sq,
+            weight=weight,
+            name=name,
         )
 
+    @classmethod
+    def from_amset_data_modes(
+        cls, materials_properties: Dict[str, Any], amset_data: AmsetData
+    ) -> List["PolarOpticalScattering"]:
+        """
+        Initialise one scatterer for each polar optical phonon mode.
+
+        If ``pop_frequency`` is a single frequency, one scatterer labelled "POP" is
+        returned. Otherwise, ``pop_frequency`` should contain the (frequency, weight)
+        of each mode, and the scatterers are labelled "POP1", "POP2", etc. The weight
+        gives the fraction of the polar coupling attributed to each mode, i.e., the
+        rates of each mode are scaled by its weight.
+
+        Args:
+            materials_properties: The material properties.
+            amset_data: The amset data.
+
+        Returns:
+            A scatterer for each mode.
+        """
+        pop_frequency = materials_properties["pop_frequency"]
+        if isinstance(pop_frequency, (int, float)):
+            return [cls.from_amset_data(materials_properties, amset_data)]
+
+        scatterers = []
+        for i, (frequency, weight) in enumerate(pop_frequency):
+            mode_properties = dict(materials_properties, pop_frequency=frequency)
+            scatterers.append(
+                cls.from_amset_data(
+                    mode_properties, amset_data, weight=weight, name=f"POP{i + 1}"
+                )
+            )
+        return scatterers
+
     def prefactor(self, spin: Spin, b_idx: int):
         # need to return prefactor with shape (nspins, ndops, ntemps, nbands)
         return self._prefactor * np.ones((len(self.doping), len(self.temperatures)))
@@ -186,3 +245,18 @@ class PolarOpticalScattering(AbstractInelasticScattering):
         #         return factor * self.absorption_f_out[spin][:, :, b_idx, k_idx]
         #     else:
         #         return factor * self.absorption_f_in[spin][:, :, b_idx, k_idx]
+
+
+def get_pop_frequencies(pop_frequency) -> List[float]:
+    """
+    Get the frequency of each polar optical phonon mode.
+
+    Args:
+        pop_frequency: A single frequency, or the (frequency, weight) of each mode.
+
+    Returns:
+        The frequencies, in THz.
+    """
+    if isinstance(pop_frequency, (int, float)):
+        return [pop_frequency]
+    return [frequency for frequency, _ in pop_frequency]
@@ -0,0 +1,264 @@
+"""
+This module implements a scattering worker pool that distributes the scattering
+calculation over several machines.
+
+Each machine runs a scattering server (``amset scattering-server``), which starts a
+local :class:`~amset.scattering.calculate.ScatteringWorkerPool`. The inputs are sent
+to each server once per calculation, after which only the k-point indices of each job
+and the resulting rates are sent over the network.
+
+Warning:
+    Messages are serialised using pickle. Only run servers on trusted networks and
+    always use a secret authentication key.
+"""
+
+import logging
+import queue
+import threading
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import Client, Listener, wait
+from typing import List, Optional, Tuple, Union
+
+from amset.constants import defaults
+from amset.log import log_time_taken
+from amset.scattering.calculate import (
+    AbstractScatteringWorkerPool,
+    ScatteringWorkerPool,
+    _allocate_empty_arrays,
+    _split_reference,
+)
+from amset.util import dict_array_from_buffer
+
+__author__ = "Alex Ganose"
+__maintainer__ = "Alex Ganose"
+__email__ = "aganose@lbl.gov"
+
+logger = logging.getLogger(__name__)
+
+# the number of jobs sent to each server per worker before any results are received;
+# keeps the servers busy while the results are in transit
+_jobs_per_worker = 2
+
+
+class RemoteScatteringWorkerPool(AbstractScatteringWorkerPool):
+    """
+    A pool of scattering workers spread over several scattering servers.
+
+    The servers must have been started using ``amset scattering-server`` or
+    :func:`serve_scattering_workers`. Jobs are sent to the servers as they have free
+    workers, so faster machines receive more jobs.
+
+    Args:
+        addresses: The (host, port) address of each server.
+        authkey: The authentication key shared with the servers.
+        timeout: How long to keep trying to connect to servers that are still
+            starting up, in seconds.
+    """
+
+    def __init__(
+        self,
+        addresses: List[Tuple[str, int]],
+        authkey: Union[str, bytes],
+        timeout: float = 60,
+    ):
+        self.addresses = [tuple(address) for address in addresses]
+        self.authkey = authkey.encode() if isinstance(authkey, str) else authkey
+        self.timeout = timeout
+        self.nworkers = 0
+        self.startup_time = 0
+        self.workers = None
+        self._server_nworkers = []
+        self._njobs = []
+        self._queued_jobs = deque()
+
+    def start(self):
+        if self.workers is not None:
+            return
+
+        logger.info(f"Connecting to {len(self.addresses)} scattering servers")
+        t0 = time.perf_counter()
+
+        self.workers = []
+        self._server_nworkers = []
+        for address in self.addresses:
+            connection = _connect(address, self.authkey, t0 + self.timeout)
+            self.workers.append(connection)
+            self._server_nworkers.append(connection.recv())
+
+        self.nworkers = sum(self._server_nworkers)
+        self._njobs = [0] * len(self.workers)
+        self._queued_jobs.clear()
+
+        self.startup_time += time.perf_counter() - t0
+        log_time_taken(t0)
+
+    def load(self, reference: tuple) -> tuple:
+        self.start()
+
+        # the arrays are serialised once per server rather than once per job
+        arrays = []
+        skeleton = _split_reference(reference, arrays)
+        for connection in self.workers:
+            connection.send(("load", skeleton, arrays))
+
+        for i in range(len(self.workers)):
+            self._receive(i)
+
+        # the rates are returned with each result, so are only allocated locally
+        # once the servers have been loaded
+        return _allocate_empty_arrays(reference)
+
+    def submit(self, job: tuple):
+        self._queued_jobs.append(job)
+        self._send_jobs()
+
+    def get_result(self):
+        connection = wait(self.workers)[0]
+        i = self.workers.index(connection)
+        result = self._receive(i)
+        self._njobs[i] -= 1
+        self._send_jobs()
+        return result
+
+    def close(self):
+        if self.workers is not None:
+            for connection in self.workers:
+                try:
+                    connection.send(None)
+                    connection.close()
+                except OSError:
+                    pass
+            self.workers = None
+        self._queued_jobs.clear()
+
+    def _send_jobs(self):
+        for i, connection in enumerate(self.workers):
+            max_jobs = self._server_nworkers[i] * _jobs_per_worker
+            while self._queued_jobs and self._njobs[i] < max_jobs:
+                connection.send(self._queued_jobs.popleft())
+                self._njobs[i] += 1
+
+    def _receive(self, i):
+        try:
+            result = self.workers[i].recv()
+        except (EOFError, OSError):
+            address = self.addresses[i]
+            self.close()
+            raise ConnectionError(f"Lost connection to scattering server {address}")
+
+        if isinstance(result[0], Exception):
+            logger.error(
+                "Scattering server {} ended with error:\n{}\nexiting".format(
+                    self.addresses[i], str(result[1])
+                )
+            )
+            self.close()
+            raise result[0]
+        return result
+
+
+def _connect(address, authkey, deadline):
+    while True:
+        try:
+            return Client(address, authkey=authkey)
+        except ConnectionRefusedError:
+            if time.perf_counter() > deadline:
+                raise
+            time.sleep(0.5)
+
+
+def serve_scattering_workers(
+    address: Tuple[str, int],
+    authkey: Union[str, bytes],
+    nworkers: int = defaults["nworkers"],
+    progress_bar: bool = defaults["print_log"],
+    max_connections: Optional[int] = None,
+):
+    """
+    Run a scattering server that calculates jobs for a RemoteScatteringWorkerPool.
+
+    The server handles one connection at a time and keeps its worker processes alive
+    between connections.
+
+    Args:
+        address: The (host, port) address to listen on.
+        authkey: The authentication key shared with the clients.
+        nworkers: The number of processes. -1 uses all processors.
+        progress_bar: Whether to show a progress bar when starting the processes.
+        max_connections: The number of connections to serve before exiting. If None,
+            the server runs until it is killed.
+    """
+    authkey = authkey.encode() if isinstance(authkey, str) else authkey
+    pool = ScatteringWorkerPool(nworkers=nworkers, progress_bar=progress_bar)
+    nconnections = 0
+    try:
+        with Listener(tuple(address), authkey=authkey) as listener:
+            logger.info(f"Listening for scattering jobs on {listener.address}")
+            while max_connections is None or nconnections < max_connections:
+                with listener.accept() as connection:
+                    logger.info(f"Connection from {listener.last_accepted}")
+                    _serve_connection(connection, pool)
+                nconnections += 1
+    finally:
+        pool.close()
+
+
+def _serve_connection(connection, pool):
+    pool.start()
+    connection.send(pool.nworkers)
+
+    # the results are sent back from a separate thread so that new jobs can be
+    # received while the workers are busy; a token is queued for each job submitted
+    tokens = queue.Queue()
+    data = {}
+    thread = threading.Thread(
+        target=_send_results, args=(connection, pool, tokens, data), daemon=True
+    )
+    thread.start()
+
+    try:
+        while True:
+            message = connection.recv()
+            if message is None:
+                break
+
+            if message[0] == "load":
+                # jobs are only loaded once all results from previous jobs have been
+                # received by the client, so the data can be safely replaced
+                _, skeleton, arrays = message
+                reference = pool.load_split(skeleton, arrays)
+
+                # the last two items of the reference are the rates buffer and the
+                # position of the elastic and inelastic rates in the rates array
+                data["rates"] = dict_array_from_buffer(reference[-2])
+                data["rates_slices"] = reference[-1]
+                connection.send(("loaded", None))
+            else:
+                pool.submit(message)
+                tokens.put(True)
+    except (EOFError, OSError):
+        logger.info("Client disconnected")
+    finally:
+        tokens.put(None)
+        thread.join()
+
+
+def _send_results(connection, pool, tokens, data):
+    while tokens.get() is not None:
+        try:
+            result = pool.get_result()
+            spin, b_idx, scattering_type, ir_idxs = result[:4]
+            rates_slice = data["rates_slices"][scattering_type]
+            rates = data["rates"][spin][rates_slice, ..., b_idx, :][..., ir_idxs]
+            result = result[:-1] + (rates,)
+        except BaseException as e:
+            result = (e, traceback.format_exc())
+
+        try:
+            connection.send(result)
+        except OSError:
+            # the client has disconnected; the results of the remaining jobs are
+            # still collected so that they don't affect the next connection
+            pass
@@ -12,6 +12,7 @@ from amset.tools.effmass import eff_mass
 from amset.tools.phonon_frequency import phonon_frequency
 from amset.tools.plot import plot
 from amset.tools.run import run
+from amset.tools.scattering_server import scattering_server
 from amset.tools.wavefunction import wave
 
 __author__ = "Alex Ganose"
@@ -55,3 +56,4 @@ cli.add_command(phonon_frequency)
 cli.add_command(wave)
 cli.add_command(eff_mass)
 cli.add_command(deform)
+cli.add_command(scattering_server)
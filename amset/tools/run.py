@@ -9,7 +9,12 @@ import click
 from click import option
 
 from amset.tools.common import zero_weighted_type
-from amset.util import parse_deformation_potential, parse_doping, parse_temperatures
+from amset.util import (
+    parse_deformation_potential,
+    parse_doping,
+    parse_pop_frequency,
+    parse_temperatures,
+)
 
 __author__ = "Alex Ganose"
 __maintainer__ = "Alex Ganose"
@@ -70,7 +75,12 @@ __email__ = "aganose@lbl.gov"
 @option("--piezoelectric-constant", type=float, help="piezoelectric constant")
 @option("--defect-charge", type=float, help="defect charge")
 @option("--compensation-factor", type=float, help="defect compensation factor")
-@option("--pop-frequency", type=float, help="polar optical phonon frequency [THz]")
+@option(
+    "--pop-frequency",
+    metavar="F",
+    type=parse_pop_frequency,
+    help='polar optical phonon frequency [THz] (e.g. "8.2" or "8.2:0.6,10.5:0.4")',
+)
 @option("--mean-free-path", type=float, help="set the mean free path of electrons [nm]")
 @option("--constant-relaxation-time", type=float, help="constant relaxation time [s]")
 @option(
@@ -89,9 +99,39 @@ __email__ = "aganose@lbl.gov"
     default=None,
     help="cache wavefunction coefficients; beware increased memory usage [default: True]",
 )
+@option(
+    "--symmetry-reduce-final-states/--no-symmetry-reduce-final-states",
+    default=None,
+    help="use the little group of k to reduce the final states [default: False]",
+)
+@option(
+    "--quadrature-precision",
+    type=click.Choice(["fast", "balanced", "accurate"]),
+    help="precision of the scattering integrals [default: balanced]",
+)
+@option(
+    "--single-precision-energy-diffs/--no-single-precision-energy-diffs",
+    default=None,
+    help="store tetrahedron energy differences in single precision [default: False]",
+)
+@option(
+    "--scattering-checkpoint",
+    metavar="FILE",
+    help="HDF5 file used to restart the scattering rates",
+)
+@option(
+    "--scattering-integrand-cache",
+    metavar="FILE",
+    help="HDF5 file used to cache the scattering integrand",
+)
 @option("--dos-estep", type=float, help="dos energy step [eV]")
 @option("--symprec", type=float, help="symmetry precision")
 @option("--nworkers", type=int, help="number of processors to use")
+@option(
+    "--min-free-memory",
+    type=float,
+    help="pause scattering jobs when free memory is below this [GB]",
+)
 @option(
     "--calculate-mobility/--no-calculate-mobility",
     default=None,
@@ -0,0 +1,28 @@
+import click
+from click import option
+
+__author__ = "Alex Ganose"
+__maintainer__ = "Alex Ganose"
+__email__ = "aganose@lbl.gov"
+
+
+@click.command()
+@option("--host", default="0.0.0.0", help="host address to listen on")
+@option("-p", "--port", default=5000, type=int, help="port to listen on")
+@option(
+    "-k",
+    "--authkey",
+    envvar="AMSET_AUTHKEY",
+    required=True,
+    help="authentication key shared with the client [env: AMSET_AUTHKEY]",
+)
+@option("--nworkers", default=-1, type=int, help="number of processors to use")
+def scattering_server(host, port, authkey, nworkers):
+    """
+    Run a server that calculates scattering rates for other machines
+    """
+    from amset.log import initialize_amset_logger
+    from amset.scattering.remote import serve_scattering_workers
+
+    initialize_amset_logger(filename="amset_server.log")
+    serve_scattering_workers((host, port), authkey, nworkers=nworkers)
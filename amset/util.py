@@ -5,13 +5,18 @@ Module defining utility functions.
 import collections
 import copy
 import logging
+import math
+import os
 import sys
 from multiprocessing.sharedctypes import RawArray
-from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 from tqdm.auto import tqdm
 
+from amset.log import log_list
+
 __author__ = "Alex Ganose"
 __maintainer__ = "Alex Ganose"
 __email__ = "aganose@lbl.gov"
@@ -21,6 +26,12 @@ logger = logging.getLogger(__name__)
 
 _bar_format = "{desc} {percentage:3.0f}%|{bar}| {elapsed}<{remaining}{postfix}"
 
+# control group (cgroup) files are used to find the CPU and memory limits set by
+# batch schedulers and container runtimes. cgroup v1 reports no memory limit as a
+# very large number rather than "max"
+_cgroup_root = Path("/sys/fs/cgroup")
+_cgroup_unlimited_memory = 2**60
+
 
 def validate_settings(user_settings: Dict[str, Any]) -> Dict[str, Any]:
     """Parse, validate and fill amset settings.
@@ -56,6 +67,11 @@ def validate_settings(user_settings: Dict[str, Any]) -> Dict[str, Any]:
     elif isinstance(settings["deformation_potential"], list):
         settings["deformation_potential"] = tuple(settings["deformation_potential"])
 
+    if isinstance(settings["pop_frequency"], str):
+        settings["pop_frequency"] = parse_pop_frequency(settings["pop_frequency"])
+    elif settings["pop_frequency"] is not None:
+        settings["pop_frequency"] = cast_pop_frequency(settings["pop_frequency"])
+
     if settings["static_dielectric"] is not None:
         settings["static_dielectric"] = cast_tensor(settings["static_dielectric"])
 
@@ -168,6 +184,36 @@ def cast_piezoelectric_tensor(
     return np.array(piezoelectric_tensor)
 
 
+def cast_pop_frequency(
+    pop_frequency: Union[float, List[List[float]]]
+) -> Union[float, Tuple[Tuple[float, float], ...]]:
+    """Cast polar optical phonon frequency to a number or tuple of modes.
+
+    Args:
+        pop_frequency: A single frequency, or a list of modes, each given as a
+            frequency and weight.
+
+    Returns:
+        The frequency, or the (frequency, weight) of each mode.
+    """
+    if isinstance(pop_frequency, (int, float)):
+        return float(pop_frequency)
+
+    modes = tuple(tuple(map(float, mode)) for mode in pop_frequency)
+    if len(modes) == 0 or any(len(mode) != 2 for mode in modes):
+        raise ValueError(
+            "Unsupported pop_frequency format. Should be a number or a list of "
+            "[frequency, weight] modes."
+        )
+
+    if any(frequency <= 0 or weight < 0 for frequency, weight in modes):
+        raise ValueError(
+            "pop_frequency modes must have positive frequencies and non-negative "
+            "weights."
+        )
+    return modes
+
+
 def tensor_average(tensor: Union[List, np.ndarray]) -> Union[float, np.ndarray]:
     """Calculate the average of the tensor eigenvalues.
 
@@ -213,6 +259,20 @@ def groupby(
     return out
 
 
+def get_index_dtype(size: int) -> np.dtype:
+    """Get the smallest integer type that can index an array.
+
+    Args:
+        size: The number of elements in the array.
+
+    Returns:
+        ``int32`` if all indices fit in 32 bits, otherwise ``int64``.
+    """
+    if size <= np.iinfo(np.int32).max:
+        return np.dtype(np.int32)
+    return np.dtype(np.int64)
+
+
 def cast_dict_list(d):
     """Recursively cast numpy arrays in a dictionary to lists.
 
@@ -376,6 +436,35 @@ def parse_deformation_potential(
         )
 
 
+def parse_pop_frequency(
+    pop_frequency_str: str,
+) -> Union[float, Tuple[Tuple[float, float], ...]]:
+    """Parse polar optical phonon frequency string.
+
+    Args:
+        pop_frequency_str: The polar optical phonon frequency string. Can be a single
+            frequency, or several modes separated by commas, where each mode is
+            given as the frequency and weight separated by a colon, e.g.,
+            "8.2:0.6,10.5:0.4".
+
+    Returns:
+        The frequency, or the (frequency, weight) of each mode.
+    """
+    pop_frequency_str = pop_frequency_str.strip().replace(" ", "")
+
+    try:
+        if ":" not in pop_frequency_str:
+            return float(pop_frequency_str)
+
+        modes = [mode.split(":") for mode in pop_frequency_str.split(",")]
+        return cast_pop_frequency(modes)
+
+    except ValueError:
+        raise ValueError(
+            "ERROR: Unrecognised pop frequency format: {}".format(pop_frequency_str)
+        )
+
+
 def get_progress_bar(
     iterable: Optional[Iterable] = None,
     total: Optional[int] = None,
@@ -472,17 +561,144 @@ def parse_ibands(ibands: Union[str, Tuple[List[int], List[int]]]) -> Dict:
     return {s: np.array(i, dtype=int) - 1 for s, i in new_ibands.items()}
 
 
+def get_cpu_count() -> int:
+    """Get the number of processors available to amset.
+
+    Unlike ``multiprocessing.cpu_count``, this respects the CPU affinity of the
+    process and any CPU quota set through Linux control groups (e.g., by a batch
+    scheduler or container runtime).
+
+    Returns:
+        The number of processors.
+    """
+    import multiprocessing
+
+    try:
+        ncpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # not available on macOS and Windows
+        ncpus = multiprocessing.cpu_count()
+
+    quota = _read_cgroup_cpu_quota()
+    if quota is not None:
+        ncpus = min(ncpus, max(int(math.ceil(quota)), 1))
+    return ncpus
+
+
+def get_available_memory() -> int:
+    """Get the memory available to amset, in bytes.
+
+    The memory available on the machine is capped by any memory limit set through
+    Linux control groups (e.g., by a batch scheduler or container runtime).
+
+    Returns:
+        The available memory.
+    """
+    import psutil
+
+    available = psutil.virtual_memory().available
+
+    limit, usage = _read_cgroup_memory()
+    if limit is not None and usage is not None:
+        available = min(available, max(limit - usage, 0))
+    return available
+
+
+def get_nworkers(
+    nworkers: int = -1, worker_memory: Optional[int] = None, shared_memory: int = 0
+) -> int:
+    """Get the number of worker processes to use.
+
+    If ``nworkers`` is -1, one worker is used per available processor (see
+    :func:`get_cpu_count`). If the memory needed by each worker is given, the number
+    of workers is further limited so that all workers fit in the available memory (see
+    :func:`get_available_memory`). At least one worker is always used.
+
+    Args:
+        nworkers: The requested number of workers. Values other than -1 are returned
+            unchanged.
+        worker_memory: The memory needed by each worker, in bytes.
+        shared_memory: The memory that will be allocated once and shared between the
+            workers, in bytes.
+
+    Returns:
+        The number of workers.
+    """
+    if nworkers != -1:
+        return nworkers
+
+    ncpus = get_cpu_count()
+    if worker_memory is None:
+        return ncpus
+
+    available = get_available_memory()
+    max_nworkers = int((available - shared_memory) // max(worker_memory, 1))
+    nworkers = max(min(ncpus, max_nworkers), 1)
+
+    logger.info("Automatic number of workers:")
+    log_list(
+        [
+            f"available processors: {ncpus}",
+            f"available memory: {available / 1024 ** 3:.2f} GB",
+            f"shared memory: {shared_memory / 1024 ** 3:.2f} GB",
+            f"estimated memory per worker: {worker_memory / 1024 ** 3:.2f} GB",
+            f"number of workers: {nworkers}",
+        ]
+    )
+    if max_nworkers < 1:
+        logger.warning(
+            "Estimated memory requirements exceed the available memory. The "
+            "calculation may be killed by the operating system."
+        )
+    return nworkers
+
+
+def _read_cgroup_file(filename: str) -> Optional[str]:
+    try:
+        return (_cgroup_root / filename).read_text().strip()
+    except (OSError, ValueError):
+        return None
+
+
+def _read_cgroup_cpu_quota() -> Optional[float]:
+    # returns the number of processors allowed by the cgroup cpu quota, or None if
+    # there is no quota. Both cgroup v2 (cpu.max) and v1 (cpu.cfs_*) are supported
+    cpu_max = _read_cgroup_file("cpu.max")
+    if cpu_max is not None:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    quota = _read_cgroup_file("cpu/cpu.cfs_quota_us")
+    period = _read_cgroup_file("cpu/cpu.cfs_period_us")
+    if quota is not None and period is not None and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def _read_cgroup_memory() -> Tuple[Optional[int], Optional[int]]:
+    # returns the (limit, usage) of the cgroup in bytes, or None if there is no limit.
+    # Both cgroup v2 (memory.max) and v1 (memory/memory.limit_in_bytes) are supported
+    limit = _read_cgroup_file("memory.max")
+    usage = _read_cgroup_file("memory.current")
+    if limit is None:
+        limit = _read_cgroup_file("memory/memory.limit_in_bytes")
+        usage = _read_cgroup_file("memory/memory.usage_in_bytes")
+
+    if limit is None or usage is None or limit == "max":
+        return None, None
+
+    # cgroup v1 reports no limit as a very large number
+    limit = int(limit)
+    if limit >= _cgroup_unlimited_memory:
+        return None, None
+    return limit, int(usage)
+
+
 def create_shared_array(data: np.ndarray, return_shared_data=False):
     data = np.asarray(data)
-    if data.dtype == np.complex128:
-        data_type = "complex"
-        data_buffer = RawArray("d", int(np.prod(data.shape)) * 2)
-    else:
-        data_type = np.ctypeslib.as_ctypes_type(data.dtype)
-        data_buffer = RawArray(data_type, int(np.prod(data.shape)))
-
-    buffer = (data_buffer, data.shape, data_type)
-    data_shared = array_from_buffer(buffer)
+    buffer, data_shared = allocate_shared_array(data.shape, data.dtype)
     data_shared[:] = data[:]
 
     if return_shared_data:
@@ -491,6 +707,20 @@ def create_shared_array(data: np.ndarray, return_shared_data=False):
         return buffer
 
 
+def allocate_shared_array(shape: Tuple[int, ...], dtype=float):
+    # allocates a zeroed array in shared memory, returns the buffer and the array
+    dtype = np.dtype(dtype)
+    if dtype == np.complex128:
+        data_type = "complex"
+        data_buffer = RawArray("d", int(np.prod(shape)) * 2)
+    else:
+        data_type = np.ctypeslib.as_ctypes_type(dtype)
+        data_buffer = RawArray(data_type, int(np.prod(shape)))
+
+    buffer = (data_buffer, tuple(shape), data_type)
+    return buffer, array_from_buffer(buffer)
+
+
 def create_shared_dict_array(data: Dict[Any, np.ndarray], return_shared_data=False):
     # turns a dict of key: np.ndarray to a dict of key: buffer
     data_buffer = {}
@@ -519,3 +749,275 @@ def dict_array_from_buffer(buffer):
     for key, value_buffer in buffer.items():
         data[key] = array_from_buffer(value_buffer)
     return data
+
+
+class IrreducibleArray:
+    """An array of k-point dependent values stored on the irreducible k-points.
+
+    The values are expanded to the full Brillouin zone when the array is indexed, so
+    that it can be used in place of the full array without ever storing it in memory.
+    For example, ``array[0, 1]`` only expands the selected values, whereas
+    ``np.asarray(array)`` expands all values.
+
+    Args:
+        ir_data: The data on the irreducible k-points. The last axis must be the
+            irreducible k-point axis.
+        ir_kpoints_idx: The index of each irreducible k-point in the full k-point
+            mesh.
+        ir_to_full_idx: The index of the irreducible k-point for each k-point in the
+            full mesh.
+    """
+
+    def __init__(
+        self,
+        ir_data: np.ndarray,
+        ir_kpoints_idx: np.ndarray,
+        ir_to_full_idx: np.ndarray,
+    ):
+        self.ir_data = ir_data
+        self.ir_kpoints_idx = ir_kpoints_idx
+        self.ir_to_full_idx = ir_to_full_idx
+
+    @property
+    def shape(self):
+        return self.ir_data.shape[:-1] + (len(self.ir_to_full_idx),)
+
+    @property
+    def ndim(self):
+        return self.ir_data.ndim
+
+    @property
+    def dtype(self):
+        return self.ir_data.dtype
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __array__(self, dtype=None):
+        return np.asarray(self.ir_data[..., self.ir_to_full_idx], dtype=dtype)
+
+    def __getitem__(self, key):
+        key = self._expand_key(key)
+        if isinstance(key[-1], slice):
+            # index the leading axes first, the k-point axis stays as the last axis
+            ir_data = self.ir_data[key[:-1] + (slice(None),)]
+            return ir_data[..., self.ir_to_full_idx[key[-1]]]
+        return self.ir_data[key[:-1] + (self.ir_to_full_idx[key[-1]],)]
+
+    def __setitem__(self, key, value):
+        key = self._expand_key(key)
+        if isinstance(key[-1], slice):
+            if key[-1] != slice(None):
+                raise IndexError("Cannot assign to a slice of the k-point axis")
+            if isinstance(value, IrreducibleArray):
+                value = value.ir_data
+            else:
+                value = np.asarray(value)
+                if value.ndim > 0:
+                    value = value[..., self.ir_kpoints_idx]
+            self.ir_data[key] = value
+        else:
+            # values at symmetry equivalent k-points are assumed to be the same
+            self.ir_data[key[:-1] + (self.ir_to_full_idx[key[-1]],)] = value
+
+    def _expand_key(self, key):
+        # convert a key to a tuple with one entry for each axis
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        expanded = []
+        for k in key:
+            if isinstance(k, (np.ndarray, list)) and np.asarray(k).dtype == bool:
+                # boolean arrays can span several axes
+                expanded.extend(np.nonzero(k))
+            else:
+                expanded.append(k)
+
+        if any(k is Ellipsis for k in expanded):
+            i = next(i for i, k in enumerate(expanded) if k is Ellipsis)
+            fill = [slice(None)] * (self.ndim - len(expanded) + 1)
+            expanded = expanded[:i] + fill + expanded[i + 1 :]
+        else:
+            expanded += [slice(None)] * (self.ndim - len(expanded))
+
+        if len(expanded) != self.ndim:
+            raise IndexError(f"Too many indices for array with {self.ndim} dimensions")
+        return tuple(expanded)
+
+
+class LazyBandArray:
+    """An array of band dependent values that are only calculated when needed.
+
+    The values of a band are calculated the first time the band is indexed, so that
+    bands that are never used take up no memory. For example, ``array[0, 1]`` only
+    calculates the values of the first band, whereas ``np.asarray(array)`` calculates
+    the values of all bands.
+
+    The values given as ``data`` may be shared with other processes, so are never
+    modified. Bands calculated later are stored in a separate array owned by the
+    process, and are only added to ``data`` when the values are moved to shared
+    memory using :meth:`to_shared`.
+
+    Args:
+        shape: The shape of the full array. The first axis must be the band axis.
+        get_band_values: A function that takes an array of band indices and returns
+            the values of those bands, with the shape ``(nbands,) + shape[1:]``.
+        dtype: The data type of the values.
+        data: The values of the bands that have already been calculated.
+        band_rows: The row of ``data`` containing the values of each band, or -1 if
+            the band has not been calculated.
+    """
+
+    def __init__(
+        self,
+        shape: Tuple[int, ...],
+        get_band_values: Callable[[np.ndarray], np.ndarray],
+        dtype: Union[type, np.dtype] = float,
+        data: Optional[np.ndarray] = None,
+        band_rows: Optional[np.ndarray] = None,
+    ):
+        if data is None:
+            data = np.zeros((0,) + tuple(shape[1:]), dtype=dtype)
+        if band_rows is None:
+            band_rows = np.full(shape[0], -1)
+
+        self.get_band_values = get_band_values
+        self.data = data
+        self.band_rows = band_rows
+        self._shape = tuple(shape)
+
+        # the bands calculated by this process; the rows of these bands continue on
+        # from the rows of data
+        self._new_data = np.zeros((0,) + self._shape[1:], dtype=data.dtype)
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def ndim(self):
+        return len(self._shape)
+
+    @property
+    def dtype(self):
+        return self.data.dtype
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + self._new_data.nbytes + self.band_rows.nbytes
+
+    @property
+    def calculated_bands(self):
+        return np.where(self.band_rows >= 0)[0]
+
+    def __len__(self):
+        return self._shape[0]
+
+    def __array__(self, dtype=None):
+        self.calculate_bands(np.arange(len(self)))
+        return np.asarray(self._get_rows(self.band_rows, ()), dtype=dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+
+        if len(key) == 1 and np.asarray(key[0]).dtype == bool and self.ndim > 1:
+            # boolean arrays can span several axes
+            key = np.nonzero(key[0])
+        elif key[0] is Ellipsis:
+            key = (slice(None),) + key
+
+        band_key = key[0]
+        rows = self.band_rows[band_key]
+        if np.any(rows < 0):
+            self.calculate_bands(np.arange(len(self))[band_key])
+            rows = self.band_rows[band_key]
+
+        if isinstance(band_key, slice):
+            # index the band axis first, so that it stays as the first axis
+            return self._get_rows(rows, ())[(slice(None),) + tuple(key[1:])]
+        return self._get_rows(rows, tuple(key[1:]))
+
+    def calculate_bands(self, band_idxs: Union[int, List[int], np.ndarray]):
+        """Calculate the values of bands, if they have not already been calculated.
+
+        Args:
+            band_idxs: One or more band indices.
+        """
+        band_idxs = self._get_missing_bands(band_idxs)
+        if len(band_idxs) == 0:
+            return
+
+        nnew = len(self._new_data)
+        new_data = np.zeros((nnew + len(band_idxs),) + self.shape[1:], self.dtype)
+        new_data[:nnew] = self._new_data
+        self._calculate_band_values(new_data[nnew:], band_idxs)
+        self._new_data = new_data
+        self._set_band_rows(band_idxs, len(self.data) + nnew)
+
+    def to_shared(self, band_idxs: Union[int, List[int], np.ndarray] = ()):
+        """Move the values to shared memory.
+
+        Args:
+            band_idxs: Bands to calculate before the values are shared. The values
+                are calculated directly in shared memory.
+
+        Returns:
+            The buffers of the values and the band rows, which can be used to create
+            the array in another process.
+        """
+        band_idxs = self._get_missing_bands(band_idxs)
+
+        nshared = len(self.data)
+        nrows = nshared + len(self._new_data)
+        shape = (nrows + len(band_idxs),) + self.shape[1:]
+        data_buffer, data = allocate_shared_array(shape, self.dtype)
+        data[:nshared] = self.data
+        data[nshared:nrows] = self._new_data
+        self._calculate_band_values(data[nrows:], band_idxs)
+        self._set_band_rows(band_idxs, nrows)
+        self.data = data
+        self._new_data = self._new_data[:0]
+
+        rows_buffer, self.band_rows = create_shared_array(
+            self.band_rows, return_shared_data=True
+        )
+        return data_buffer, rows_buffer
+
+    def _get_missing_bands(self, band_idxs):
+        band_idxs = np.unique(np.asarray(band_idxs, dtype=int))
+        return band_idxs[self.band_rows[band_idxs] < 0]
+
+    def _calculate_band_values(self, data, band_idxs):
+        # calculate the values one band at a time, to limit the memory of
+        # intermediate arrays
+        for i, band_idx in enumerate(band_idxs):
+            data[i] = self.get_band_values(np.array([band_idx]))[0]
+
+    def _set_band_rows(self, band_idxs, start):
+        # band_rows may be shared with other processes so is not modified in place
+        band_rows = self.band_rows.copy()
+        band_rows[band_idxs] = start + np.arange(len(band_idxs))
+        self.band_rows = band_rows
+
+    def _get_rows(self, rows, key):
+        # index the values of rows (which must have been calculated) with the rest of
+        # the key; rows past the end of data are found in the new data
+        nshared = len(self.data)
+        new = np.asarray(rows) >= nshared
+        if not np.any(new):
+            return self.data[(rows,) + key]
+        elif np.all(new):
+            return self._new_data[(rows - nshared,) + key]
+
+        values = self.data[(np.where(new, 0, rows),) + key]
+        new_values = self._new_data[(np.where(new, rows - nshared, 0),) + key]
+
+        # the band rows are always advanced indices, so the broadcast shape of the
+        # advanced indices comes first in the indexed values
+        advanced = [np.asarray(k) for k in key if not isinstance(k, slice)]
+        shape = np.broadcast_shapes(new.shape, *[a.shape for a in advanced])
+        new = np.broadcast_to(new, shape).reshape(
+            shape + (1,) * (values.ndim - len(shape))
+        )
+        return np.where(new, new_values, values)
@@ -38,6 +38,7 @@ if __name__ == "__main__":
             "tqdm",
             "tabulate",
             "memory_profiler",
+            "psutil",
             "spglib",
             "click",
             "sumo",
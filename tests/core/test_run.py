@@ -16,19 +16,32 @@ The following tests are performed:
   constant/piezoelectric + no cache for Silicon
 - use wavefunction coefficients + using deformation potential file + full elastic
   constant/piezoelectric for Gallium Arsenide
+- reusing a scattering worker pool across two runs for Silicon
+- distributing the scattering calculation over two local scattering servers for
+  Silicon
+- restarting the scattering calculation from a partially finished checkpoint for
+  Silicon
+- adding doping levels to a calculation using a cached scattering integrand for
+  Silicon
 - don't write mesh, using projections + deformation potential tuple + single elastic
   constant/piezoelectric for K2ReF6 (tricky spin polarized system)
 """
 
+import multiprocessing
+import socket
 from copy import deepcopy
 from pathlib import Path
 from typing import Any, Dict
 
+import h5py
 import numpy as np
 import pytest
 from monty.serialization import dumpfn
 
 from amset.core.run import Runner
+from amset.scattering.calculate import ScatteringCalculator, ScatteringWorkerPool
+from amset.scattering.checkpoint import ScatteringCheckpoint
+from amset.scattering.remote import RemoteScatteringWorkerPool, serve_scattering_workers
 
 si_settings_no_mesh: Dict[str, Any] = {
     "interpolation_factor": 5,
@@ -176,6 +189,157 @@ def test_run_amset_from_directory(
     _validate_data(amset_data, transport, max_aniso, files, scats)
 
 
+@pytest.mark.usefixtures("clean_dir")
+def test_run_amset_reuse_worker_pool(example_dir):
+    vasprun, settings = _prep_inputs(example_dir, "Si", si_settings_no_mesh)
+    settings["nworkers"] = 2
+    with ScatteringWorkerPool(nworkers=2) as pool:
+        first_startup = pool.startup_time
+        for _ in range(2):
+            runner = Runner.from_vasprun(vasprun, deepcopy(settings))
+            amset_data, usage = runner.run(worker_pool=pool, return_usage_stats=True)
+            _validate_data(
+                amset_data,
+                si_transport_projections,
+                0.001,
+                ["transport", "!mesh"],
+                ["ADP", "IMP"],
+            )
+
+            # the pool was started before the runs so no time is spent on start up
+            assert usage["worker startup"] == 0
+            assert pool.workers is not None
+    assert pool.startup_time == first_startup
+    assert pool.workers is None
+
+
+@pytest.mark.usefixtures("clean_dir")
+def test_run_amset_remote_worker_pool(example_dir):
+    vasprun, settings = _prep_inputs(example_dir, "Si", si_settings_no_mesh)
+
+    # find free ports for the servers
+    addresses = []
+    for _ in range(2):
+        with socket.socket() as s:
+            s.bind(("localhost", 0))
+            addresses.append(s.getsockname())
+
+    ctx = multiprocessing.get_context("spawn")
+    servers = [
+        ctx.Process(
+            target=serve_scattering_workers,
+            args=(address, "secret"),
+            kwargs={"nworkers": 1, "progress_bar": False, "max_connections": 1},
+        )
+        for address in addresses
+    ]
+    for server in servers:
+        server.start()
+
+    try:
+        with RemoteScatteringWorkerPool(addresses, "secret") as pool:
+            runner = Runner.from_vasprun(vasprun, settings)
+            amset_data = runner.run(worker_pool=pool)
+            assert pool.nworkers == 2
+        _validate_data(
+            amset_data,
+            si_transport_projections,
+            0.001,
+            ["transport", "!mesh"],
+            ["ADP", "IMP"],
+        )
+    finally:
+        for server in servers:
+            server.join(30)
+            server.terminate()
+
+
+@pytest.mark.usefixtures("clean_dir")
+def test_run_amset_scattering_checkpoint(example_dir, monkeypatch):
+    vasprun, settings = _prep_inputs(example_dir, "Si", si_settings_no_mesh)
+    settings["scattering_checkpoint"] = "scattering.h5"
+
+    # interrupt the calculation part way through, saving the rates after each result
+    get_rate = ScatteringCalculator._get_rate_from_queue
+    nresults = []
+
+    def interrupted_get_rate(self):
+        if len(nresults) == 6:
+            raise KeyboardInterrupt
+        nresults.append(1)
+        return get_rate(self)
+
+    with monkeypatch.context() as m:
+        m.setattr("amset.scattering.calculate._checkpoint_interval", 0)
+        m.setattr(ScatteringCalculator, "_get_rate_from_queue", interrupted_get_rate)
+        runner = Runner.from_vasprun(vasprun, deepcopy(settings))
+        with pytest.raises(KeyboardInterrupt):
+            runner.run()
+
+    # the memory profiler process is left running when a run is interrupted
+    for process in multiprocessing.active_children():
+        process.terminate()
+
+    # the checkpoint should contain finished and partially finished bands
+    with h5py.File("scattering.h5", "r") as f:
+        complete = f["complete_up"][()]
+        done = f["done_elastic_up"][()]
+    partial = ~complete & done.any(axis=1) & ~done.all(axis=1)
+    assert complete.any()
+    assert partial.any()
+
+    # the checkpoint is reused when only settings that don't affect the rates change
+    load_band = ScatteringCheckpoint.load_band
+    restored = []
+
+    def recording_load_band(self, *args):
+        complete, done = load_band(self, *args)
+        restored.append(complete)
+        return complete, done
+
+    settings["scattering_integrand_cache"] = "integrand.h5"
+    settings["min_free_memory"] = 0.1
+    with monkeypatch.context() as m:
+        m.setattr(ScatteringCheckpoint, "load_band", recording_load_band)
+        runner = Runner.from_vasprun(vasprun, deepcopy(settings))
+        amset_data = runner.run()
+    assert any(restored)
+    _validate_data(
+        amset_data,
+        si_transport_projections,
+        0.001,
+        ["transport", "!mesh"],
+        ["ADP", "IMP"],
+    )
+
+    with h5py.File("scattering.h5", "r") as f:
+        assert f["complete_up"][()].all()
+
+
+@pytest.mark.usefixtures("clean_dir")
+def test_run_amset_integrand_cache(example_dir):
+    vasprun, settings = _prep_inputs(example_dir, "Si", si_settings_no_mesh)
+    settings["scattering_integrand_cache"] = "integrand.h5"
+
+    first_settings = deepcopy(settings)
+    first_settings["doping"] = [-1e15]
+    runner = Runner.from_vasprun(vasprun, first_settings)
+    _, first_usage = runner.run(return_usage_stats=True)
+
+    runner = Runner.from_vasprun(vasprun, deepcopy(settings))
+    amset_data, usage = runner.run(return_usage_stats=True)
+    _validate_data(
+        amset_data,
+        si_transport_projections,
+        0.001,
+        ["transport", "!mesh"],
+        ["ADP", "IMP"],
+    )
+
+    # only the scattering factors are evaluated for the new doping levels
+    assert usage["scattering"] < first_usage["scattering"]
+
+
 @pytest.mark.usefixtures("clean_dir")
 def test_run_tricky_spin_polarized(band_structure_data):
     settings = {
@@ -1,11 +1,15 @@
 import numpy as np
 import pytest
 from pymatgen.io.ase import AseAtomsAdaptor
+from pymatgen.util.coord import pbc_diff
 from pytest import mark
 from spglib import get_ir_reciprocal_mesh
 
+from amset.electronic_structure.kpoints import get_kpoints_tetrahedral
 from amset.electronic_structure.symmetry import (
     expand_kpoints,
+    get_kpoint_symmetry_mapping,
+    get_reciprocal_point_group_operations,
     get_rotation_angle,
     get_rotation_axis,
     get_symmetry_type,
@@ -311,3 +315,23 @@ def test_expand_kpoints(symmetry_structure, shift, mesh):
     # assert rotated k-points match the expected true k-points
     diff = np.linalg.norm(rotated_kpoints_sort - true_kpoints_sort, axis=1)
     assert np.max(diff) == 0
+
+
+def test_get_kpoint_symmetry_mapping(symmetry_structure):
+    mesh = np.array([4, 4, 4])
+    kpoints = get_kpoints_tetrahedral(mesh, symmetry_structure)[2]
+    rotations, _, _ = get_reciprocal_point_group_operations(symmetry_structure)
+
+    mapping = get_kpoint_symmetry_mapping(symmetry_structure, kpoints, mesh)
+
+    # identity is first and each operation permutes the k-points
+    np.testing.assert_array_equal(mapping[0], np.arange(len(kpoints)))
+    assert len(mapping) <= len(rotations)
+    for op_mapping in mapping:
+        np.testing.assert_array_equal(np.sort(op_mapping), np.arange(len(kpoints)))
+
+    # the mapping is consistent with rotating the k-points
+    rotated = [np.dot(kpoints, r.T) for r in rotations]
+    for op_mapping in mapping:
+        diff = [np.abs(pbc_diff(r, kpoints[op_mapping])).max() for r in rotated]
+        assert min(diff) < 1e-8
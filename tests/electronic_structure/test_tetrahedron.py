@@ -1,8 +1,15 @@
 import unittest
 
 import numpy as np
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
 from pymatgen.electronic_structure.core import Spin
 
+from amset.electronic_structure import tetrahedron
+from amset.electronic_structure.kpoints import get_kpoints_tetrahedral
+from amset.electronic_structure.tetrahedron import TetrahedralBandStructure
+from amset.util import groupby
+
 
 class TetrahedralBandStructureTest(unittest.TestCase):
     def setUp(self):
@@ -51,3 +58,342 @@ class TetrahedralBandStructureTest(unittest.TestCase):
     def test_test_init(self):
         # tbs = TetrahedralBandStructure(self.energies, self.kpoints, self.tetrahedra)
         pass
+
+
+def test_get_intersecting_tetrahedra():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+
+    # include degenerate energies to test tetrahedra touching the query energy
+    energies = np.random.RandomState(0).randint(0, 20, (3, len(kpoints))) / 10
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    max_energies = tbs.max_tetrahedra_energies[Spin.up]
+    min_energies = tbs.min_tetrahedra_energies[Spin.up]
+    for energy in np.linspace(-0.1, 2, 43):
+        expected = (min_energies < energy) & (max_energies > energy)
+        mask = tbs.get_intersecting_tetrahedra(Spin.up, energy)
+        np.testing.assert_array_equal(mask, expected)
+
+        band_idx, tetrahedra_idx = tbs.get_intersecting_tetrahedra(
+            Spin.up, energy, return_indices=True
+        )
+        np.testing.assert_array_equal(band_idx, np.where(expected)[0])
+        np.testing.assert_array_equal(tetrahedra_idx, np.where(expected)[1])
+
+        expected[[0, 2]] = False
+        mask = tbs.get_intersecting_tetrahedra(Spin.up, energy, band_idx=1)
+        np.testing.assert_array_equal(mask, expected)
+
+
+def test_count_intersecting_tetrahedra():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+
+    energies = np.random.RandomState(0).randint(0, 20, (3, len(kpoints))) / 10
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    # count the tetrahedra in the full Brillouin zone directly
+    tetrahedra_energies = energies[Spin.up][:, tetrahedra]
+    min_energies = tetrahedra_energies.min(axis=-1)
+    max_energies = tetrahedra_energies.max(axis=-1)
+    query_energies = np.linspace(-0.1, 2, 43)
+    expected = [
+        np.sum((min_energies < e) & (max_energies >= e)) for e in query_energies
+    ]
+    counts = tbs.count_intersecting_tetrahedra(Spin.up, query_energies)
+    np.testing.assert_array_equal(counts, expected)
+
+
+def test_get_vertex_states():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+
+    energies = np.random.RandomState(0).uniform(0, 2, (3, len(kpoints)))
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    _, tet_mask, _, _ = tbs.get_tetrahedra_density_of_states(
+        Spin.up, 1, return_contributions=True, symmetry_reduce=False
+    )
+    property_mask, _, band_mask, kpoint_mask = tbs.get_masks(Spin.up, tet_mask)
+    states = tbs.get_vertex_states(Spin.up, tet_mask)
+    np.testing.assert_array_equal(states[0], band_mask)
+    np.testing.assert_array_equal(states[1], kpoint_mask)
+
+    # the vertex states index the unique states at each tetrahedron vertex
+    np.testing.assert_array_equal(states[0][states[2]], property_mask[0])
+    np.testing.assert_array_equal(states[1][states[2]], property_mask[1])
+
+
+def test_get_integration_weights(monkeypatch):
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+
+    # include degenerate energies to test tetrahedra touching the query energies
+    energies = np.random.RandomState(0).randint(0, 20, (3, len(kpoints))) / 10
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    # unsorted energies, including energies equal to the vertex energies
+    query_energies = np.random.RandomState(1).permutation(
+        np.concatenate([np.arange(-1, 22) / 10, np.linspace(-0.1, 2, 43)])
+    )
+    expected = np.array(
+        [
+            tbs.get_energy_dependent_integration_weights(Spin.up, e)
+            for e in query_energies
+        ]
+    )
+    weights = tbs.get_integration_weights(Spin.up, query_energies)
+    assert weights.shape == (len(query_energies), expected[0].size)
+    assert weights.nnz == np.count_nonzero(expected)
+    np.testing.assert_array_equal(weights.toarray(), expected.reshape(weights.shape))
+
+    # the weights are calculated in blocks of energies
+    monkeypatch.setattr(tetrahedron, "_max_weights_block_size", expected[0].size * 5)
+    weights = tbs.get_integration_weights(Spin.up, query_energies)
+    np.testing.assert_array_equal(weights.toarray(), expected.reshape(weights.shape))
+
+
+def test_get_spin_density_of_states():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+
+    energies = np.random.RandomState(0).uniform(0, 2, (3, len(kpoints)))
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    query_energies = np.linspace(-0.1, 2.1, 50)
+    weights = np.array(
+        [
+            tbs.get_energy_dependent_integration_weights(Spin.up, e)
+            for e in query_energies
+        ]
+    )
+    multiplicity = tbs.ir_kpoint_weights[None, None, :]
+    integrand = np.random.RandomState(1).uniform(size=(3, len(ir_kpoints_idx), 3, 3))
+
+    _, dos = tbs.get_spin_density_of_states(Spin.up, query_energies)
+    np.testing.assert_allclose(dos, np.sum(weights * multiplicity, axis=(1, 2)))
+
+    # the cached weights are shared with other processes
+    tbs = TetrahedralBandStructure.from_reference(*tbs.to_reference())
+    _, dos = tbs.get_spin_density_of_states(
+        Spin.up, None, integrand=integrand, band_idx=[0, 2], use_cached_weights=True
+    )
+    expected = np.einsum("ebk,bkij->eij", weights[:, [0, 2]], integrand[[0, 2]])
+    np.testing.assert_allclose(dos, expected)
+
+
+def test_band_properties():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+
+    energies = np.random.RandomState(0).uniform(0, 2, (3, len(kpoints)))
+    energies[1] += 3
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    full_tetrahedra, _ = tetrahedron.process_tetrahedra(tetrahedra, energies)
+    ir_tetrahedra, ir_energies = tetrahedron.process_tetrahedra(
+        tetrahedra[ir_tetrahedra_info[0]], energies
+    )
+    e21, e31, e41, *_ = tetrahedron.get_tetrahedra_energy_diffs(ir_energies)
+    cross_section_weights = tetrahedron.get_tetrahedra_cross_section_weights(
+        structure.lattice.reciprocal_lattice.matrix,
+        kpoints,
+        ir_tetrahedra,
+        e21,
+        e31,
+        e41,
+    )
+
+    # band properties are only calculated for the bands that are used
+    band_idx, tetrahedra_idx = np.array([2, 0, 2]), np.array([5, 1, 0])
+    np.testing.assert_array_equal(
+        tbs.get_sorted_tetrahedra(Spin.up, (band_idx, tetrahedra_idx)),
+        full_tetrahedra[Spin.up][band_idx, tetrahedra_idx],
+    )
+    np.testing.assert_array_equal(tbs.vertex_order[Spin.up].calculated_bands, [0, 2])
+    assert len(tbs.e21[Spin.up].calculated_bands) == 0
+    np.testing.assert_array_equal(np.asarray(tbs.e41[Spin.up]), e41[Spin.up])
+    np.testing.assert_allclose(
+        np.asarray(tbs.cross_section_weights[Spin.up]),
+        cross_section_weights[Spin.up],
+    )
+
+    # the bands inside the energy range are calculated in shared memory
+    tbs = TetrahedralBandStructure.from_reference(*tbs.to_reference((2.5, 6)))
+    np.testing.assert_array_equal(tbs.vertex_order[Spin.up].calculated_bands, [0, 1, 2])
+    np.testing.assert_array_equal(tbs.e21[Spin.up].calculated_bands, [1])
+    band_idx, tetrahedra_idx = np.indices(full_tetrahedra[Spin.up].shape[:2])
+    np.testing.assert_array_equal(
+        tbs.get_sorted_tetrahedra(Spin.up, (band_idx.ravel(), tetrahedra_idx.ravel())),
+        full_tetrahedra[Spin.up].reshape(-1, 4),
+    )
+
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+        energy_diff_dtype=np.float32,
+    )
+    assert tbs.e21[Spin.up][0].dtype == np.float32
+    np.testing.assert_allclose(tbs.e21[Spin.up][0], e21[Spin.up][0], rtol=1e-6)
+
+
+def test_compact_indices():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral([6, 6, 6], structure)
+    ir_tetrahedra_idx, ir_tetrahedra_to_full_idx, _ = ir_tetrahedra_info
+
+    indices = [ir_kpoints_idx, ir_to_full_idx, tetrahedra, *ir_tetrahedra_info[:2]]
+    assert all(i.dtype == np.int32 for i in indices)
+    assert tetrahedra.shape == (len(kpoints) * 6, 4)
+    np.testing.assert_array_equal(
+        ir_tetrahedra_to_full_idx[ir_tetrahedra_idx], np.arange(len(ir_tetrahedra_idx))
+    )
+
+    energies = np.random.RandomState(0).uniform(0, 2, (3, len(kpoints)))
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+
+    # the full tetrahedra are grouped by their irreducible tetrahedron
+    grouped = groupby(np.arange(len(tetrahedra)), ir_tetrahedra_to_full_idx)
+    ir_idx = np.array([3, 0, 3, len(ir_tetrahedra_idx) - 1])
+    np.testing.assert_array_equal(
+        tbs._get_full_tetrahedra_idx(ir_idx), np.concatenate(grouped[ir_idx])
+    )
+
+    # the vertex order of each band is stored as one byte per tetrahedron
+    assert tbs.vertex_order[Spin.up][0].dtype == np.uint8
+    assert tbs.get_sorted_tetrahedra(Spin.up, ([0], [1])).dtype == np.int32
+
+
+def test_get_block_tetrahedra():
+    # tetrahedra intersect the energies from start to end; blocks of three energies
+    starts = np.array([[0, 3, 5], [2, 6, 1]])
+    ends = np.array([[2, 7, 5], [9, 7, 2]])
+    tetrahedra, bounds = tetrahedron._get_block_tetrahedra(starts, ends, 3, 3)
+
+    blocks = [tetrahedra[i:j].tolist() for i, j in zip(bounds[:-1], bounds[1:])]
+    assert blocks == [[0, 3, 5], [1, 3], [1, 3, 4]]
@@ -0,0 +1,362 @@
+import queue
+
+import numpy as np
+import pytest
+from pymatgen.core.lattice import Lattice
+from pymatgen.core.structure import Structure
+from pymatgen.electronic_structure.core import Spin
+
+import amset.scattering.calculate
+from amset.core.run import Runner
+from amset.electronic_structure.kpoints import get_kpoints_tetrahedral
+from amset.electronic_structure.symmetry import get_kpoint_symmetry_mapping
+from amset.electronic_structure.tetrahedron import (
+    TetrahedralBandStructure,
+    get_cross_section_values,
+    get_projected_intersections,
+)
+from amset.interpolation.wavefunction import UnityWavefunctionOverlap
+from amset.scattering.calculate import (
+    ScatteringCalculator,
+    ScatteringWorkerPool,
+    _AmsetDataMin,
+    _EmptySharedArray,
+    _get_energy_diffs,
+    _get_little_group_tetrahedra,
+    _get_scattering_geometries,
+    _interpolate_zero_rates,
+    _split_by_cost,
+    get_cross_section_qpoints,
+    get_fine_mesh_qpoints,
+    quadrature_tolerances,
+)
+from amset.util import array_from_buffer, create_shared_array, dict_array_from_buffer
+
+
+@pytest.fixture
+def tetrahedra():
+    # random tetrahedra in cartesian coordinates, with sorted vertex energies that
+    # give a mix of triangular and quadrilateral cross sections at zero energy
+    rng = np.random.default_rng(0)
+    ntet = 200
+    offsets = rng.uniform(-0.3, 0.3, size=(ntet, 1, 3))
+    tetrahedra_kpoints = offsets + rng.uniform(-0.05, 0.05, size=(ntet, 4, 3))
+    energies = np.sort(rng.uniform(-1, 1, size=(ntet, 4)), axis=1)
+
+    # only keep tetrahedra that are intersected by the cross section
+    mask = (energies[:, 0] < 0) & (energies[:, 3] > 0)
+    energies = energies[mask]
+    tetrahedra_kpoints = tetrahedra_kpoints[mask]
+
+    cond_a_mask = (energies[:, 0] < 0) & (0 < energies[:, 1])
+    cond_b_mask = (energies[:, 1] <= 0) & (0 < energies[:, 2])
+    cond_c_mask = (energies[:, 2] <= 0) & (0 < energies[:, 3])
+    ee1 = -energies[:, 0]
+    ee2 = -energies[:, 1]
+    e4e = energies[:, 3]
+    contributions = (
+        cond_a_mask,
+        cond_b_mask,
+        cond_c_mask,
+        ee1 / (energies[:, 1] - energies[:, 0]),
+        ee1 / (energies[:, 2] - energies[:, 0]),
+        ee1 / (energies[:, 3] - energies[:, 0]),
+        ee2 / (energies[:, 2] - energies[:, 1]),
+        ee2 / (energies[:, 3] - energies[:, 1]),
+        e4e / (energies[:, 3] - energies[:, 0]),
+        e4e / (energies[:, 3] - energies[:, 1]),
+        e4e / (energies[:, 3] - energies[:, 2]),
+    )
+    cross_section_weights = rng.uniform(0.5, 1.5, size=len(energies))
+    return tetrahedra_kpoints, contributions, cross_section_weights
+
+
+@pytest.mark.parametrize(
+    "high_tol,med_tol",
+    [
+        pytest.param(0.1, 0.2, id="mixed precision"),
+        pytest.param(0, 0, id="low precision"),
+        pytest.param(10, 20, id="high precision"),
+    ],
+)
+def test_get_cross_section_qpoints(tetrahedra, high_tol, med_tol):
+    tetrahedra_kpoints, contributions, cross_section_weights = tetrahedra
+
+    intersections = get_cross_section_values(
+        tetrahedra_kpoints, *contributions, average=False
+    )
+    projected_intersections, basis = get_projected_intersections(intersections)
+    expected_q, expected_weights, expected_mapping = get_fine_mesh_qpoints(
+        projected_intersections,
+        basis,
+        *contributions[0:3],
+        high_tol=high_tol,
+        med_tol=med_tol,
+        cross_section_weights=cross_section_weights,
+    )
+
+    qpoints, weights, mapping = get_cross_section_qpoints(
+        tetrahedra_kpoints,
+        contributions,
+        cross_section_weights,
+        high_tol=high_tol,
+        med_tol=med_tol,
+    )
+    np.testing.assert_array_equal(mapping, expected_mapping)
+    np.testing.assert_allclose(qpoints, expected_q, rtol=1e-10, atol=1e-12)
+    np.testing.assert_allclose(
+        weights, expected_weights, rtol=1e-10, atol=1e-12 * expected_weights.max()
+    )
+
+
+def test_quadrature_tolerances(tetrahedra):
+    tetrahedra_kpoints, contributions, cross_section_weights = tetrahedra
+    k_spacing = 0.1
+
+    nqpoints = []
+    total_weights = []
+    for precision in ("fast", "balanced", "accurate"):
+        high_tol, med_tol = quadrature_tolerances[precision]
+        _, weights, _ = get_cross_section_qpoints(
+            tetrahedra_kpoints,
+            contributions,
+            cross_section_weights,
+            high_tol=k_spacing * high_tol,
+            med_tol=k_spacing * med_tol,
+        )
+        nqpoints.append(len(weights))
+        total_weights.append(weights.sum())
+
+    # more accurate presets use more q-points but integrate the same area
+    assert nqpoints[0] < nqpoints[1] < nqpoints[2]
+    np.testing.assert_allclose(total_weights, total_weights[0])
+
+
+@pytest.mark.parametrize("kpoint", [[0, 0, 0], [1 / 6, 0, 0], [1 / 6, 1 / 6, 1 / 3]])
+def test_get_little_group_tetrahedra(kpoint):
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    mesh = np.array([6, 6, 6])
+    _, _, kpoints, _, _, tetrahedra, *_ = get_kpoints_tetrahedral(mesh, structure)
+    mapping = get_kpoint_symmetry_mapping(structure, kpoints, mesh)
+    k_idx = np.where(np.abs(kpoints - kpoint).sum(axis=1) < 1e-8)[0][0]
+
+    # use two bands to check tetrahedra in different bands are not mixed
+    band_idxs = np.repeat([0, 1], len(tetrahedra))
+    tetrahedra = np.concatenate([tetrahedra, tetrahedra])
+    tet_idx, multiplicity = _get_little_group_tetrahedra(
+        tetrahedra, band_idxs, mapping, k_idx
+    )
+    assert multiplicity.sum() == len(tetrahedra)
+    assert len(tet_idx) < len(tetrahedra)
+    assert np.all(np.diff(tet_idx) > 0)
+    assert np.all(band_idxs[tet_idx][: len(tet_idx) // 2] == 0)
+
+    # every tetrahedron is equivalent to exactly one representative
+    little_group = mapping[mapping[:, k_idx] == k_idx]
+    representatives = {
+        (band_idxs[i], tuple(np.sort(tetrahedra[i]))): n
+        for i, n in zip(tet_idx, multiplicity)
+    }
+    counts = dict.fromkeys(representatives, 0)
+    for band_idx, tetrahedron in zip(band_idxs, tetrahedra):
+        images = {(band_idx, tuple(np.sort(op[tetrahedron]))) for op in little_group}
+        matches = images.intersection(representatives)
+        assert len(matches) == 1
+        counts[matches.pop()] += 1
+    assert counts == representatives
+
+    # no reduction is possible if k is only invariant under the identity
+    assert (
+        _get_little_group_tetrahedra(tetrahedra, band_idxs, mapping[:1], k_idx) is None
+    )
+
+
+def test_interpolate_zero_rates():
+    kpoints = np.zeros((8, 3))
+    kpoints[:, 0] = [0, 0.125, 0.25, 0.375, -0.5, -0.375, -0.25, -0.125]
+
+    # rates have the shape (nscatterers, ndoping, ntemperatures, nbands, nkpoints)
+    rates = np.zeros((2, 2, 1, 1, 8))
+    rates[..., 0] = [[[[1e10]], [[2e10]]], [[[3e10]], [[4e10]]]]
+    rates[..., 3] = 5e10
+    rates[0, 0, 0, 0, 1] = 6e10  # only zero for some dopings and temperatures
+    masks = np.full((1, 8), False)
+    masks[0, 4] = True  # k-points outside the cut-offs are not interpolated
+    rates[..., 4] = 1e14
+
+    rates = _interpolate_zero_rates({Spin.up: rates}, kpoints, {Spin.up: masks})
+    rates = rates[Spin.up][..., 0, :]
+
+    # -0.375 is closer to 0.375 than 0 across the zone boundary
+    nearest = [0, 0, 3, 3, 4, 3, 0, 0]
+    expected = np.array([[[1e10], [2e10]], [[3e10], [4e10]]])[..., None]
+    expected = np.where(np.array(nearest) == 3, 5e10, expected)
+    expected[..., 4] = 1e14
+    np.testing.assert_array_equal(rates, expected)
+
+
+@pytest.mark.parametrize(
+    "costs,target_cost,expected",
+    [
+        pytest.param([1] * 6, 2, [(0, 2), (2, 4), (4, 6)], id="uniform"),
+        pytest.param(
+            [5, 3, 1, 1, 1, 1], 3, [(0, 1), (1, 2), (2, 3), (3, 6)], id="mixed"
+        ),
+        pytest.param([2, 1], 10, [(0, 2)], id="single"),
+    ],
+)
+def test_split_by_cost(costs, target_cost, expected):
+    chunks = _split_by_cost(np.array(costs), target_cost)
+    assert [(c.start, c.stop) for c in chunks] == expected
+
+
+def test_get_energy_diffs():
+    class DummyScatterer:
+        def __init__(self, energy_diff):
+            self.energy_diff = energy_diff
+
+    scatterers = [DummyScatterer(e) for e in (0.002, 0.001, 0.002)]
+    assert _get_energy_diffs(scatterers, False) == [(None, [0, 1, 2])]
+
+    # absorption and emission for each unique phonon energy
+    assert _get_energy_diffs(scatterers, True) == [
+        (0.001, [1]),
+        (-0.001, [1]),
+        (0.002, [0, 2]),
+        (-0.002, [0, 2]),
+    ]
+
+
+def test_get_scattering_geometries():
+    structure = Structure(Lattice.cubic(3), ["Si"], [[0, 0, 0]])
+    mesh = np.array([6, 6, 6])
+    (
+        _,
+        _,
+        kpoints,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        tetrahedra,
+        *ir_tetrahedra_info,
+    ) = get_kpoints_tetrahedral(mesh, structure)
+    energies = np.random.RandomState(0).uniform(0, 2, (2, len(kpoints)))
+    energies = {Spin.up: energies[:, ir_to_full_idx]}
+    tbs = TetrahedralBandStructure.from_data(
+        energies,
+        kpoints,
+        tetrahedra,
+        structure,
+        ir_kpoints_idx,
+        ir_to_full_idx,
+        *ir_tetrahedra_info,
+    )
+    amset_data_min = _AmsetDataMin(structure, mesh, None, np.zeros((1, 1)), [300])
+
+    class ConstantOverlap:
+        def __init__(self, overlap):
+            self.overlap = overlap
+
+        def get_overlap(self, spin, b_idx, k, band_mask, k_primes):
+            return np.full(len(band_mask), self.overlap)
+
+    # include an energy without any intersections
+    tetrahedra_dos = [
+        tbs.get_tetrahedra_density_of_states(
+            Spin.up, energy, return_contributions=True, symmetry_reduce=False
+        )
+        for energy in (0.8, -1, 1.2)
+    ]
+
+    def get_geometries(overlap_calculator):
+        return _get_scattering_geometries(
+            tbs,
+            overlap_calculator,
+            amset_data_min,
+            None,
+            None,
+            Spin.up,
+            0,
+            10,
+            tetrahedra_dos,
+        )
+
+    # unity overlaps are not interpolated but should give the same weights
+    unity = get_geometries(UnityWavefunctionOverlap())
+    half = get_geometries(ConstantOverlap(0.5))
+    assert unity[1] is None and half[1] is None
+    for unity_geometry, half_geometry in zip(unity[::2], half[::2]):
+        np.testing.assert_array_equal(unity_geometry[0], half_geometry[0])
+        np.testing.assert_allclose(0.5 * unity_geometry[1], half_geometry[1])
+        np.testing.assert_array_equal(unity_geometry[2], half_geometry[2])
+
+
+def test_worker_pool_throttling(monkeypatch):
+    available = [0]
+    monkeypatch.setattr(
+        amset.scattering.calculate, "get_available_memory", lambda: available[0]
+    )
+    pool = ScatteringWorkerPool(nworkers=2, min_free_memory=1)
+    pool.in_queue = queue.Queue()
+    pool.out_queue = queue.Queue()
+
+    # only one job is sent while memory is low
+    for i in range(6):
+        pool.submit(i)
+    assert pool.in_queue.get_nowait() == 0
+    assert pool.in_queue.empty()
+
+    # once memory is available, each worker has up to two jobs
+    pool.out_queue.put("result")
+    available[0] = 2 * 1024**3
+    assert pool.get_result() == "result"
+    assert [pool.in_queue.get_nowait() for _ in range(4)] == [1, 2, 3, 4]
+    assert list(pool._queued_jobs) == [5]
+
+
+def test_worker_pool_allocates_empty_arrays(monkeypatch):
+    pool = ScatteringWorkerPool(nworkers=1)
+    monkeypatch.setattr(pool, "start", lambda: None)
+    pool.in_queue = queue.Queue()
+    pool.out_queue = queue.Queue()
+
+    # the empty arrays are allocated by the pool, the other arrays are copied
+    reference = ({Spin.up: _EmptySharedArray((2, 3))}, create_shared_array(np.ones(4)))
+    for _ in range(2):
+        pool.out_queue.put(("loaded",))
+        loaded = pool.load(reference)
+        assert pool.in_queue.get_nowait()[0] == "load"
+
+        rates = dict_array_from_buffer(loaded[0])[Spin.up]
+        np.testing.assert_array_equal(rates, np.zeros((2, 3)))
+        np.testing.assert_array_equal(array_from_buffer(loaded[1]), np.ones(4))
+
+        # the reused shared memory is zeroed when loaded again
+        rates[:] = 1
+    del rates, loaded
+    pool.close()
+
+
+def test_calculate_basic_scattering_rates(example_dir):
+    settings = {
+        "interpolation_factor": 5,
+        "doping": [-1e15],
+        "temperatures": [300],
+        "scattering_type": ["CRT"],
+        "constant_relaxation_time": 1e-14,
+        "nworkers": 1,
+        "print_log": False,
+    }
+    runner = Runner.from_vasprun(example_dir / "Si" / "vasprun.xml.gz", settings)
+    amset_data, _ = runner._do_interpolation()
+    amset_data, _ = runner._do_dos(amset_data)
+
+    # basic scattering is calculated without starting a worker pool
+    calculator = ScatteringCalculator(
+        runner.settings, amset_data, 0, scattering_type=["CRT"], progress_bar=False
+    )
+    rates = calculator.calculate_scattering_rates()
+    assert calculator.workers is None
+
+    nbands, nkpoints = amset_data.energies[Spin.up].shape
+    assert rates[Spin.up].shape == (1, 1, 1, nbands, nkpoints)
+    np.testing.assert_allclose(rates[Spin.up], 1e14)
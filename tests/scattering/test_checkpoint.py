@@ -0,0 +1,90 @@
+import numpy as np
+from pymatgen.electronic_structure.core import Spin
+
+from amset.scattering.checkpoint import (
+    ScatteringCheckpoint,
+    ScatteringIntegrandCache,
+    get_inputs_hash,
+)
+
+
+def test_get_inputs_hash():
+    inputs = ({Spin.up: np.arange(6.0).reshape(2, 3)}, {"b": 1, "a": (2.0, "x")})
+    key = get_inputs_hash(*inputs)
+    assert key == get_inputs_hash(*inputs)
+    assert key != get_inputs_hash({Spin.up: np.arange(6.0).reshape(3, 2)}, inputs[1])
+    assert key != get_inputs_hash(inputs[0], {"b": 1, "a": (2.0, "y")})
+
+
+def test_scattering_checkpoint(tmp_path):
+    filename = tmp_path / "scattering.h5"
+    shapes = {Spin.up: (3, 2, 1, 2, 5)}
+    slices = {"elastic": slice(1, 2), "inelastic": slice(2, 3)}
+    rates = np.random.RandomState(0).rand(*shapes[Spin.up])
+
+    checkpoint = ScatteringCheckpoint(filename, "key", shapes, slices)
+    elastic_done = np.array([True, False, True, False, False])
+    done = {"elastic": elastic_done, "inelastic": np.full(5, False)}
+    checkpoint.save_band(Spin.up, 0, rates, done)
+    checkpoint.save_band(Spin.up, 1, rates, done, complete=True)
+
+    # only the calculated k-points of unfinished bands are restored
+    checkpoint = ScatteringCheckpoint(filename, "key", shapes, slices)
+    loaded = np.zeros_like(rates)
+    complete, loaded_done = checkpoint.load_band(Spin.up, 0, loaded)
+    assert not complete
+    np.testing.assert_array_equal(loaded_done["elastic"], elastic_done)
+    assert not loaded_done["inelastic"].any()
+    np.testing.assert_array_equal(
+        loaded[1, ..., 0, elastic_done], rates[1, ..., 0, elastic_done]
+    )
+    assert not loaded[1, ..., 0, ~elastic_done].any()
+    assert not loaded[[0, 2], ..., 0, :].any()
+
+    complete, _ = checkpoint.load_band(Spin.up, 1, loaded)
+    assert complete
+    np.testing.assert_array_equal(loaded[..., 1, :], rates[..., 1, :])
+
+    # a checkpoint with different inputs is discarded
+    checkpoint = ScatteringCheckpoint(filename, "new_key", shapes, slices)
+    complete, loaded_done = checkpoint.load_band(Spin.up, 1, loaded)
+    assert not complete
+    assert not any(d.any() for d in loaded_done.values())
+
+
+def test_scattering_integrand_cache(tmp_path):
+    filename = tmp_path / "integrand.h5"
+    state = np.random.RandomState(0)
+
+    def get_integrand(nqpoints):
+        nqpoints = np.array(nqpoints)
+        total = nqpoints.sum()
+        return state.rand(total, 3), state.rand(total), nqpoints
+
+    # inelastic integrands are stored for both the absorption and emission energies
+    first = [get_integrand([2, 0, 3]), get_integrand([1, 4, 2])]
+    second = [get_integrand([3, 1]), get_integrand([0, 2])]
+    cache = ScatteringIntegrandCache(filename, "key")
+    cache.save_kpoints(Spin.up, 1, "inelastic", [4, 0, 6], first)
+    cache.save_kpoints(Spin.up, 1, "inelastic", [2, 5], second)
+
+    cache = ScatteringIntegrandCache(filename, "key")
+    found, integrands = cache.load_kpoints(Spin.up, 1, "inelastic", [5, 1, 4, 6])
+    np.testing.assert_array_equal(found, [True, False, True, True])
+    assert len(integrands) == 2
+    for (qpoints, weights, nqpoints), a, b in zip(integrands, first, second):
+        # k-points 5, 4 and 6 are returned in the order requested
+        np.testing.assert_array_equal(nqpoints, [b[2][1], a[2][0], a[2][2]])
+        expected = [b[0][b[2][0] :], a[0][: a[2][0]], a[0][a[2][0] + a[2][1] :]]
+        np.testing.assert_array_equal(qpoints, np.concatenate(expected))
+        expected = [b[1][b[2][0] :], a[1][: a[2][0]], a[1][a[2][0] + a[2][1] :]]
+        np.testing.assert_array_equal(weights, np.concatenate(expected))
+
+    found, integrands = cache.load_kpoints(Spin.up, 0, "elastic", [5, 1])
+    assert not found.any()
+    assert integrands == []
+
+    # a cache with different inputs is discarded
+    cache = ScatteringIntegrandCache(filename, "new_key")
+    found, _ = cache.load_kpoints(Spin.up, 1, "inelastic", [5, 1, 4, 6])
+    assert not found.any()
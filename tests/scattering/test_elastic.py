@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from amset.scattering.elastic import (
+    get_acoustic_mode_sum,
+    get_christoffel_tensors,
+    get_longitudinal_elastic_constants,
+    solve_christoffel_equation,
+)
+from amset.util import cast_elastic_tensor
+
+
+@pytest.fixture
+def elastic_constant():
+    return cast_elastic_tensor(
+        [
+            [144, 53, 60, 0, 0, 0],
+            [53, 130, 53, 0, 0, 0],
+            [60, 53, 144, 0, 0, 0],
+            [0, 0, 0, 75, 0, 0],
+            [0, 0, 0, 0, 70, 0],
+            [0, 0, 0, 0, 0, 75],
+        ]
+    )
+
+
+@pytest.fixture
+def unit_q():
+    q = np.random.default_rng(0).normal(size=(50, 3))
+    return q / np.linalg.norm(q, axis=1)[:, None]
+
+
+def test_get_christoffel_tensors(elastic_constant, unit_q):
+    tensors = get_christoffel_tensors(elastic_constant, unit_q)
+    expected = np.einsum("ijkl,ni,nl->njk", elastic_constant, unit_q, unit_q)
+    np.testing.assert_allclose(tensors, expected, rtol=1e-12)
+
+
+def test_solve_christoffel_equation(elastic_constant, unit_q):
+    tensors = get_christoffel_tensors(elastic_constant, unit_q)
+    velocities, polarizations = solve_christoffel_equation(tensors)
+    np.testing.assert_allclose(velocities.T, np.linalg.eigvalsh(tensors), rtol=1e-12)
+    for c, v in zip(velocities, polarizations):
+        np.testing.assert_allclose(
+            np.einsum("njk,nk->nj", tensors, v), c[:, None] * v, atol=1e-10
+        )
+
+
+def test_get_longitudinal_elastic_constants(elastic_constant, unit_q):
+    # include high symmetry directions, where the transverse modes are degenerate
+    unit_q = np.concatenate([unit_q, np.eye(3), np.full((1, 3), 1 / np.sqrt(3))])
+    c_long = get_longitudinal_elastic_constants(elastic_constant, unit_q)
+    tensors = get_christoffel_tensors(elastic_constant, unit_q)
+    np.testing.assert_allclose(c_long, np.linalg.eigvalsh(tensors)[:, 2], rtol=1e-10)
+
+    # isotropic Christoffel tensors have three equal eigenvalues
+    isotropic = np.einsum("ij,kl->ikjl", np.eye(3), np.eye(3)) * 10
+    c_long = get_longitudinal_elastic_constants(isotropic, unit_q)
+    np.testing.assert_allclose(c_long, 10, rtol=1e-10)
+
+
+def test_get_acoustic_mode_sum(elastic_constant, unit_q):
+    vectors = np.random.default_rng(1).normal(size=unit_q.shape)
+    mode_sum = get_acoustic_mode_sum(elastic_constant, unit_q, vectors)
+
+    tensors = get_christoffel_tensors(elastic_constant, unit_q)
+    velocities, polarizations = solve_christoffel_equation(tensors)
+    expected = sum(
+        np.einsum("nj,nj->n", v, vectors) ** 2 / c
+        for c, v in zip(velocities, polarizations)
+    )
+    np.testing.assert_allclose(mode_sum, expected, rtol=1e-10)
+
+    # the Christoffel data is only reused for the same q-points
+    mode_sum = get_acoustic_mode_sum(elastic_constant, unit_q[::-1], vectors[::-1])
+    np.testing.assert_allclose(mode_sum, expected[::-1], rtol=1e-10)
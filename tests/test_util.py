@@ -4,17 +4,24 @@ import numpy as np
 import pytest
 from pymatgen.electronic_structure.core import Spin
 
+import amset.util
 from amset.util import (
+    IrreducibleArray,
+    LazyBandArray,
+    array_from_buffer,
     cast_dict_list,
     cast_dict_ndarray,
     cast_elastic_tensor,
     cast_piezoelectric_tensor,
+    cast_pop_frequency,
     cast_tensor,
+    get_nworkers,
     get_progress_bar,
     groupby,
     parse_deformation_potential,
     parse_doping,
     parse_ibands,
+    parse_pop_frequency,
     parse_temperatures,
     tensor_average,
     validate_settings,
@@ -362,6 +369,40 @@ def test_parse_deformation_potential(value, expected):
         assert parsed == expected
 
 
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        pytest.param("8.2", 8.2, id="single"),
+        pytest.param("8.2:0.6, 10.5:0.4", ((8.2, 0.6), (10.5, 0.4)), id="modes"),
+        pytest.param("8.2:0.6,10.5", pytest.raises(ValueError), id="error"),
+    ],
+)
+def test_parse_pop_frequency(value, expected):
+    if not isinstance(expected, (tuple, float)):
+        with expected:
+            parse_pop_frequency(value)
+    else:
+        parsed = parse_pop_frequency(value)
+        assert parsed == expected
+
+
+@pytest.mark.parametrize(
+    "value,expected",
+    [
+        pytest.param(8, 8.0, id="single"),
+        pytest.param([[8.2, 0.6], [10.5, 0.4]], ((8.2, 0.6), (10.5, 0.4)), id="modes"),
+        pytest.param([[8.2, 0.6, 1]], pytest.raises(ValueError), id="shape"),
+        pytest.param([[-8.2, 0.6]], pytest.raises(ValueError), id="negative"),
+    ],
+)
+def test_cast_pop_frequency(value, expected):
+    if not isinstance(expected, (tuple, float)):
+        with expected:
+            cast_pop_frequency(value)
+    else:
+        assert cast_pop_frequency(value) == expected
+
+
 @pytest.mark.parametrize(
     "iterable,total,error",
     [
@@ -410,3 +451,189 @@ def test_parse_ibands(value, expected):
         parsed = parse_ibands(value)
         parsed = {s: i.tolist() for s, i in parsed.items()}
         assert parsed == expected
+
+
+@pytest.fixture
+def irreducible_array():
+    rng = np.random.RandomState(0)
+    ir_to_full_idx = np.array([0, 1, 1, 2, 0, 2, 3, 1])
+    ir_kpoints_idx = np.array([0, 1, 3, 6])
+    ir_data = rng.uniform(size=(2, 3, 4, len(ir_kpoints_idx)))
+    return IrreducibleArray(ir_data, ir_kpoints_idx, ir_to_full_idx)
+
+
+@pytest.mark.parametrize(
+    "key",
+    [
+        pytest.param((0, 1), id="leading"),
+        pytest.param((slice(None), 2), id="slice"),
+        pytest.param(([1, 0], 1, 2), id="advanced"),
+        pytest.param((Ellipsis, [0, 3, 5]), id="k-points"),
+        pytest.param((1, 2, 3, 4), id="element"),
+        pytest.param((1, 2, np.arange(32).reshape(4, 8) % 3 == 0), id="mask"),
+    ],
+)
+def test_irreducible_array_getitem(irreducible_array, key):
+    full = irreducible_array.ir_data[..., irreducible_array.ir_to_full_idx]
+    assert irreducible_array.shape == full.shape
+    np.testing.assert_array_equal(np.asarray(irreducible_array), full)
+    np.testing.assert_array_equal(irreducible_array[key], full[key])
+
+
+def test_irreducible_array_setitem(irreducible_array):
+    full = np.asarray(irreducible_array).copy()
+    mask = np.zeros((4, 8), dtype=bool)
+    mask[:, [1, 2, 6, 7]] = True
+
+    irreducible_array[1, 2, mask] = 5
+    full[1, 2, mask] = 5
+    np.testing.assert_array_equal(np.asarray(irreducible_array), full)
+
+    irreducible_array[0] = full[1]
+    full[0] = full[1]
+    np.testing.assert_array_equal(np.asarray(irreducible_array), full)
+
+    with pytest.raises(IndexError):
+        irreducible_array[..., :2] = 0
+
+
+@pytest.mark.parametrize(
+    "key,bands",
+    [
+        pytest.param(1, [1], id="band"),
+        pytest.param((2, 3), [2], id="element"),
+        pytest.param((slice(1, 3), 2), [1, 2], id="slice"),
+        pytest.param(([3, 1, 3], [0, 4, 2]), [1, 3], id="advanced"),
+        pytest.param((Ellipsis, 1), [0, 1, 2, 3], id="ellipsis"),
+        pytest.param(np.arange(20).reshape(4, 5) % 7 == 0, [0, 1, 2], id="mask"),
+    ],
+)
+def test_lazy_band_array_getitem(key, bands):
+    full = np.random.RandomState(0).uniform(size=(4, 5, 2))
+    calculated = []
+
+    def get_band_values(band_idxs):
+        calculated.extend(band_idxs)
+        return full[band_idxs]
+
+    array = LazyBandArray(full.shape, get_band_values)
+    assert array.shape == full.shape
+    np.testing.assert_array_equal(array[key], full[key])
+    np.testing.assert_array_equal(array[key], full[key])
+
+    # only the indexed bands are calculated, and each band is only calculated once
+    np.testing.assert_array_equal(array.calculated_bands, bands)
+    np.testing.assert_array_equal(calculated, bands)
+
+    np.testing.assert_array_equal(np.asarray(array), full)
+    np.testing.assert_array_equal(np.sort(calculated), np.arange(4))
+
+
+def test_lazy_band_array_to_shared():
+    full = np.random.RandomState(0).uniform(size=(4, 5)).astype(np.float32)
+    array = LazyBandArray(full.shape, lambda b: full[b], dtype=np.float32)
+    array.calculate_bands([2])
+
+    data_buffer, rows_buffer = array.to_shared([0, 2])
+    np.testing.assert_array_equal(array.calculated_bands, [0, 2])
+
+    shared = LazyBandArray(
+        full.shape,
+        lambda b: full[b],
+        data=array_from_buffer(data_buffer),
+        band_rows=array_from_buffer(rows_buffer),
+    )
+    assert shared.dtype == np.float32
+    np.testing.assert_array_equal(shared.calculated_bands, [0, 2])
+    np.testing.assert_array_equal(shared[[0, 2]], full[[0, 2]])
+
+    # bands calculated after sharing are not added to the shared arrays
+    shared_data = shared.data
+    np.testing.assert_array_equal(shared[3], full[3])
+    np.testing.assert_array_equal(array.calculated_bands, [0, 2])
+    np.testing.assert_array_equal(array_from_buffer(rows_buffer), [1, -1, 0, -1])
+    assert shared.data is shared_data
+    assert shared.nbytes == shared_data.nbytes + full[3].nbytes + 4 * 8
+
+    # shared and late bands can be indexed together
+    np.testing.assert_array_equal(shared[[0, 3, 2]], full[[0, 3, 2]])
+    np.testing.assert_array_equal(shared[[3, 0], [1, 4]], full[[3, 0], [1, 4]])
+    np.testing.assert_array_equal(shared[1:, ::2], full[1:, ::2])
+    np.testing.assert_array_equal(shared[full > 0.5], full[full > 0.5])
+    np.testing.assert_array_equal(np.asarray(shared), full)
+
+    # late bands are added to the shared values when moved to shared memory
+    shared.to_shared()
+    assert len(shared.data) == 4
+    np.testing.assert_array_equal(shared[:], full)
+
+
+@pytest.mark.parametrize(
+    "files,expected_quota,expected_memory",
+    [
+        pytest.param({}, None, (None, None), id="none"),
+        pytest.param(
+            {"cpu.max": "max 100000", "memory.max": "max", "memory.current": "5"},
+            None,
+            (None, None),
+            id="v2-unlimited",
+        ),
+        pytest.param(
+            {"cpu.max": "250000 100000", "memory.max": "100", "memory.current": "40"},
+            2.5,
+            (100, 40),
+            id="v2",
+        ),
+        pytest.param(
+            {
+                "cpu/cpu.cfs_quota_us": "-1",
+                "cpu/cpu.cfs_period_us": "100000",
+                "memory/memory.limit_in_bytes": "9223372036854771712",
+                "memory/memory.usage_in_bytes": "5",
+            },
+            None,
+            (None, None),
+            id="v1-unlimited",
+        ),
+        pytest.param(
+            {
+                "cpu/cpu.cfs_quota_us": "400000",
+                "cpu/cpu.cfs_period_us": "100000",
+                "memory/memory.limit_in_bytes": "100",
+                "memory/memory.usage_in_bytes": "40",
+            },
+            4,
+            (100, 40),
+            id="v1",
+        ),
+    ],
+)
+def test_read_cgroup_limits(
+    tmp_path, monkeypatch, files, expected_quota, expected_memory
+):
+    for filename, contents in files.items():
+        path = tmp_path / filename
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(contents + "\n")
+    monkeypatch.setattr(amset.util, "_cgroup_root", tmp_path)
+
+    assert amset.util._read_cgroup_cpu_quota() == expected_quota
+    assert amset.util._read_cgroup_memory() == expected_memory
+
+
+@pytest.mark.parametrize(
+    "nworkers,worker_memory,shared_memory,expected",
+    [
+        pytest.param(3, None, 0, 3, id="explicit"),
+        pytest.param(3, 100, 0, 3, id="explicit-memory"),
+        pytest.param(-1, None, 0, 8, id="cpus"),
+        pytest.param(-1, 100, 0, 8, id="cpu-limited"),
+        pytest.param(-1, 300, 0, 3, id="memory-limited"),
+        pytest.param(-1, 300, 400, 2, id="shared-memory"),
+        pytest.param(-1, 2000, 0, 1, id="minimum"),
+    ],
+)
+def test_get_nworkers(monkeypatch, nworkers, worker_memory, shared_memory, expected):
+    monkeypatch.setattr(amset.util, "get_cpu_count", lambda: 8)
+    monkeypatch.setattr(amset.util, "get_available_memory", lambda: 1000)
+    assert get_nworkers(nworkers, worker_memory, shared_memory) == expected